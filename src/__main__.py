@@ -1,4 +1,15 @@
-from src.main import main
+import argparse
 import asyncio
 
-asyncio.run(main())
+parser = argparse.ArgumentParser(prog="python -m src", description="Zero-export control service")
+parser.add_argument("--import-profile", action="store_true",
+                    help="report the import time of src.main and exit")
+parser.add_argument("--top", type=int, default=15, help="modules listed per section of the report")
+args = parser.parse_args()
+
+if args.import_profile:
+    from src.import_profile import measure, report
+    print(report(measure(), top=args.top))
+else:
+    from src.main import main
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+import logging
+from dataclasses import dataclass
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AllocationUnit:
+    serial: str
+    max_watt: int
+    inverter_watt: int
+    min_watt: int
+    compensate_factor: float = 1.0
+    # Live AC output and the limit the inverter currently applies
+    output: float = 0.0
+    limit: float = 0.0
+    # False while a limit change is still ramping (output not meaningful yet)
+    settled: bool = True
+
+
+def _finalize(share: float, unit: AllocationUnit) -> int:
+    """Per-inverter clamps and calibration, as applied by the original dispatch loop."""
+    share = max(unit.min_watt, min(unit.max_watt, int(share)))
+    if unit.compensate_factor != 1.0:
+        share = int(share * unit.compensate_factor)
+        share = max(unit.min_watt, min(unit.inverter_watt, share))
+    return share
+
+
+class ProportionalAllocator:
+    """Split the total limit by max_watt share."""
+
+    def __init__(self, cfg: Config | None = None):
+        pass
+
+    def allocate(self, total: int, units: list[AllocationUnit]) -> dict[str, int]:
+        total_max = sum(u.max_watt for u in units)
+        if not total_max:
+            return {}
+        return {u.serial: _finalize(total * u.max_watt / total_max, u) for u in units}
+
+
+class HeadroomAllocator:
+    """
+    Proportional split that knows which inverters are sun-limited.
+
+    An inverter producing well below the limit it applies cannot use a larger
+    share: it is counted at its present output and the rest of the total is
+    water-filled across the others by max_watt. Its own limit is set a probe
+    margin above output so it can climb when the sun returns. Anything left
+    once all are full goes back to the limited ones.
+    """
+
+    def __init__(self, cfg: Config):
+        ctrl = cfg.control
+        self.limited_ratio = float(ctrl.get("sun_limited_ratio", 0.95))
+        self.probe_w = float(ctrl.get("sun_limited_probe_w", 50))
+
+    def _tolerance(self, unit: AllocationUnit) -> float:
+        """How far below its limit an inverter may normally run (tracking error)."""
+        return max(self.probe_w / 2, unit.limit * (1 - self.limited_ratio))
+
+    def _margin(self, unit: AllocationUnit) -> float:
+        # Always above the tolerance at the capped limit, so a capped inverter
+        # stays classified as sun-limited instead of flapping every cycle
+        return max(self.probe_w, 2 * (1 - self.limited_ratio) * unit.output)
+
+    def is_sun_limited(self, unit: AllocationUnit) -> bool:
+        if not unit.settled or unit.limit <= 0:
+            return False
+        return unit.limit - unit.output > self._tolerance(unit)
+
+    def allocate(self, total: int, units: list[AllocationUnit]) -> dict[str, int]:
+        # A sun-limited inverter is expected to deliver only what it produces
+        # now (shares are in pre-calibration watts)
+        capacity = {}
+        for u in units:
+            if self.is_sun_limited(u):
+                expected = u.output / (u.compensate_factor or 1.0)
+                capacity[u.serial] = max(u.min_watt, min(u.max_watt, expected))
+            else:
+                capacity[u.serial] = u.max_watt
+
+        shares = self._water_fill(total, units, capacity)
+        if total - sum(shares.values()) > 1e-6:
+            # Full everywhere: the limited ones may climb towards max_watt
+            shares = self._water_fill(total, units, {u.serial: u.max_watt for u in units}, floor=shares)
+
+        limited = [u for u in units if capacity[u.serial] < u.max_watt]
+        for u in limited:
+            # Limit slightly above output so it can pick up when the sun
+            # returns, but only if the total asks for all it produces: below
+            # that it is cut like any other
+            if abs(shares[u.serial] - capacity[u.serial]) <= 1e-6:
+                shares[u.serial] += self._margin(u)
+        if limited:
+            logger.debug("Sun-limited inverters %s, headroom moved to the others", [u.serial for u in limited])
+        return {u.serial: _finalize(shares[u.serial], u) for u in units}
+
+    @staticmethod
+    def _water_fill(total: float, units: list[AllocationUnit], capacity: dict[str, float],
+                    floor: dict[str, float] | None = None) -> dict[str, float]:
+        shares = dict(floor) if floor else {u.serial: 0.0 for u in units}
+        remaining = total - sum(shares.values())
+        open_units = [u for u in units if shares[u.serial] < capacity[u.serial]]
+        while remaining > 1e-6 and open_units:
+            weight = sum(u.max_watt for u in open_units)
+            if not weight:
+                break
+            next_open = []
+            spent = 0.0
+            for u in open_units:
+                room = capacity[u.serial] - shares[u.serial]
+                add = min(room, remaining * u.max_watt / weight)
+                shares[u.serial] += add
+                spent += add
+                if add < room:
+                    next_open.append(u)
+            remaining -= spent
+            if len(next_open) == len(open_units):
+                break
+            open_units = next_open
+        return shares
+
+
+ALLOCATORS = {
+    "proportional": ProportionalAllocator,
+    "headroom": HeadroomAllocator,
+}
+
+
+def create_allocator(cfg: Config):
+    kind = cfg.control.get("allocation", "proportional")
+    factory = ALLOCATORS.get(kind)
+    if factory is None:
+        raise ValueError(f"Unknown allocation strategy: {kind}")
+    return factory(cfg)
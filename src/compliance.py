@@ -0,0 +1,211 @@
+"""
+Streaming energy accounting: import/export energy and export-limit
+violations per interval, integrated from each meter sample as it arrives.
+"""
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from functools import cached_property
+from pathlib import Path
+
+from src.config import Config
+from src.metrics import ENERGY_SAMPLES_REJECTED
+
+logger = logging.getLogger(__name__)
+
+
+def area_below(p0: float, p1: float, dt: float, level: float) -> tuple[float, float]:
+    """
+    Seconds and Wh the straight line from p0 to p1 over dt seconds spends
+    below `level`, crossings interpolated linearly.
+    """
+    a, b = level - p0, level - p1
+    if a <= 0 and b <= 0:
+        return 0.0, 0.0
+    if a >= 0 and b >= 0:
+        return dt, (a + b) / 2 * dt / 3600
+    below = dt * max(a, b) / abs(a - b)
+    return below, max(a, b) * below / 2 / 3600
+
+
+@dataclass
+class IntervalStats:
+    start: float
+    length_s: float
+    import_wh: float = 0.0
+    export_wh: float = 0.0
+    max_export_w: float = 0.0
+    # Time and energy below the export threshold
+    violation_s: float = 0.0
+    violation_wh: float = 0.0
+    # Time covered by samples; gaps longer than max_gap_s are not integrated
+    covered_s: float = 0.0
+    samples: int = 0
+
+    @cached_property
+    def end(self) -> float:
+        return interval_end(self.start, self.length_s)
+
+    def add(self, p0: float, p1: float, dt: float, threshold_w: float):
+        _, export_wh = area_below(p0, p1, dt, 0.0)
+        _, import_wh = area_below(-p0, -p1, dt, 0.0)
+        violation_s, violation_wh = area_below(p0, p1, dt, threshold_w)
+        self.import_wh += import_wh
+        self.export_wh += export_wh
+        self.violation_s += violation_s
+        self.violation_wh += violation_wh
+        self.covered_s += dt
+
+    def to_dict(self) -> dict:
+        return {
+            "start": self.start,
+            "length_s": self.length_s,
+            "import_wh": round(self.import_wh, 3),
+            "export_wh": round(self.export_wh, 3),
+            "max_export_w": round(self.max_export_w, 1),
+            "violation_s": round(self.violation_s, 2),
+            "violation_wh": round(self.violation_wh, 3),
+            "covered_s": round(self.covered_s, 2),
+            "samples": self.samples,
+        }
+
+
+def interval_start(t: float, length_s: float) -> float:
+    """Start of the interval containing t, aligned to local wall-clock time."""
+    offset = time.localtime(t).tm_gmtoff
+    wall = (t + offset) // length_s * length_s
+    # The boundary may lie on the other side of a DST change than t
+    return wall - time.localtime(wall - offset).tm_gmtoff
+
+
+def interval_end(start: float, length_s: float) -> float:
+    """
+    Next local wall-clock boundary after `start`. An interval spanning a DST
+    change is shorter or longer than length_s, a day 23 or 25 hours.
+    """
+    end = interval_start(start + length_s, length_s)
+    if end <= start:
+        end = interval_start(start + 2 * length_s, length_s)
+    return end
+
+
+class ComplianceTracker:
+    """
+    Trapezoidal integration of grid power (positive = import) into import
+    and export energy, plus time and energy spent below `threshold_w`, for
+    each of the configured interval lengths. Only the running and the last
+    completed interval are kept per length, checkpointed to `path` so
+    counters survive a restart.
+    """
+
+    def __init__(self, cfg: Config, path: str | os.PathLike | None = None, log_violations: bool = True):
+        comp = cfg.get("compliance", {})
+        self.enabled = comp.get("enabled", True)
+        self.threshold_w = float(comp.get("threshold_w", 0))
+        self.max_gap_s = float(comp.get("max_gap_s", 30))
+        self.intervals = [float(s) for s in comp.get("intervals_s", [60, 900, 86400])]
+        self.checkpoint_s = float(comp.get("checkpoint_s", 60))
+        self.path = Path(path) if path is not None else None
+        self.log_violations = log_violations
+
+        self.current: dict[float, IntervalStats] = {}
+        self.completed: dict[float, IntervalStats] = {}
+        self._last: tuple[float, float] | None = None
+        self._saved_at = 0.0
+        # Samples not newer than the last one, which cannot be integrated
+        self.rejected = 0
+
+    def observe(self, power: float, t: float) -> list[IntervalStats]:
+        """Add a meter sample taken at wall-clock time t; returns intervals it completed."""
+        if not self.enabled:
+            return []
+        if self._last is not None and t <= self._last[0]:
+            self.rejected += 1
+            ENERGY_SAMPLES_REJECTED.inc()
+            logger.debug("Ignoring meter sample at %.3f, not after the last one at %.3f", t, self._last[0])
+            return []
+        done = []
+        for length in self.intervals:
+            stats = self.current.get(length)
+            if stats is None:
+                stats = self.current[length] = IntervalStats(interval_start(t, length), length)
+            if self._last is not None and t - self._last[0] <= self.max_gap_s:
+                t0, p0 = self._last
+                # Split the segment at interval boundaries
+                while t >= stats.end:
+                    p_end = p0 + (power - p0) * (stats.end - t0) / (t - t0)
+                    stats.add(p0, p_end, stats.end - t0, self.threshold_w)
+                    t0, p0 = stats.end, p_end
+                    done.append(self._complete(length, stats))
+                    stats = self.current[length] = IntervalStats(interval_start(t0, length), length)
+                stats.add(p0, power, t - t0, self.threshold_w)
+            elif t >= stats.end:
+                done.append(self._complete(length, stats))
+                stats = self.current[length] = IntervalStats(interval_start(t, length), length)
+            stats.samples += 1
+            stats.max_export_w = max(stats.max_export_w, -power)
+        self._last = (t, power)
+        return done
+
+    def _complete(self, length: float, stats: IntervalStats) -> IntervalStats:
+        self.completed[length] = stats
+        if self.log_violations and stats.violation_s > 0:
+            logger.warning(
+                "Export limit exceeded for %.1fs (%.1f Wh) in the %gs interval from %s",
+                stats.violation_s, stats.violation_wh, length,
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(stats.start)),
+            )
+        return stats
+
+    def state(self) -> dict:
+        return {
+            "threshold_w": self.threshold_w,
+            "intervals": {
+                f"{length:g}": {
+                    "current": self.current[length].to_dict() if length in self.current else None,
+                    "last": self.completed[length].to_dict() if length in self.completed else None,
+                }
+                for length in self.intervals
+            },
+        }
+
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            for key, target in (("current", self.current), ("completed", self.completed)):
+                for raw in data.get(key, []):
+                    stats = IntervalStats(**raw)
+                    if stats.length_s in self.intervals:
+                        target[stats.length_s] = stats
+            if data.get("last"):
+                self._last = tuple(data["last"])
+            logger.info("Loaded energy accounting checkpoint from %s", self.path)
+        except (OSError, ValueError, TypeError):
+            logger.warning("Could not load energy accounting checkpoint from %s", self.path)
+
+    def save(self, now: float | None = None):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump({
+                    "current": [asdict(s) for s in self.current.values()],
+                    "completed": [asdict(s) for s in self.completed.values()],
+                    "last": self._last,
+                }, f)
+            os.replace(tmp, self.path)
+            self._saved_at = time.monotonic() if now is None else now
+        except OSError:
+            logger.warning("Could not save energy accounting checkpoint to %s", self.path)
+
+    def maybe_save(self, now: float):
+        """Checkpoint at most every checkpoint_s (monotonic now)."""
+        if now - self._saved_at >= self.checkpoint_s:
+            self.save(now)
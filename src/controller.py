@@ -7,7 +7,7 @@ logger = logging.getLogger(__name__)
 
 
 class ZeroExportController:
-    def __init__(self, cfg: Config):
+    def __init__(self, cfg: Config, clock=time.monotonic):
         ctrl = cfg.control
         self.target = ctrl.target_point_w
         self.tolerance = ctrl.tolerance_w
@@ -24,18 +24,33 @@ class ZeroExportController:
         self.jump_percent = ctrl.on_grid_jump_percent
         self.fast_decrease = ctrl.fast_limit_decrease
 
+        self._clock = clock
         self._last_setpoint = 0
-        self._prev_time = time.monotonic()
+        self._prev_time = clock()
+        # Branch taken by the last compute(): fast_cut, hold or regulate
+        self.mode = "idle"
 
     def reset(self):
         self._last_setpoint = 0
-        self._prev_time = time.monotonic()
+        self._prev_time = self._clock()
+        self.mode = "idle"
 
-    def compute(self, grid_watts: float, current_inverter_watts: float, max_watt: int, min_watt: int) -> int:
+    def track(self, setpoint: int, mode: str):
+        """Adopt a setpoint applied without compute(), so regulation resumes from it."""
+        self._last_setpoint = setpoint
+        self._prev_time = self._clock()
+        self.mode = mode
+
+    def state(self) -> dict:
+        return {"type": "legacy", "mode": self.mode, "last_setpoint": self._last_setpoint}
+
+    def compute(self, grid_watts: float, current_inverter_watts: float, max_watt: int, min_watt: int,
+                output_fresh: bool = True) -> int:
         """
         Tracked Integral Control:
         New Setpoint = _last_setpoint + adjustment
         But resets _last_setpoint to current_inverter_watts if we detect saturation (clouds).
+        With output_fresh False the measured output is too old to tell saturation.
         """
         error = grid_watts - self.target
         
@@ -55,7 +70,7 @@ class ZeroExportController:
         
         base_setpoint = self._last_setpoint
         
-        if current_inverter_watts < (base_setpoint * 0.85):
+        if output_fresh and current_inverter_watts < (base_setpoint * 0.85):
              # Inverter is producing < 85% of what we asked. Likely drifting/saturated (Sun Limited).
              
              if error < 0:
@@ -86,10 +101,12 @@ class ZeroExportController:
                 int(grid_watts), self.min_point, int(base_setpoint), int(setpoint)
             )
             self._last_setpoint = setpoint
+            self.mode = "fast_cut"
             return setpoint
 
         # Within tolerance?
         if abs(error) <= self.tolerance:
+            self.mode = "hold"
             return int(self._last_setpoint)
 
         # Normal Regulation Loop
@@ -131,8 +148,153 @@ class ZeroExportController:
         )
         
         self._last_setpoint = setpoint
+        self.mode = "regulate"
         return setpoint
 
     @staticmethod
     def _clamp(value: int, low: int, high: int) -> int:
         return max(low, min(high, value))
+
+
+class PIDController:
+    """
+    PI/PID regulation of the total inverter limit.
+
+    Setpoint = feed-forward + Kp * error + I + D, where the feed-forward term is
+    the measured inverter output (the limit that would keep the grid where it is).
+    Anti-windup by conditional integration: the integral is frozen while the
+    output sits on a clamp and the error would push it further into it.
+    The derivative acts on the grid measurement through a first-order filter.
+    """
+
+    def __init__(self, cfg: Config, clock=time.monotonic):
+        ctrl = cfg.control
+        self.target = ctrl.target_point_w
+        self.tolerance = ctrl.tolerance_w
+        self.max_point = ctrl.max_point_w
+        self.min_point = ctrl.min_point_w
+        self.fast_decrease = ctrl.fast_limit_decrease
+
+        pid = cfg.get("controller", {})
+        self.kp = float(pid.get("kp", 0.7))
+        self.ki = float(pid.get("ki", 0.1))
+        self.kd = float(pid.get("kd", 0.0))
+        self.derivative_filter_s = float(pid.get("derivative_filter_s", 2.0))
+        self.feed_forward = pid.get("feed_forward", True)
+
+        self._clock = clock
+        self._last_setpoint = 0
+        self._integral = 0.0
+        self._derivative = 0.0
+        self._prev_grid: float | None = None
+        self._prev_time = clock()
+        self.mode = "idle"
+
+    def reset(self):
+        self._last_setpoint = 0
+        self._integral = 0.0
+        self._derivative = 0.0
+        self._prev_grid = None
+        self._prev_time = self._clock()
+        self.mode = "idle"
+
+    def track(self, setpoint: int, mode: str):
+        """Adopt a setpoint applied without compute(), so regulation resumes from it."""
+        self._last_setpoint = setpoint
+        # The error history belongs to the old operating point
+        self._integral = 0.0
+        self._derivative = 0.0
+        self._prev_grid = None
+        self._prev_time = self._clock()
+        self.mode = mode
+
+    def state(self) -> dict:
+        return {
+            "type": "pid",
+            "mode": self.mode,
+            "last_setpoint": self._last_setpoint,
+            "integral": round(self._integral, 2),
+            "derivative": round(self._derivative, 2),
+        }
+
+    def compute(self, grid_watts: float, current_inverter_watts: float, max_watt: int, min_watt: int,
+                output_fresh: bool = True) -> int:
+        now = self._clock()
+        # Stale output data: work from the last setpoint instead of the measurement
+        if not output_fresh:
+            current_inverter_watts = self._last_setpoint
+        dt = max(now - self._prev_time, 1e-3)
+        self._prev_time = now
+
+        error = grid_watts - self.target
+        base = current_inverter_watts if self.feed_forward else self._last_setpoint
+
+        # Filtered derivative on measurement (no kick when the target changes)
+        if self._prev_grid is not None and self.kd:
+            raw = (grid_watts - self._prev_grid) / dt
+            alpha = dt / (self.derivative_filter_s + dt)
+            self._derivative += alpha * (raw - self._derivative)
+        self._prev_grid = grid_watts
+
+        # Exporting: one-step cut from measured output, drop any positive integral
+        if grid_watts < self.min_point and self.fast_decrease:
+            self._integral = min(self._integral, 0.0)
+            setpoint = self._clamp(int(current_inverter_watts + error), min_watt, max_watt)
+            logger.info(
+                "FAST CUT: Grid %dW < %dW. Output %d -> %dW",
+                int(grid_watts), self.min_point, int(current_inverter_watts), setpoint
+            )
+            self._last_setpoint = setpoint
+            self.mode = "fast_cut"
+            return setpoint
+
+        if abs(error) <= self.tolerance:
+            self.mode = "hold"
+            return int(self._last_setpoint)
+
+        # Large import spike: full-gain step instead of Kp-scaled
+        kp = 1.0 if grid_watts > self.max_point else self.kp
+
+        proportional = kp * error
+        derivative = self.kd * self._derivative
+        candidate = self._integral + self.ki * error * dt
+
+        # Conditional integration: integrate only up to the point where the
+        # output reaches its clamp, never deeper into saturation
+        headroom = max_watt - (base + proportional + derivative)
+        floor = min_watt - (base + proportional + derivative)
+        if error > 0 and candidate > headroom:
+            candidate = max(self._integral, headroom)
+        elif error < 0 and candidate < floor:
+            candidate = min(self._integral, floor)
+        self._integral = candidate
+
+        setpoint = self._clamp(int(base + proportional + self._integral + derivative), min_watt, max_watt)
+
+        logger.info(
+            "PID: Grid %dW (Err %d). P %d I %d D %d FF %d -> %dW",
+            int(grid_watts), int(error), int(proportional), int(self._integral),
+            int(derivative), int(base), setpoint
+        )
+
+        self._last_setpoint = setpoint
+        self.mode = "regulate"
+        return setpoint
+
+    @staticmethod
+    def _clamp(value: int, low: int, high: int) -> int:
+        return max(low, min(high, value))
+
+
+CONTROLLERS = {
+    "legacy": ZeroExportController,
+    "pid": PIDController,
+}
+
+
+def create_controller(cfg: Config, clock=time.monotonic):
+    kind = cfg.get("controller", {}).get("type", "legacy")
+    cls = CONTROLLERS.get(kind)
+    if cls is None:
+        raise ValueError(f"Unknown controller type: {kind}")
+    return cls(cfg, clock=clock)
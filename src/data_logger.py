@@ -1,37 +1,58 @@
 import asyncio
+import importlib.util
 import logging
 from datetime import datetime, timezone
 
 from src.config import Config
+from src.metrics import TELEMETRY_POINTS
 
 logger = logging.getLogger(__name__)
 
-try:
-    from influxdb_client import Point
-    from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
-    HAS_INFLUX = True
-except ImportError:
-    HAS_INFLUX = False
+# influxdb-client is the slowest import of the service: only check that it is
+# there, and load it once a DataLogger is configured to write
+HAS_INFLUX = importlib.util.find_spec("influxdb_client") is not None
+Point = InfluxDBClientAsync = None
+
+
+def _load_influx():
+    global Point, InfluxDBClientAsync
+    if InfluxDBClientAsync is None:
+        from influxdb_client import Point
+        from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
+
+
+def influx_enabled(cfg: Config) -> bool:
+    return HAS_INFLUX and cfg.influxdb.get("enabled", True)
 
 
 class DataLogger:
-    def __init__(self, cfg: Config):
-        self._enabled = HAS_INFLUX
+    def __init__(self, cfg: Config, store=None, local=None):
+        # In-process recent history, fed whether or not InfluxDB is available
+        self._store = store
+        # On-disk history (src/local_store.py), beside or instead of InfluxDB
+        self._local = local
+        self._flush_interval = 5
+        self._maintain_interval = 60
+        self._client: "InfluxDBClientAsync | None" = None
+        influx = cfg.influxdb
+        self._enabled = influx_enabled(cfg)
         if not HAS_INFLUX:
-            logger.warning("influxdb-client not installed, telemetry disabled")
+            logger.warning("influxdb-client not installed, %s",
+                           "telemetry kept in the local store" if local is not None else "telemetry disabled")
+        if not self._enabled:
             return
 
-        influx = cfg.influxdb
+        _load_influx()
         self._url = influx.url
         self._token = influx.token
         self._org = influx.org
         self._bucket = influx.bucket
         self._buffer: list = []
         self._lock = asyncio.Lock()
-        self._flush_interval = 5
-        self._client: InfluxDBClientAsync | None = None
+        # Bound on points kept while InfluxDB is unreachable, oldest dropped first
+        self._max_buffer = int(influx.get("max_buffer_points", 50000))
 
-    async def _get_client(self) -> InfluxDBClientAsync:
+    async def _get_client(self) -> "InfluxDBClientAsync":
         if self._client is None:
             self._client = InfluxDBClientAsync(
                 url=self._url, token=self._token, org=self._org
@@ -39,6 +60,10 @@ class DataLogger:
         return self._client
 
     def record(self, measurement: str, fields: dict, tags: dict | None = None):
+        if self._store is not None:
+            self._store.record(measurement, fields, tags)
+        if self._local is not None:
+            self._local.record(measurement, fields, tags)
         if not self._enabled:
             return
         point = Point(measurement)
@@ -49,8 +74,11 @@ class DataLogger:
         for k, v in fields.items():
             point.field(k, v)
         self._buffer.append(point)
+        TELEMETRY_POINTS.inc(stage="buffered")
 
     async def flush(self):
+        if self._local is not None:
+            self._local.flush()
         if not self._enabled or not self._buffer:
             return
 
@@ -63,18 +91,33 @@ class DataLogger:
             write_api = client.write_api()
             await write_api.write(bucket=self._bucket, record=batch)
             logger.debug("Flushed %d data points to InfluxDB", len(batch))
+            TELEMETRY_POINTS.inc(len(batch), stage="flushed")
         except Exception:
             logger.exception("InfluxDB write failed, re-buffering %d points", len(batch))
             self._client = None
             async with self._lock:
                 self._buffer = batch + self._buffer
+                overflow = len(self._buffer) - self._max_buffer
+                if overflow > 0:
+                    del self._buffer[:overflow]
+                    TELEMETRY_POINTS.inc(overflow, stage="dropped")
+                    logger.warning("Telemetry buffer full, dropped %d oldest points", overflow)
 
     async def run(self):
+        last_maintain = 0.0
         while True:
             await asyncio.sleep(self._flush_interval)
             await self.flush()
+            now = asyncio.get_running_loop().time()
+            if self._local is not None and now - last_maintain >= self._maintain_interval:
+                self._local.release_idle()
+                # Compaction sorts a whole partition: off the event loop
+                await asyncio.to_thread(self._local.compact_closed)
+                last_maintain = now
 
     async def close(self):
+        if self._local is not None:
+            self._local.close()
         if self._client:
             await self._client.close()
             self._client = None
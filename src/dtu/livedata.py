@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import time
+
+from src.config import Config
+from src.metrics import (
+    LIVEDATA_FETCH_SECONDS, LIVEDATA_FETCHES, LIVEDATA_HTTP_ACTIVE, LIVEDATA_WS_FRAMES, LIVEDATA_WS_RECONNECTS,
+)
+
+logger = logging.getLogger(__name__)
+
+# OpenDTU livedata JSON field -> MQTT topic path (below `<serial>/<channel>/`)
+AC_FIELDS = {
+    "Power": "power", "Voltage": "voltage", "Current": "current", "Frequency": "frequency",
+    "PowerFactor": "powerfactor", "ReactivePower": "reactivepower",
+}
+INV_FIELDS = {
+    "Power DC": "powerdc", "YieldDay": "yieldday", "YieldTotal": "yieldtotal", "Temperature": "temperature",
+}
+DC_FIELDS = {
+    "Power": "power", "Voltage": "voltage", "Current": "current",
+    "YieldDay": "yieldday", "YieldTotal": "yieldtotal", "Irradiation": "irradiation",
+}
+STATUS_FIELDS = ("reachable", "producing", "limit_relative", "limit_absolute")
+SOURCES = ("mqtt", "websocket")
+
+
+def _payload(value) -> str:
+    # Payloads as OpenDTU publishes them over MQTT
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value)
+
+
+def _channel(values: dict, prefix: str, section: dict, fields: dict[str, str]):
+    for field, path in fields.items():
+        entry = section.get(field)
+        if isinstance(entry, dict) and "v" in entry:
+            values[f"{prefix}{path}"] = _payload(entry["v"])
+
+
+def inverter_values(inv: dict) -> tuple[dict[str, str], dict[str, str]]:
+    """
+    One inverter object of OpenDTU's livedata JSON as topic paths below the
+    OpenDTU prefix -> payloads. Returns (status, data): status fields are as
+    of the response, data as of the inverter's last poll (`data_age` ago).
+    """
+    serial = inv["serial"]
+    status, data = {}, {}
+    for field in STATUS_FIELDS:
+        if field in inv:
+            status[f"{serial}/status/{field}"] = _payload(inv[field])
+    if "name" in inv:
+        status[f"{serial}/name"] = inv["name"]
+    _channel(data, f"{serial}/0/", inv.get("AC", {}).get("0", {}), AC_FIELDS)
+    _channel(data, f"{serial}/0/", inv.get("INV", {}).get("0", {}), INV_FIELDS)
+    for ch, section in inv.get("DC", {}).items():
+        if ch.isdigit():
+            _channel(data, f"{serial}/{int(ch) + 1}/", section, DC_FIELDS)
+    return status, data
+
+
+def ingest_livedata(dtu, data: dict, now: float, pushed: bool = False) -> int:
+    """Fill the adapter's state store from one livedata document. Returns the value count."""
+    count = 0
+    for inv in data.get("inverters", []):
+        if "serial" not in inv:
+            continue
+        status, values = inverter_values(inv)
+        dtu.ingest(status, now, pushed)
+        dtu.ingest(values, now - float(inv.get("data_age", 0)), pushed)
+        count += len(status) + len(values)
+    return count
+
+
+class HttpLivedataSource:
+    """
+    Fallback while OpenDTU's push channels are silent: once no MQTT message
+    or WebSocket frame arrived for `after_s`, polls `/api/livedata/status`,
+    which carries every inverter in one response, every `interval_s` over
+    one persistent session, and fills the adapter's state store. Stops polling (and closes the session) as
+    soon as pushed data arrives again.
+    """
+
+    MAX_BACKOFF_S = 60.0
+
+    def __init__(self, cfg: Config, dtu, clock=time.monotonic):
+        fb = cfg.opendtu.get("http_fallback", {})
+        self.dtu = dtu
+        self.clock = clock
+        self.enabled = fb.get("enabled", True)
+        self.after_s = float(fb.get("after_s", 10))
+        self.interval_s = float(fb.get("interval_s", 2))
+        self.timeout_s = float(fb.get("timeout_s", 3))
+        self.url = f"http://{dtu.ip}/api/livedata/status"
+        self.active = False
+        self.failures = 0
+        self._session = None
+        self._auth = None
+
+    async def _get_session(self):
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout_s))
+            self._auth = aiohttp.BasicAuth(self.dtu.user, self.dtu.password)
+        return self._session
+
+    async def _get_json(self, session, url: str) -> dict:
+        async with session.get(url, auth=self._auth) as resp:
+            resp.raise_for_status()
+            return await resp.json()
+
+    async def fetch(self) -> int:
+        """One bulk request, ingested into the adapter. Returns the value count."""
+        session = await self._get_session()
+        started = time.perf_counter()
+        data = await self._get_json(session, self.url)
+        count = ingest_livedata(self.dtu, data, self.clock())
+        # Newer firmware lists only status fields here; details come per inverter
+        missing = [inv["serial"] for inv in data.get("inverters", []) if "serial" in inv and "AC" not in inv]
+        if missing:
+            details = await asyncio.gather(*(
+                self._get_json(session, f"{self.url}?inv={serial}") for serial in missing))
+            for detail in details:
+                count += ingest_livedata(self.dtu, detail, self.clock())
+        # The response itself shows the DTU is up
+        self.dtu.ingest({"dtu/status": "1"}, self.clock())
+        LIVEDATA_FETCH_SECONDS.observe(time.perf_counter() - started)
+        LIVEDATA_FETCHES.inc(result="ok")
+        return count
+
+    async def step(self) -> float:
+        """Poll if MQTT is stale; returns the delay before the next step."""
+        if self.dtu.push_age() <= self.after_s:
+            if self.active:
+                logger.info("OpenDTU pushes data again, stopping HTTP livedata polling")
+                self.active = False
+                LIVEDATA_HTTP_ACTIVE.set(0)
+                await self.close()
+            return self.interval_s
+        if not self.active:
+            logger.warning(
+                "No data pushed by OpenDTU for %.0fs, polling %s", self.dtu.push_age(), self.url)
+            self.active = True
+            LIVEDATA_HTTP_ACTIVE.set(1)
+        try:
+            await self.fetch()
+        except Exception as e:
+            self.failures += 1
+            LIVEDATA_FETCHES.inc(result="error")
+            logger.warning("OpenDTU livedata request failed: %s", e)
+            return min(self.interval_s * 2 ** self.failures, self.MAX_BACKOFF_S)
+        self.failures = 0
+        return self.interval_s
+
+    async def run(self):
+        if not self.enabled:
+            return
+        try:
+            while True:
+                await asyncio.sleep(await self.step())
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class WebSocketLivedataSource:
+    """
+    Ingests the frames OpenDTU pushes over its `/livedata` WebSocket (the
+    livedata JSON of the inverters that just updated), skipping the MQTT
+    broker hop. Each frame is parsed once and written straight into the
+    adapter's state store. Reconnects with exponential backoff between
+    `reconnect_min_s` and `reconnect_max_s`.
+    """
+
+    def __init__(self, cfg: Config, dtu, clock=time.monotonic, sleep=asyncio.sleep):
+        ws = cfg.opendtu.get("websocket", {})
+        self.dtu = dtu
+        self.clock = clock
+        self.sleep = sleep
+        self.url = ws.get("url") or f"ws://{dtu.ip}/livedata"
+        self.heartbeat_s = float(ws.get("heartbeat_s", 20))
+        self.reconnect_min_s = float(ws.get("reconnect_min_s", 1))
+        self.reconnect_max_s = float(ws.get("reconnect_max_s", 30))
+        self.connected = False
+        self.frames = 0
+
+    def handle_frame(self, text: str) -> int:
+        """Ingest one frame; returns the value count."""
+        try:
+            data = json.loads(text)
+        except ValueError:
+            logger.debug("Ignoring non-JSON livedata frame")
+            return 0
+        if not isinstance(data, dict):
+            return 0
+        self.frames += 1
+        LIVEDATA_WS_FRAMES.inc()
+        return ingest_livedata(self.dtu, data, self.clock(), pushed=True)
+
+    async def _session(self, session, auth):
+        import aiohttp
+
+        async with session.ws_connect(self.url, auth=auth, heartbeat=self.heartbeat_s) as ws:
+            self.connected = True
+            logger.info("Connected to OpenDTU livedata WebSocket %s", self.url)
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self.handle_frame(msg.data)
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    raise ws.exception()
+
+    async def run(self):
+        import aiohttp
+
+        auth = aiohttp.BasicAuth(self.dtu.user, self.dtu.password)
+        backoff = self.reconnect_min_s
+        async with aiohttp.ClientSession() as session:
+            while True:
+                try:
+                    await self._session(session, auth)
+                    logger.warning("OpenDTU livedata WebSocket closed")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("OpenDTU livedata WebSocket error: %s", e)
+                if self.connected:
+                    # Had a working connection: start over from the shortest delay
+                    backoff = self.reconnect_min_s
+                    self.connected = False
+                LIVEDATA_WS_RECONNECTS.inc()
+                await self.sleep(backoff)
+                backoff = min(backoff * 2, self.reconnect_max_s)
+
+
+def create_push_source(cfg: Config, dtu) -> WebSocketLivedataSource | None:
+    """
+    The extra ingestion source `opendtu.source` selects. MQTT stays
+    subscribed either way: commands and their acknowledgements use it.
+    """
+    source = cfg.opendtu.get("source", "mqtt")
+    if source not in SOURCES:
+        raise ValueError(f"Unknown opendtu.source: {source}")
+    if source == "websocket":
+        return WebSocketLivedataSource(cfg, dtu)
+    return None
@@ -2,30 +2,91 @@ import asyncio
 import logging
 import time
 
-import aiohttp
-
 from src.config import Config
 
 logger = logging.getLogger(__name__)
 
+FIELD_GROUPS = ("ac", "dc", "limit", "status", "info")
+
+
+def field_group(path: str) -> str:
+    """Freshness group of an inverter topic path, e.g. `0/power` -> ac."""
+    head, _, tail = path.partition("/")
+    if head == "status":
+        return "limit" if tail.startswith("limit") else "status"
+    if head == "0":
+        return "ac"
+    if head.isdigit():
+        return "dc"
+    return "info"
+
 
 class OpenDTUAdapter:
-    def __init__(self, cfg: Config, inverters: list[Config]):
+    def __init__(self, cfg: Config, inverters: list[Config], clock=time.monotonic):
         self.ip = cfg.opendtu.ip
         self.user = cfg.opendtu.user
         self.password = cfg.opendtu.password
         self.opendtu_topic = cfg.mqtt.opendtu_topic
         self.inverters = inverters
-        self._timeout = aiohttp.ClientTimeout(total=10)
+        self._timeout_s = 10
+        self._clock = clock
+        fresh = cfg.opendtu.get("freshness", {})
+        # Older inverter data is kept out of saturation checks and feed-forward...
+        self.flag_after_s = float(fresh.get("flag_after_s", 15))
+        # ...and past this the inverter is left out of control altogether
+        self.exclude_after_s = float(fresh.get("exclude_after_s", 60))
 
         self._cache: dict[str, str] = {}
         self._cache_lock = asyncio.Lock()
         self._last_update: dict[str, float] = {}
+        # serial -> field group -> receive time of the newest topic in it
+        self._fresh: dict[str, dict[str, float]] = {inv.serial: {} for inv in inverters}
+        self._prefix = f"{self.opendtu_topic}/"
+        # Set on each retained reachable status, see wait_for_state()
+        self._status_seen = asyncio.Event()
+        # Last inverter data pushed by OpenDTU, over MQTT or the WebSocket
+        # (start time until the first), see push_age(). DTU housekeeping and
+        # our own echoed commands do not count.
+        self.push_last = clock()
 
     async def handle_mqtt(self, topic: str, payload: str):
+        now = self._clock()
         async with self._cache_lock:
-            self._cache[topic] = payload
-            self._last_update[topic] = time.monotonic()
+            if self._store(topic, payload, now):
+                self.push_last = now
+
+    def _store(self, topic: str, payload: str, at: float) -> bool:
+        """Cache one topic; True if it was data of a known inverter."""
+        # With several sources, an older value never replaces a newer one
+        if at < self._last_update.get(topic, at):
+            return False
+        self._cache[topic] = payload
+        self._last_update[topic] = at
+        if topic.endswith("/status/reachable"):
+            self._status_seen.set()
+        if topic.startswith(self._prefix):
+            serial, _, path = topic[len(self._prefix):].partition("/")
+            groups = self._fresh.get(serial)
+            if groups is not None and path and not path.startswith("cmd/"):
+                group = field_group(path)
+                groups[group] = max(at, groups.get(group, at))
+                return True
+        return False
+
+    def ingest(self, values: dict[str, str], at: float, pushed: bool = False):
+        """
+        Update from a source other than MQTT: topic paths below the OpenDTU
+        prefix (e.g. `<serial>/0/power`) -> payloads, as of `at`. `pushed`
+        marks data OpenDTU sent on its own (WebSocket), not polled.
+        """
+        inverter_data = False
+        for path, payload in values.items():
+            inverter_data |= self._store(self._prefix + path, payload, at)
+        if pushed and inverter_data:
+            self.push_last = self._clock()
+
+    def push_age(self) -> float:
+        return self._clock() - self.push_last
 
     def _get(self, topic: str, default: str = "0") -> str:
         return self._cache.get(topic, default)
@@ -33,8 +94,33 @@ class OpenDTUAdapter:
     def _inv(self, serial: str, path: str, default: str = "0") -> str:
         return self._get(f"{self.opendtu_topic}/{serial}/{path}", default)
 
+    def get_update_time(self, serial: str, path: str) -> float | None:
+        return self._last_update.get(f"{self.opendtu_topic}/{serial}/{path}")
+
+    def data_age(self, serial: str, group: str = "ac", now: float | None = None) -> float | None:
+        """Seconds since the inverter's newest topic in `group` arrived, None if never."""
+        updated = self._fresh.get(serial, {}).get(group)
+        if updated is None:
+            return None
+        return (self._clock() if now is None else now) - updated
+
+    def is_fresh(self, serial: str, group: str = "ac", max_age_s: float | None = None) -> bool:
+        age = self.data_age(serial, group)
+        return age is not None and age <= (self.flag_after_s if max_age_s is None else max_age_s)
+
+    def has_state(self, serial: str) -> bool:
+        """True once OpenDTU's (retained) reachable status for the inverter arrived."""
+        return f"{self.opendtu_topic}/{serial}/status/reachable" in self._cache
+
+    async def wait_for_state(self, serials: list[str]):
+        while not all(self.has_state(s) for s in serials):
+            self._status_seen.clear()
+            await self._status_seen.wait()
+
     def is_reachable(self, serial: str) -> bool:
-        return self._inv(serial, "status/reachable") == "1"
+        # A retained "1" that OpenDTU stopped refreshing does not count
+        return (self._inv(serial, "status/reachable") == "1"
+                and self.is_fresh(serial, "status", self.exclude_after_s))
 
     def get_name(self, serial: str) -> str:
         return self._inv(serial, "name", serial)
@@ -165,10 +251,12 @@ class OpenDTUAdapter:
         return False
 
     async def check_version_http(self):
+        import aiohttp
+
         url = f"http://{self.ip}/api/system/status"
         auth = aiohttp.BasicAuth(self.user, self.password)
         try:
-            async with aiohttp.ClientSession(timeout=self._timeout) as session:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self._timeout_s)) as session:
                 async with session.get(url, auth=auth) as resp:
                     data = await resp.json()
                     ver = data.get("git_hash", "unknown")
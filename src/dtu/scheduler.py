@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from src.config import Config
+from src.metrics import COMMANDS, DISPATCH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LimitCommand:
+    serial: str
+    limit: int
+    # Lowers the limit below the present output (ends export): sent first
+    reduces: bool
+    first_queued: float
+    queued_at: float
+    on_sent: Callable[[float], None] | None = None
+
+
+class CommandScheduler:
+    """
+    Paces limit commands to what the DTU radio can carry.
+
+    OpenDTU shares one 2.4 GHz radio between polling and commands, so every
+    command delays fresh data from all inverters. Commands go through a token
+    bucket (`max_per_s`, `burst`) per DTU. At most one command per inverter is
+    queued: a newer one replaces it (merged), and one repeating the limit last
+    sent is dropped. Cuts go before increases. An
+    inverter gets no new command within `min_interval_s` of its last one, and
+    increases older than `max_age_s` are dropped as stale. `max_per_s: 0`
+    turns the budget off (merging, ordering and min_interval_s still apply).
+    """
+
+    def __init__(self, cfg: Config, dtu, mqtt, clock=time.monotonic):
+        sched = cfg.opendtu.get("commands", {})
+        self.max_per_s = float(sched.get("max_per_s", 1.0))
+        if self.max_per_s < 0:
+            raise ValueError(f"opendtu.commands.max_per_s must be >= 0, got {self.max_per_s}")
+        self.burst = float(sched.get("burst", 2))
+        self.min_interval_s = float(sched.get("min_interval_s", 2.0))
+        self.max_age_s = float(sched.get("max_age_s", 10.0))
+        self.dtu = dtu
+        self.mqtt = mqtt
+        self._clock = clock
+        self._tokens = self.burst
+        self._refilled_at = clock()
+        self._pending: dict[str, LimitCommand] = {}
+        self._last_sent: dict[str, tuple[float, int]] = {}
+        self._wakeup = asyncio.Event()
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def is_pending(self, serial: str) -> bool:
+        return serial in self._pending
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "sent": self.sent,
+            "merged": self.merged,
+            "dropped": self.dropped,
+        }
+
+    def submit(self, serial: str, limit: int, reduces: bool,
+               on_sent: Callable[[float], None] | None = None):
+        now = self._clock()
+        prev = self._pending.pop(serial, None)
+        if prev is not None:
+            self.merged += 1
+            COMMANDS.inc(result="merged")
+        last = self._last_sent.get(serial)
+        if last is not None and last[1] == limit:
+            # Superseded back to what the inverter already has
+            if prev is None:
+                self.dropped += 1
+                COMMANDS.inc(result="dropped")
+            return
+        self._pending[serial] = LimitCommand(
+            serial=serial,
+            limit=int(limit),
+            reduces=reduces,
+            first_queued=prev.first_queued if prev is not None else now,
+            queued_at=now,
+            on_sent=on_sent,
+        )
+        self._wakeup.set()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.max_per_s)
+        self._refilled_at = now
+
+    def _ready_at(self, cmd: LimitCommand) -> float:
+        last = self._last_sent.get(cmd.serial)
+        return last[0] + self.min_interval_s if last is not None else cmd.first_queued
+
+    async def step(self) -> float | None:
+        """Send what the budget allows now. Returns seconds until the next chance, None when idle."""
+        now = self._clock()
+        self._refill(now)
+
+        for serial, cmd in list(self._pending.items()):
+            if not cmd.reduces and now - cmd.queued_at > self.max_age_s:
+                logger.info("Dropping stale limit %dW for inverter %s", cmd.limit, serial)
+                del self._pending[serial]
+                self.dropped += 1
+                COMMANDS.inc(result="dropped")
+
+        while self._pending:
+            ready = [c for c in self._pending.values() if self._ready_at(c) <= now]
+            if not ready:
+                return min(self._ready_at(c) for c in self._pending.values()) - now
+            paced = self.max_per_s > 0
+            if paced and self._tokens < 1:
+                return (1 - self._tokens) / self.max_per_s
+            cmd = min(ready, key=lambda c: (not c.reduces, c.first_queued))
+            del self._pending[cmd.serial]
+            if paced:
+                self._tokens -= 1
+            try:
+                with DISPATCH_SECONDS.time():
+                    await self.dtu.set_limit(cmd.serial, cmd.limit, self.mqtt)
+            except Exception:
+                logger.exception("Sending limit to inverter %s failed", cmd.serial)
+                self.dropped += 1
+                COMMANDS.inc(result="dropped")
+                continue
+            now = self._clock()
+            self._last_sent[cmd.serial] = (now, cmd.limit)
+            self.sent += 1
+            COMMANDS.inc(result="sent")
+            if cmd.on_sent is not None:
+                cmd.on_sent(now)
+        return None
+
+    async def run(self):
+        while True:
+            delay = await self.step()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
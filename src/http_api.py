@@ -0,0 +1,115 @@
+"""
+HTTP control API. Imported by main() when the service starts, so importing
+src.main (CLI checks, tests) does not pay for aiohttp.web.
+"""
+import asyncio
+import logging
+
+from aiohttp import web
+
+from src.compliance import ComplianceTracker
+from src.metrics import REGISTRY
+from src.profiling import Profiling, setup_routes as setup_profiling_routes
+from src.state_snapshot import StateSnapshot
+from src.streaming import StateBroadcaster
+from src.timeseries import TimeSeriesStore
+from src.tracing import Tracer
+
+logger = logging.getLogger("zero-export")
+
+
+ENABLED_KEY = web.AppKey("enabled", asyncio.Event)
+TRACER_KEY = web.AppKey("tracer", Tracer)
+STORE_KEY = web.AppKey("store", TimeSeriesStore)
+COMPLIANCE_KEY = web.AppKey("compliance", ComplianceTracker)
+
+
+async def _http_toggle(request):
+    enabled = request.app[ENABLED_KEY]
+    if enabled.is_set():
+        enabled.clear()
+        logger.info("Zero-export DISABLED via HTTP")
+    else:
+        enabled.set()
+        logger.info("Zero-export ENABLED via HTTP")
+    redirect = request.query.get("redirect")
+    if redirect:
+        raise web.HTTPFound(location=redirect)
+    state = "on" if enabled.is_set() else "off"
+    return web.json_response({"enabled": state})
+
+
+async def _http_status(request):
+    enabled = request.app[ENABLED_KEY]
+    state = "on" if enabled.is_set() else "off"
+    return web.json_response({"enabled": state})
+
+
+async def _http_metrics(request):
+    return web.Response(
+        body=REGISTRY.render().encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+async def _http_traces(request):
+    tracer = request.app[TRACER_KEY]
+    if not tracer.enabled:
+        return web.json_response({"error": "tracing disabled"}, status=404)
+    try:
+        limit = int(request.query.get("limit", 20))
+    except ValueError:
+        raise web.HTTPBadRequest(text="limit must be an integer")
+    slow_only = request.match_info.get("kind") == "slow"
+    return web.json_response({"cycles": tracer.query(limit, slow_only)})
+
+
+async def _http_series(request):
+    store = request.app[STORE_KEY]
+    return web.json_response({"series": store.series(request.query.get("prefix", ""))})
+
+
+async def _http_series_query(request):
+    store = request.app[STORE_KEY]
+    key = request.query.get("key")
+    if not key:
+        raise web.HTTPBadRequest(text="key is required")
+    try:
+        args = {name: float(request.query[name]) for name in ("start", "end", "step") if name in request.query}
+        return web.json_response(store.query(key, **args))
+    except KeyError:
+        raise web.HTTPNotFound(text=f"unknown series {key}")
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+
+
+async def _http_compliance(request):
+    return web.json_response(request.app[COMPLIANCE_KEY].state())
+
+
+async def start_http(enabled: asyncio.Event, tracer: Tracer, profiling: Profiling, store: TimeSeriesStore,
+                     broadcaster: StateBroadcaster, snapshot: StateSnapshot, compliance: ComplianceTracker,
+                     host="0.0.0.0", port=8080):
+    app = web.Application()
+    app[ENABLED_KEY] = enabled
+    app[TRACER_KEY] = tracer
+    app[STORE_KEY] = store
+    app[COMPLIANCE_KEY] = compliance
+    setup_profiling_routes(app, profiling)
+    app.router.add_get("/api/toggle", _http_toggle)
+    app.router.add_get("/api/status", _http_status)
+    app.router.add_get("/metrics", _http_metrics)
+    app.router.add_get("/api/traces", _http_traces)
+    app.router.add_get("/api/traces/{kind:slow}", _http_traces)
+    app.router.add_get("/api/series", _http_series)
+    app.router.add_get("/api/series/query", _http_series_query)
+    app.router.add_get("/api/stream", broadcaster.handle_sse)
+    app.router.add_get("/api/ws", broadcaster.handle_ws)
+    app.router.add_get("/api/state", snapshot.handle)
+    app.router.add_get("/api/compliance", _http_compliance)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info("HTTP control API on port %d", port)
+    return runner
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Needed by the running service, but should load on first use, not with src.main
+LAZY_MODULES = ("aiohttp", "aiomqtt", "influxdb_client")
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def measure(module: str = "src.main") -> list[ImportTiming]:
+    """Import `module` in a fresh interpreter under -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True, cwd=ROOT,
+    )
+    timings = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append(ImportTiming(
+            module=name.strip(),
+            self_us=int(self_us),
+            cumulative_us=int(cumulative_us),
+            depth=(len(name) - len(name.lstrip())) // 2,
+        ))
+    return timings
+
+
+def subtree(timings: list[ImportTiming], module: str = "src.main") -> list[ImportTiming]:
+    """`module` and what it imported; the interpreter's own startup imports are left out."""
+    # importtime prints children before their parent
+    end = max(i for i, t in enumerate(timings) if t.module == module and t.depth == 0)
+    start = end
+    while start > 0 and timings[start - 1].depth > 0:
+        start -= 1
+    return timings[start:end + 1]
+
+
+def total_ms(timings: list[ImportTiming], module: str = "src.main") -> float:
+    return subtree(timings, module)[-1].cumulative_us / 1000
+
+
+def report(timings: list[ImportTiming], module: str = "src.main", top: int = 15) -> str:
+    timings = subtree(timings, module)
+    loaded = {t.module for t in timings}
+    lines = [f"{module}: {total_ms(timings, module):.1f} ms ({len(timings)} modules imported)", ""]
+
+    lines.append(f"Direct imports by cumulative time (top {top}):")
+    direct = sorted((t for t in timings if t.depth == 1), key=lambda t: -t.cumulative_us)
+    lines += [f"  {t.cumulative_us / 1000:8.1f} ms  {t.module}" for t in direct[:top]]
+
+    lines += ["", f"Modules by self time (top {top}):"]
+    own = sorted(timings, key=lambda t: -t.self_us)
+    lines += [f"  {t.self_us / 1000:8.1f} ms  {t.module}" for t in own[:top]]
+
+    eager = [m for m in LAZY_MODULES if m in loaded]
+    lines += ["", "Loaded eagerly (should be lazy): " + (", ".join(eager) if eager else "none")]
+    return "\n".join(lines)
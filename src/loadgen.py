@@ -0,0 +1,282 @@
+"""
+Synthetic OpenDTU load: N inverters x M DC channels publishing OpenDTU's
+MQTT topic layout at a fixed poll rate, ingested through MqttClient.run and
+OpenDTUAdapter.handle_mqtt, measuring ingest throughput, end-to-end lag,
+event loop lag and CPU. Results are written as JSON.
+
+    python -m src.loadgen --inverters 10,50,200 --channels 4 --rate 1 -o loadgen.jsonl
+    python -m src.loadgen --broker localhost:1883 ...   # through a real broker
+
+Without --broker, an in-process broker stand-in replaces the aiomqtt client,
+so the measurement is MqttClient's dispatch and the adapter's ingest alone.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+
+from src.config import Config
+from src.dtu.livedata import AC_FIELDS, DC_FIELDS, INV_FIELDS, STATUS_FIELDS
+from src.dtu.opendtu import OpenDTUAdapter
+from src.mqtt_client import MqttClient
+
+logger = logging.getLogger(__name__)
+
+# Published last in each inverter's round, so its arrival ends the round
+ROUND_END = "status/last_update"
+
+
+def serials(count: int) -> list[str]:
+    return [f"1161{i:08d}" for i in range(count)]
+
+
+def round_messages(prefix: str, serial: str, channels: int, rng: random.Random) -> list[tuple[str, str]]:
+    """One OpenDTU poll of one inverter: AC and inverter values, each DC channel, then status."""
+    ac = rng.uniform(0, 800)
+    base = f"{prefix}/{serial}"
+    messages = [(f"{base}/0/{path}", f"{ac * rng.uniform(0.9, 1.1):.1f}")
+                for path in (*AC_FIELDS.values(), *INV_FIELDS.values())]
+    for ch in range(1, channels + 1):
+        messages += [(f"{base}/{ch}/{path}", f"{rng.uniform(0, 400):.1f}") for path in DC_FIELDS.values()]
+    messages += [(f"{base}/status/{path}", "1" if path in ("reachable", "producing") else "600")
+                 for path in STATUS_FIELDS]
+    messages.append((f"{base}/{ROUND_END}", str(int(time.time()))))
+    return messages
+
+
+class _Message:
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+
+
+class StandInBroker:
+    """Fan-out of published messages to subscribed stand-in clients, in process."""
+
+    def __init__(self):
+        self.clients: list["StandInClient"] = []
+        self.backlog_max = 0
+
+    def route(self, topic: str, payload):
+        import aiomqtt
+
+        if isinstance(payload, str):
+            payload = payload.encode()
+        for client in self.clients:
+            if any(aiomqtt.Topic(topic).matches(p) for p in client.subscriptions):
+                client.queue.put_nowait(_Message(topic, payload))
+                self.backlog_max = max(self.backlog_max, client.queue.qsize())
+
+
+class StandInClient:
+    """The parts of aiomqtt.Client that MqttClient uses: unbounded incoming queue, like aiomqtt's default."""
+
+    def __init__(self, broker: StandInBroker):
+        self.broker = broker
+        self.subscriptions: list[str] = []
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        self.broker.clients.append(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.broker.clients.remove(self)
+
+    async def subscribe(self, pattern: str):
+        self.subscriptions.append(pattern)
+
+    async def publish(self, topic: str, payload=None, qos: int = 0, retain: bool = False):
+        self.broker.route(topic, payload)
+
+    @property
+    def messages(self):
+        return self._messages()
+
+    async def _messages(self):
+        while True:
+            yield await self.queue.get()
+
+
+@dataclass
+class LoadResult:
+    inverters: int
+    channels: int
+    rate_hz: float
+    duration_s: float
+    mode: str
+    messages_per_round: int
+    published: int = 0
+    ingested: int = 0
+    ingest_per_s: float = 0.0
+    # Scheduled publish time of an inverter's round to its last message ingested
+    lag_ms: dict = field(default_factory=dict)
+    loop_lag_ms: dict = field(default_factory=dict)
+    # Of one core, the whole process: includes the in-process generator
+    cpu_percent: float = 0.0
+    backlog_max: int | None = None
+    # Published but not ingested within the drain time
+    lagging: bool = False
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 3)
+
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": round(values[-1] * 1000, 3)}
+
+
+async def _loop_lag(samples: list[float], interval_s: float = 0.01):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval_s)
+        samples.append(max(0.0, time.perf_counter() - started - interval_s))
+
+
+async def run_load(inverters: int, channels: int = 4, rate_hz: float = 1.0, duration_s: float = 10.0,
+                   broker: str | None = None, drain_s: float = 5.0, seed: int = 1) -> LoadResult:
+    """Publish `rate_hz` rounds per inverter per second for `duration_s`, staggered like OpenDTU's polling."""
+    import aiomqtt
+
+    prefix = "solar"
+    cfg = Config({
+        "mqtt": {"opendtu_topic": prefix},
+        "opendtu": {"ip": "127.0.0.1", "user": "admin", "password": ""},
+        "inverters": [{"serial": s} for s in serials(inverters)],
+    })
+    dtu = OpenDTUAdapter(cfg, cfg.inverters)
+    host, _, port = (broker or "stand-in").partition(":")
+    mqtt = MqttClient(host, int(port or 1883), client_id=f"loadgen-ingest-{os.getpid()}", topic_prefix="loadgen")
+
+    stand_in = None
+    if broker is None:
+        stand_in = StandInBroker()
+        mqtt.connect = _connect_stand_in(mqtt, stand_in)
+        publisher = StandInClient(stand_in)
+    else:
+        publisher = aiomqtt.Client(hostname=host, port=int(port or 1883), identifier=f"loadgen-{os.getpid()}")
+
+    rng = random.Random(seed)
+    rounds = [round_messages(prefix, s, channels, rng) for s in serials(inverters)]
+    per_round = len(rounds[0])
+    # Round end topic -> scheduled times of its rounds in flight (several once ingest falls behind)
+    scheduled: dict[str, deque] = {messages[-1][0]: deque() for messages in rounds}
+    lags: list[float] = []
+
+    async def round_done(topic: str, payload: str):
+        lags.append(time.perf_counter() - scheduled[topic].popleft())
+
+    mqtt.on_topic(f"{prefix}/#", dtu.handle_mqtt)
+    mqtt.on_topic(f"{prefix}/+/{ROUND_END}", round_done)
+
+    loop_lags: list[float] = []
+    tasks = [asyncio.create_task(mqtt.run()), asyncio.create_task(_loop_lag(loop_lags))]
+    result = LoadResult(inverters, channels, rate_hz, duration_s, "broker" if broker else "stand-in", per_round)
+    try:
+        await asyncio.wait_for(mqtt.wait_connected(), 10)
+        async with publisher:
+            # Let subscriptions settle before the first message
+            await asyncio.sleep(0.05)
+            step = 1 / (rate_hz * inverters)
+            cpu_start, start = time.process_time(), time.perf_counter()
+            n = 0
+            while True:
+                due = start + n * step
+                if due - start >= duration_s:
+                    break
+                delay = due - time.perf_counter()
+                # Behind schedule: still yield, as a broker would keep delivering
+                await asyncio.sleep(max(delay, 0))
+                messages = rounds[n % inverters]
+                scheduled[messages[-1][0]].append(due)
+                for topic, payload in messages:
+                    await publisher.publish(topic, payload)
+                result.published += per_round
+                n += 1
+            published_rounds = n
+            drain_until = time.perf_counter() + drain_s
+            while len(lags) < published_rounds and time.perf_counter() < drain_until:
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - start
+            result.cpu_percent = round(100 * (time.process_time() - cpu_start) / elapsed, 1)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    result.ingested = len(lags) * per_round
+    result.ingest_per_s = round(result.ingested / elapsed, 1)
+    result.lag_ms = _percentiles(lags)
+    result.loop_lag_ms = _percentiles(loop_lags)
+    result.lagging = len(lags) < published_rounds
+    if stand_in is not None:
+        result.backlog_max = stand_in.backlog_max
+    return result
+
+
+def _connect_stand_in(mqtt: MqttClient, broker: StandInBroker):
+    async def connect():
+        mqtt._client = StandInClient(broker)
+    return connect
+
+
+def report(results: list[LoadResult]) -> dict:
+    return {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": [asdict(r) for r in results],
+    }
+
+
+def write_report(doc: dict, path: str | None):
+    """JSON to stdout or a file; a .jsonl file gets one line per run appended, for tracking over time."""
+    if path is None:
+        json.dump(doc, sys.stdout, indent=2)
+        print()
+    elif path.endswith(".jsonl"):
+        with open(path, "a") as f:
+            f.write(json.dumps(doc) + "\n")
+    else:
+        with open(path, "w") as f:
+            json.dump(doc, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.loadgen", description="Synthetic OpenDTU MQTT load")
+    parser.add_argument("--inverters", default="10", help="inverter count, or several comma separated")
+    parser.add_argument("--channels", type=int, default=4, help="DC channels per inverter")
+    parser.add_argument("--rate", type=float, default=1.0, help="polls per inverter per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--broker", help="host:port of an MQTT broker; default: in-process stand-in")
+    parser.add_argument("-o", "--output", help="JSON file (.jsonl: append); stdout when omitted")
+    args = parser.parse_args(argv)
+
+    results = []
+    for count in (int(n) for n in args.inverters.split(",")):
+        result = asyncio.run(run_load(count, args.channels, args.rate, args.duration, args.broker))
+        logger.info("%d inverters: %.0f msg/s ingested, lag p99 %s ms, loop lag p99 %s ms, CPU %.0f%%%s",
+                    count, result.ingest_per_s, result.lag_ms.get("p99"), result.loop_lag_ms.get("p99"),
+                    result.cpu_percent, " (falling behind)" if result.lagging else "")
+        results.append(result)
+    write_report(report(results), args.output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    main()
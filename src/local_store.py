@@ -0,0 +1,344 @@
+"""
+Embedded telemetry storage: append-only, memory-mapped columnar segments on
+local disk, for sites without InfluxDB.
+
+Points are partitioned by time (`partition_s`). The open partition is
+written to raw segments, each a preallocated file of fixed capacity:
+
+    header | t: float64 * capacity | series id: uint32 * capacity | value: float64 * capacity
+
+and the row count in the header is updated after every row, so a crash
+loses at most the row being written. Once a partition is closed, its raw
+segments are compacted into one segment sorted by (series, time) with a
+series index, which range scans bisect. Partitions older than
+`retention_s` are deleted. Series ids map to TimeSeriesStore keys in
+`series.json`.
+
+Writes and queries run on the event loop; maintain() is meant for a worker
+thread. `_lock` covers opening a raw segment, picking the segments to
+compact and swapping files.
+"""
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+
+from src.config import Config
+from src.data_logger import influx_enabled
+from src.timeseries import TimeSeriesStore
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ZXSEG1"
+# magic, flags, capacity, row count, index entries, partition start
+HEADER = struct.Struct("<6sHIIId")
+HEADER_SIZE = 64
+COUNT_OFFSET = struct.calcsize("<6sHI")
+INDEX_ENTRY = struct.Struct("<III")  # series id, first row, row count
+SORTED = 1
+ROW_BYTES = 8 + 4 + 8
+
+
+class Segment:
+    """One segment file, mapped into memory."""
+
+    def __init__(self, path: Path, writable: bool = False):
+        self.path = path
+        self._file = open(path, "r+b" if writable else "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, self.flags, self.capacity, self.count, index_count, self.partition = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a telemetry segment")
+        view = memoryview(self._mm)
+        cap = self.capacity
+        self.ts = view[HEADER_SIZE:HEADER_SIZE + 8 * cap].cast("d")
+        self.sids = view[HEADER_SIZE + 8 * cap:HEADER_SIZE + 12 * cap].cast("I")
+        self.values = view[HEADER_SIZE + 12 * cap:HEADER_SIZE + 20 * cap].cast("d")
+        # series id -> (first row, count) in sorted segments, row indices in raw ones
+        self.index: dict[int, tuple[int, int]] = {}
+        self.rows: dict[int, array] = {}
+        if self.flags & SORTED:
+            offset = HEADER_SIZE + ROW_BYTES * cap
+            for i in range(index_count):
+                sid, first, n = INDEX_ENTRY.unpack_from(self._mm, offset + i * INDEX_ENTRY.size)
+                self.index[sid] = (first, n)
+        else:
+            for i in range(self.count):
+                self.rows.setdefault(self.sids[i], array("I")).append(i)
+
+    @classmethod
+    def create(cls, path: Path, partition: float, capacity: int, flags: int = 0, index_count: int = 0):
+        size = HEADER_SIZE + ROW_BYTES * capacity + INDEX_ENTRY.size * index_count
+        with open(path, "wb") as f:
+            f.truncate(size)
+            f.write(HEADER.pack(MAGIC, flags, capacity, 0, index_count, partition))
+        return cls(path, writable=True)
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def append(self, t: float, sid: int, value: float):
+        i = self.count
+        self.ts[i] = t
+        self.sids[i] = sid
+        self.values[i] = value
+        self.count = i + 1
+        # Row first, then the count that makes it visible
+        struct.pack_into("<I", self._mm, COUNT_OFFSET, self.count)
+        self.rows.setdefault(sid, array("I")).append(i)
+
+    def scan(self, sid: int, start: float, end: float) -> list[tuple[float, float]]:
+        """(t, value) of one series with start <= t < end."""
+        ts, values = self.ts, self.values
+        if self.flags & SORTED:
+            if sid not in self.index:
+                return []
+            first, n = self.index[sid]
+            lo = bisect.bisect_left(ts, start, first, first + n)
+            hi = bisect.bisect_left(ts, end, lo, first + n)
+            return list(zip(ts[lo:hi], values[lo:hi]))
+        return [(ts[i], values[i]) for i in self.rows.get(sid, ()) if start <= ts[i] < end]
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        for name in ("ts", "sids", "values"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._mm.close()
+        self._file.close()
+
+
+def write_sorted(path: Path, partition: float, rows: list[tuple[int, float, float]]):
+    """Write (series id, t, value) rows as one compacted segment, atomically."""
+    rows.sort()
+    index = []
+    for i, (sid, _, _) in enumerate(rows):
+        if not index or index[-1][0] != sid:
+            index.append([sid, i, 0])
+        index[-1][2] += 1
+    tmp = path.with_suffix(".tmp")
+    seg = Segment.create(tmp, partition, len(rows), SORTED, len(index))
+    try:
+        for i, (sid, t, value) in enumerate(rows):
+            seg.ts[i] = t
+            seg.sids[i] = sid
+            seg.values[i] = value
+        offset = HEADER_SIZE + ROW_BYTES * len(rows)
+        for i, entry in enumerate(index):
+            INDEX_ENTRY.pack_into(seg._mm, offset + i * INDEX_ENTRY.size, *entry)
+        struct.pack_into("<I", seg._mm, COUNT_OFFSET, len(rows))
+        seg.flush()
+    finally:
+        seg.close()
+    os.replace(tmp, path)
+
+
+class LocalStore:
+    """Telemetry points on local disk, written through DataLogger.record."""
+
+    COMPACT_GRACE_S = 60
+
+    def __init__(self, cfg: Config, path: str | os.PathLike, clock=time.time):
+        ls = cfg.get("local_store", {})
+        self.path = Path(path)
+        self.clock = clock
+        self.partition_s = float(ls.get("partition_s", 3600))
+        self.segment_rows = int(ls.get("segment_rows", 65536))
+        self.retention_s = float(ls.get("retention_s", 3 * 86400))
+        measurements = ls.get("measurements")
+        self.measurements = set(measurements) if measurements else None
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._catalog = self.path / "series.json"
+        self._keys: list[str] = []
+        self._sids: dict[str, int] = {}
+        if self._catalog.exists():
+            self._keys = json.loads(self._catalog.read_text())
+            self._sids = {k: i for i, k in enumerate(self._keys)}
+        self._active: Segment | None = None
+        # Read-only mappings of closed segments, opened on demand
+        self._open: dict[Path, Segment] = {}
+        self._lock = threading.Lock()
+
+    # Writing
+
+    def _sid(self, key: str) -> int:
+        sid = self._sids.get(key)
+        if sid is None:
+            sid = self._sids[key] = len(self._keys)
+            self._keys.append(key)
+            tmp = self._catalog.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._keys))
+            os.replace(tmp, self._catalog)
+        return sid
+
+    def _partition(self, t: float) -> float:
+        return t // self.partition_s * self.partition_s
+
+    def _segment_for(self, t: float) -> Segment:
+        partition = self._partition(t)
+        seg = self._active
+        if seg is not None and seg.partition == partition and not seg.full:
+            return seg
+        with self._lock:
+            if seg is not None:
+                seg.close()
+            # Numbers keep growing, so a late segment never reuses the name of one being compacted
+            seqs = [int(p.stem.split("-")[1]) for p in self._raw_paths(partition)]
+            path = self.path / f"{int(partition)}-{max(seqs, default=-1) + 1:04d}.raw"
+            self._active = Segment.create(path, partition, self.segment_rows)
+        return self._active
+
+    def record(self, measurement: str, fields: dict, tags: dict | None = None, t: float | None = None):
+        if self.measurements is not None and measurement not in self.measurements:
+            return
+        t = self.clock() if t is None else t
+        seg = self._segment_for(t)
+        for field, value in fields.items():
+            if isinstance(value, bool):
+                value = float(value)
+            elif not isinstance(value, (int, float)):
+                continue
+            if seg.full:
+                seg = self._segment_for(t)
+            seg.append(t, self._sid(TimeSeriesStore.key(measurement, field, tags)), float(value))
+
+    def flush(self):
+        if self._active is not None:
+            self._active.flush()
+
+    # Maintenance
+
+    def _raw_paths(self, partition: float) -> list[Path]:
+        return sorted(self.path.glob(f"{int(partition)}-*.raw"))
+
+    def partitions(self) -> list[float]:
+        starts = {float(p.name.split("-")[0].split(".")[0]) for p in self.path.glob("*.raw")}
+        starts |= {float(p.stem) for p in self.path.glob("*.seg")}
+        return sorted(starts)
+
+    def _release(self, path: Path):
+        seg = self._open.pop(path, None)
+        if seg is not None:
+            seg.close()
+
+    def compact(self, partition: float):
+        """Merge a closed partition's segments into one sorted segment."""
+        with self._lock:
+            # A late point may have reopened the partition; its segments are
+            # compacted once it is left again
+            active = self._active
+            if active is not None and active.partition == partition:
+                return
+            sources = self._raw_paths(partition)
+        if not sources:
+            return
+        target = self.path / f"{int(partition)}.seg"
+        if target.exists():
+            sources.append(target)
+        rows = []
+        for path in sources:
+            seg = Segment(path)
+            try:
+                rows.extend(zip(seg.sids[:seg.count], seg.ts[:seg.count], seg.values[:seg.count]))
+            finally:
+                seg.close()
+        write_sorted(target, partition, rows)
+        with self._lock:
+            for path in sources:
+                self._release(path)
+                if path != target:
+                    path.unlink()
+        logger.debug("Compacted %d segment(s) of partition %d, %d rows", len(sources), partition, len(rows))
+
+    def release_idle(self, now: float | None = None):
+        """Close the segment being written once its partition is over (event loop only)."""
+        now = self.clock() if now is None else now
+        seg = self._active
+        if seg is not None and seg.partition + self.partition_s + self.COMPACT_GRACE_S <= now:
+            seg.close()
+            self._active = None
+
+    def compact_closed(self, now: float | None = None):
+        """Compact closed partitions and drop those past retention (any thread)."""
+        now = self.clock() if now is None else now
+        for partition in self.partitions():
+            end = partition + self.partition_s
+            if end <= now - self.retention_s:
+                with self._lock:
+                    for path in [*self._raw_paths(partition), self.path / f"{int(partition)}.seg"]:
+                        self._release(path)
+                        path.unlink(missing_ok=True)
+            # Late points (clock steps) may still arrive just after the end
+            elif end + self.COMPACT_GRACE_S <= now:
+                self.compact(partition)
+
+    def maintain(self, now: float | None = None):
+        self.release_idle(now)
+        self.compact_closed(now)
+
+    # Reading
+
+    def series(self, prefix: str = "") -> list[str]:
+        return sorted(k for k in self._keys if k.startswith(prefix))
+
+    def _segments(self, partition: float) -> list[Segment]:
+        paths = [self.path / f"{int(partition)}.seg", *self._raw_paths(partition)]
+        segments = []
+        for path in paths:
+            if self._active is not None and path == self._active.path:
+                segments.append(self._active)
+            elif path.exists():
+                seg = self._open.get(path)
+                if seg is None:
+                    seg = self._open[path] = Segment(path)
+                segments.append(seg)
+        return segments
+
+    def query(self, key: str, start: float, end: float) -> list[tuple[float, float]]:
+        """(t, value) of one series with start <= t < end, oldest first."""
+        sid = self._sids.get(key)
+        if sid is None:
+            raise KeyError(key)
+        points = []
+        for partition in self.partitions():
+            if partition + self.partition_s <= start or partition >= end:
+                continue
+            part = []
+            with self._lock:
+                for seg in self._segments(partition):
+                    part.extend(seg.scan(sid, start, end))
+            # Raw segments follow the wall clock, which may step back
+            part.sort()
+            points.extend(part)
+        return points
+
+    def close(self):
+        if self._active is not None:
+            self._active.close()
+            self._active = None
+        for seg in self._open.values():
+            seg.close()
+        self._open.clear()
+
+
+def create_local_store(cfg: Config) -> LocalStore | None:
+    """The local store if `local_store.enabled` (auto: when InfluxDB is not written)."""
+    ls = cfg.get("local_store", {})
+    enabled = ls.get("enabled", "auto")
+    if enabled == "auto":
+        enabled = not influx_enabled(cfg)
+    if not enabled:
+        return None
+    return LocalStore(cfg, ls.get("path") or os.path.join(cfg.get("state_dir", "state"), "telemetry"))
@@ -4,17 +4,40 @@ import logging
 import signal
 import sys
 import os
-
-from aiohttp import web
+import time
+from dataclasses import asdict
+from functools import partial
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.config import load_config
 from src.mqtt_client import MqttClient
-from src.dtu.opendtu import OpenDTUAdapter
-from src.meters.powermeter import PowerMeter
-from src.controller import ZeroExportController
+from src.dtu.livedata import HttpLivedataSource, create_push_source
+from src.dtu.opendtu import FIELD_GROUPS, OpenDTUAdapter
+from src.dtu.scheduler import CommandScheduler
+from src.meters.group import create_meter
+from src.meters.guard import GuardedMeter
+from src.meters.filter import GridFilter
+from src.meters.sampler import AdaptiveSampler
+from src.controller import ZeroExportController, create_controller
 from src.data_logger import DataLogger
+from src.local_store import create_local_store
+from src.allocation import AllocationUnit, create_allocator
+from src.compliance import ComplianceTracker
+from src.response_model import ResponseModel
+from src.tracing import Tracer
+from src.timeseries import TimeSeriesStore
+from src.streaming import StateBroadcaster, state_frame
+from src.shm_state import (
+    ENABLED, FRESH, METER_STALE, PRODUCING, REACHABLE, SharedStateWriter, create_shared_state,
+)
+from src.state_snapshot import StateSnapshot
+from src.startup import Readiness
+from src.profiling import Profiling
+from src.metrics import (
+    REGISTRY, METER_READ_SECONDS, COMPUTE_SECONDS, CYCLE_SECONDS, WAIT_SECONDS,
+    INVERTER_STALENESS, INVERTER_DATA_AGE, COMMAND_QUEUE_DEPTH,
+)
 
 logging.basicConfig(
     format="%(asctime)s %(levelname)-8s %(message)s",
@@ -39,58 +62,195 @@ async def _handle_enable_cmd(topic: str, payload: str):
         logger.info("Zero-export DISABLED (paused)")
 
 
-async def _http_toggle(request):
-    if _enabled.is_set():
-        _enabled.clear()
-        logger.info("Zero-export DISABLED via HTTP")
-    else:
-        _enabled.set()
-        logger.info("Zero-export ENABLED via HTTP")
-    redirect = request.query.get("redirect")
-    if redirect:
-        raise web.HTTPFound(location=redirect)
-    state = "on" if _enabled.is_set() else "off"
-    return web.json_response({"enabled": state})
-
-
-async def _http_status(request):
-    state = "on" if _enabled.is_set() else "off"
-    return web.json_response({"enabled": state})
+def _register_metrics(cfg, dtu: OpenDTUAdapter, scheduler: CommandScheduler):
+    """Gauges computed at scrape time from state the loop already keeps."""
+    def collect():
+        now = time.monotonic()
+        for inv in cfg.inverters:
+            for group in FIELD_GROUPS:
+                age = dtu.data_age(inv.serial, group, now)
+                if age is not None:
+                    INVERTER_DATA_AGE.set(age, serial=inv.serial, group=group)
+                    if group == "ac":
+                        INVERTER_STALENESS.set(age, serial=inv.serial)
+        COMMAND_QUEUE_DEPTH.set(scheduler.queue_depth)
+    REGISTRY.add_collector(collect)
+
+
+async def _wait_for_inverters(dtu: OpenDTUAdapter, response: ResponseModel,
+                              scheduler: CommandScheduler, serials: list[str], timeout: float):
+    """Sleep until the commanded inverters have settled or the predicted time is up."""
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(0.5, remaining))
+        pending = False
+        for serial in serials:
+            model = response.get(serial)
+            sample_at = dtu.get_update_time(serial, "0/power")
+            if sample_at is not None:
+                model.observe(sample_at, dtu.get_ac_power(serial))
+            pending |= model.settling or scheduler.is_pending(serial)
+        if not pending:
+            return
+
+
+def _state_snapshot(cfg, controller, grid, filtered, dtu: OpenDTUAdapter,
+                    scheduler: CommandScheduler, shares: dict) -> dict:
+    """Everything /api/state reports, gathered once per cycle."""
+    ctrl = cfg.control
+    now = time.monotonic()
+    inverters = {}
+    for inv in cfg.inverters:
+        age = dtu.data_age(inv.serial, "ac", now)
+        inverters[inv.serial] = {
+            "name": dtu.get_name(inv.serial),
+            "enabled": bool(inv.enabled),
+            "reachable": dtu.is_reachable(inv.serial),
+            "producing": dtu.is_producing(inv.serial),
+            "power": dtu.get_ac_power(inv.serial),
+            "dc_power": dtu.get_dc_power(inv.serial),
+            "limit": dtu.get_limit_absolute(inv.serial),
+            "limit_relative": dtu.get_limit_relative(inv.serial),
+            "temperature": dtu.get_temperature(inv.serial),
+            "yield_day": dtu.get_yield_day(inv.serial),
+            "share": shares.get(inv.serial),
+            "age_s": round(age, 1) if age is not None else None,
+            "fresh": dtu.is_fresh(inv.serial, "ac"),
+        }
+    return {
+        "time": round(time.time(), 3),
+        "enabled": _enabled.is_set(),
+        "config": {
+            "target_point_w": ctrl.target_point_w,
+            "tolerance_w": ctrl.tolerance_w,
+            "min_point_w": ctrl.min_point_w,
+            "max_point_w": ctrl.max_point_w,
+            "allocation": ctrl.get("allocation", "proportional"),
+            "grid_filter": cfg.powermeter.get("filter", {}).get("type", "none"),
+            "inverters": len(cfg.inverters),
+        },
+        "controller": controller.state(),
+        "meter": {**asdict(grid), "filtered": round(filtered.value, 1)},
+        "inverters": inverters,
+        "commands": scheduler.stats(),
+        "dtu_online": dtu.is_dtu_online(),
+    }
+
+
+def _publish_shared(shared: SharedStateWriter, cfg, grid, filtered, dtu: OpenDTUAdapter, setpoint: float,
+                    meter_stale: bool):
+    """
+    The cycle's grid reading, setpoint and inverter values for same-host
+    sidecars. `meter_stale` is the meter guard's verdict; a fallback reading
+    younger than stale_after_s only shows in the meter age.
+    """
+    now = time.monotonic()
+    inverters = []
+    for inv in cfg.inverters:
+        serial = str(inv.serial)
+        flags = ((REACHABLE if dtu.is_reachable(serial) else 0)
+                 | (PRODUCING if dtu.is_producing(serial) else 0)
+                 | (FRESH if dtu.is_fresh(serial, "ac") else 0))
+        inverters.append((serial, dtu.get_ac_power(serial), dtu.get_limit_absolute(serial),
+                          dtu.data_age(serial, "ac", now), flags))
+    flags = (ENABLED if _enabled.is_set() else 0) | (METER_STALE if meter_stale else 0)
+    shared.publish(grid.power, grid.voltage, filtered.value, grid.age_s or 0.0, setpoint, flags, inverters)
+
+
+def _allocation_units(inverters: list, inverter_watts: dict, dtu: OpenDTUAdapter,
+                      response: ResponseModel, now: float) -> list[AllocationUnit]:
+    return [
+        AllocationUnit(
+            serial=inv.serial,
+            max_watt=inv.max_watt,
+            inverter_watt=inv.inverter_watt,
+            min_watt=int(inv.inverter_watt * inv.min_watt_percent / 100),
+            compensate_factor=inv.get("compensate_factor", 1.0),
+            output=inverter_watts[inv.serial],
+            limit=dtu.get_limit_absolute(inv.serial),
+            settled=not response.enabled or response.get(inv.serial).remaining(now) == 0,
+        )
+        for inv in inverters
+    ]
 
 
-async def _start_http(host="0.0.0.0", port=8080):
-    app = web.Application()
-    app.router.add_get("/api/toggle", _http_toggle)
-    app.router.add_get("/api/status", _http_status)
-    runner = web.AppRunner(app)
-    await runner.setup()
-    site = web.TCPSite(runner, host, port)
-    await site.start()
-    logger.info("HTTP control API on port %d", port)
-    return runner
+def _limit_sent(model, sent_shares: dict, serial: str, from_w: float, to_w: int, sent_at: float):
+    """
+    Start the response model transition and record the share once the
+    scheduler actually sends: a dropped command stays unsent, so the loop
+    resends it.
+    """
+    model.command(sent_at, from_w, to_w)
+    sent_shares[serial] = to_w
+
+
+def _account(compliance: ComplianceTracker, telemetry: DataLogger, grid):
+    """
+    Feed a fresh meter reading into energy accounting, recording completed
+    intervals. Accounted at the time it was read: a meter group's timestamp
+    is that of its oldest member, which may not advance between reads.
+    """
+    if grid.age_s:
+        return
+    for stats in compliance.observe(grid.power, time.time()):
+        fields = stats.to_dict()
+        fields.pop("length_s")
+        telemetry.record("compliance", fields, {"interval": f"{stats.length_s:g}s"})
+
+
+async def _sample_grid(sampler: AdaptiveSampler, grid_filter: GridFilter,
+                       compliance: ComplianceTracker, telemetry: DataLogger):
+    """Keep feeding the grid filter (and accounting) while the loop waits for the inverters."""
+    while True:
+        await asyncio.sleep(sampler.interval_s)
+        try:
+            grid = await sampler.read()
+        except Exception as e:
+            logger.debug("Meter sample during wait failed: %s", e)
+            continue
+        _account(compliance, telemetry, grid)
+        if grid.age_s:
+            continue
+        grid_filter.update(grid.power, time.monotonic())
 
 
 async def control_loop(
     cfg, mqtt: MqttClient, dtu: OpenDTUAdapter,
-    meter: PowerMeter, controller: ZeroExportController, telemetry: DataLogger,
+    meter: GuardedMeter, controller: ZeroExportController, telemetry: DataLogger,
+    response: ResponseModel, scheduler: CommandScheduler, tracer: Tracer,
+    broadcaster: StateBroadcaster, snapshot: StateSnapshot, readiness: Readiness,
+    compliance: ComplianceTracker, shared: SharedStateWriter | None = None,
 ):
     ctrl = cfg.control
     inverters = cfg.inverters
-    poll_interval = cfg.powermeter.poll_interval_s
     loop_interval = ctrl.loop_interval_s
     limit_timeout = ctrl.set_limit_timeout_s
+    allocator = create_allocator(cfg)
+    grid_filter = GridFilter(cfg)
+    sampler = AdaptiveSampler(cfg, meter)
 
-    await asyncio.sleep(3)
-    await asyncio.sleep(3)
+    await readiness.wait()
+    if readiness.sample is not None:
+        grid_filter.update(readiness.sample.power, time.monotonic())
     logger.info("Control loop starting")
     
     last_sent_limit = -1
-    
-    await dtu.check_version_http()
+    last_sent_shares = {}
+    last_model_save = time.monotonic()
 
     while True:
+        cycle = tracer.cycle()
         try:
+            if sampler.enabled:
+                cycle.stage("sleep")
+                await sampler.wait()
+            cycle_start = time.perf_counter()
+            cycle.stage("inverters")
             active_inverters = []
+            flagged = []
             total_max_watt = 0
             total_min_watt = 0
 
@@ -100,22 +260,60 @@ async def control_loop(
                 if not dtu.is_reachable(inv.serial):
                     logger.warning("Inverter %s not reachable", inv.serial)
                     continue
+                age = dtu.data_age(inv.serial, "ac")
+                if age is None or age > dtu.exclude_after_s:
+                    logger.warning("Inverter %s: no AC data for %s, left out", inv.serial,
+                                   "ever" if age is None else f"{age:.0f}s")
+                    continue
+                if age > dtu.flag_after_s:
+                    flagged.append(inv.serial)
                 active_inverters.append(inv)
                 total_max_watt += inv.max_watt
                 min_w = int(inv.inverter_watt * inv.min_watt_percent / 100)
                 min_w = int(inv.inverter_watt * inv.min_watt_percent / 100)
                 total_min_watt += min_w
 
-            # Calculate total current inverter power (Sensor-Based)
-            total_current_watts = sum(dtu.get_ac_power(i.serial) for i in active_inverters)
+            # Calculate total current inverter power (Sensor-Based).
+            # Samples may predate the last command, so move them along the
+            # learned response trajectory to now.
+            now = time.monotonic()
+            inverter_watts = {}
+            for inv in active_inverters:
+                measured = dtu.get_ac_power(inv.serial)
+                measured_at = dtu.get_update_time(inv.serial, "0/power") or now
+                model = response.get(inv.serial)
+                model.observe(measured_at, measured)
+                if response.enabled:
+                    measured = model.predict(now, measured, measured_at)
+                inverter_watts[inv.serial] = measured
+            total_current_watts = sum(inverter_watts.values())
+            sampler.producing = any(dtu.is_producing(inv.serial) for inv in active_inverters)
             logger.debug("Total Inverter Power: %dW", int(total_current_watts))
 
+            if now - last_model_save > 60:
+                response.save()
+                last_model_save = now
+            compliance.maybe_save(now)
+
             # Poll powermeter (full response)
-            grid = await meter.read_full()
-            grid_watts = grid.power
-            logger.info("Grid power: %dW", int(grid_watts))
+            cycle.stage("meter")
+            with METER_READ_SECONDS.time():
+                grid = await sampler.read()
+            filtered = grid_filter.update(grid.power, time.monotonic())
+            grid_watts = grid_filter.control_value(filtered)
+            _account(compliance, telemetry, grid)
+            logger.info("Grid power: %dW (filtered %dW)", int(grid.power), int(grid_watts))
+
+            cycle.set(grid_raw=grid.power, grid=grid_watts, inverters=total_current_watts)
+            if flagged:
+                cycle.set(inverters_stale=flagged)
+            if grid.age_s:
+                cycle.set(meter_age_s=round(grid.age_s, 1))
+            if grid.stale:
+                cycle.set(meters_stale=grid.stale)
 
             # Record grid telemetry
+            cycle.stage("telemetry")
             telemetry.record("grid", {
                 "power": grid.power,
                 "voltage": grid.voltage,
@@ -124,10 +322,27 @@ async def control_loop(
                 "reactive": grid.reactive,
                 "energy_imported": grid.total,
                 "energy_exported": grid.total_returned,
+                "filtered": filtered.value,
+                "innovation": filtered.innovation,
+                "variance": filtered.variance,
+                "rate": filtered.rate,
+                "poll_rate_hz": sampler.rate_hz,
+                "age_s": grid.age_s,
             })
+            for phase in grid.phases:
+                telemetry.record("grid_phase", {
+                    "power": phase.power,
+                    "voltage": phase.voltage,
+                    "current": phase.current,
+                    "pf": phase.pf,
+                    "reactive": phase.reactive,
+                }, tags={"phase": phase.name})
 
             # Record DTU status
-            telemetry.record("dtu", {"online": 1.0 if dtu.is_dtu_online() else 0.0})
+            telemetry.record("dtu", {
+                "online": 1.0 if dtu.is_dtu_online() else 0.0,
+                **{k: float(v) for k, v in scheduler.stats().items()},
+            })
 
             # Record inverter telemetry
             for inv in active_inverters:
@@ -164,10 +379,23 @@ async def control_loop(
                         "yield_day": yield_day,
                         "yield_total": yield_total,
                         "producing": 1.0 if producing else 0.0,
+                        "data_age_s": dtu.data_age(inv.serial, "ac") or 0.0,
+                        "stale": 1.0 if inv.serial in flagged else 0.0,
                     },
                     tags=inv_tags,
                 )
 
+                params = response.get(inv.serial).params
+                telemetry.record(
+                    "response_model",
+                    {
+                        "dead_time": params.dead_time_s,
+                        "ramp_rate": params.ramp_w_per_s,
+                        "samples": params.samples,
+                    },
+                    tags={"serial": inv.serial},
+                )
+
                 # Per-channel panel telemetry
                 voltages = dtu.get_panel_voltages(inv.serial)
                 currents = dtu.get_panel_currents(inv.serial)
@@ -189,11 +417,26 @@ async def control_loop(
                         tags={"serial": inv.serial, "channel": str(ch + 1)},
                     )
 
+            if active_inverters:
+                readiness.first_control()
+
             # Control: only adjust limits when enabled
+            cycle.stage("publish")
+            if broadcaster.clients:
+                broadcaster.publish(state_frame(
+                    time.time(), _enabled.is_set(), grid.power, last_sent_limit,
+                    {i.serial: (dtu.get_ac_power(i.serial), dtu.get_limit_absolute(i.serial))
+                     for i in active_inverters},
+                ))
             if not _enabled.is_set():
+                snapshot.update(_state_snapshot(cfg, controller, grid, filtered, dtu, scheduler, last_sent_shares))
+                if shared is not None:
+                    _publish_shared(shared, cfg, grid, filtered, dtu, 0.0, meter.is_stale(grid))
                 await mqtt.publish_state("enabled", "false")
+                await mqtt.publish_state("compliance", json.dumps(compliance.state()))
                 telemetry.record("control", {"enabled": 0.0, "setpoint": 0.0})
                 logger.debug("Control paused, data still collected")
+                cycle.stage("sleep")
                 await asyncio.sleep(loop_interval)
                 continue
 
@@ -202,29 +445,58 @@ async def control_loop(
 
             if not active_inverters:
                 logger.warning("No inverters reachable, waiting...")
+                cycle.stage("sleep")
                 await asyncio.sleep(loop_interval)
                 continue
 
-            # Compute new setpoint (Sensor-Based)
-            new_limit = controller.compute(grid_watts, total_current_watts, total_max_watt, total_min_watt)
+            # Compute new setpoint (Sensor-Based). Output still expected from
+            # ramps in flight is credited now instead of being corrected twice.
+            cycle.stage("compute")
+            compute_start = time.perf_counter()
+            control_grid = grid_watts
+            control_current = total_current_watts
+            if response.enabled:
+                pending = sum(response.get(i.serial).remaining(time.monotonic()) for i in active_inverters)
+                control_grid -= pending
+                control_current += pending
+            if meter.is_stale(grid):
+                # No trustworthy grid value: fall back to the configured safe action
+                base = last_sent_limit if last_sent_limit >= 0 else total_current_watts
+                new_limit = meter.stale_limit(base, total_min_watt, total_max_watt)
+                controller.track(new_limit, "stale")
+                logger.warning("Meter stale for %.1fs, %s to %dW", grid.age_s, meter.stale_action, new_limit)
+            else:
+                new_limit = controller.compute(
+                    control_grid, control_current, total_max_watt, total_min_watt,
+                    output_fresh=not flagged,
+                )
 
             
-            # Send command if changed
-            if abs(new_limit - last_sent_limit) > 0:
-                 # Distribute limit across inverters proportionally
-                remaining = new_limit
+            # Distribute limit across inverters
+            units = _allocation_units(active_inverters, inverter_watts, dtu, response, now)
+            shares = allocator.allocate(new_limit, units)
+            # Shares still queued in the scheduler are in flight, not moved
+            reshuffled = any(
+                abs(share - last_sent_shares.get(serial, -1)) > ctrl.tolerance_w
+                and not scheduler.is_pending(serial)
+                for serial, share in shares.items()
+            )
+            COMPUTE_SECONDS.observe(time.perf_counter() - compute_start)
+            cycle.set(limit=new_limit, shares=shares)
+
+            # Send command if changed (total, or a share moved by the allocator)
+            if abs(new_limit - last_sent_limit) > 0 or reshuffled:
+                cycle.stage("dispatch")
+                changes = []
                 for inv in active_inverters:
-                    share = int(new_limit * inv.max_watt / total_max_watt)
-                    min_w = int(inv.inverter_watt * inv.min_watt_percent / 100)
-                    share = max(min_w, min(inv.max_watt, share))
-    
-                    factor = inv.get("compensate_factor", 1.0)
-                    if factor != 1.0:
-                        share = int(share * factor)
-                        share = max(min_w, min(inv.inverter_watt, share))
-    
-                    await dtu.set_limit(inv.serial, share, mqtt)
-                    remaining -= share
+                    share = shares[inv.serial]
+                    from_w = inverter_watts[inv.serial]
+                    scheduler.submit(
+                        inv.serial, share, reduces=share < from_w,
+                        on_sent=partial(_limit_sent, response.get(inv.serial), last_sent_shares, inv.serial,
+                                        from_w, share),
+                    )
+                    changes.append((inv.serial, inverter_watts[inv.serial], share))
     
                     telemetry.record(
                         "control",
@@ -236,24 +508,44 @@ async def control_loop(
                 await mqtt.publish_state("limit", new_limit)
                 
                 last_sent_limit = new_limit
-                
-                # Wait for inverter to react (3s + 1s loop = 4s total)
-                logger.info("Adjusted limit to %dW. Waiting 5s...", new_limit)
-                await asyncio.sleep(5)
-            
-            else:
-                # No change. Just loop (Wait 1s).
-                # Publish state (limit) anyway? Or only on change?
-                # Maybe publish grid power every loop.
-                pass
-                
-            await mqtt.publish_state("grid_power", int(grid_watts))
-            
-            # (Deleted inner polling loop)
 
-        except Exception:
-            logger.exception("Control loop error")
+                # Wait for inverters to react: up to the settle time predicted
+                # by the response model, or the fixed legacy 5s when it is off
+                cycle.stage("wait")
+                wait_start = time.perf_counter()
+                sampling = None
+                if grid_filter.kind != "none" or compliance.enabled:
+                    sampling = asyncio.create_task(_sample_grid(sampler, grid_filter, compliance, telemetry))
+                try:
+                    if response.enabled:
+                        wait = response.wait_time(changes)
+                        logger.info("Adjusted limit to %dW. Waiting up to %.1fs...", new_limit, wait)
+                        await _wait_for_inverters(dtu, response, scheduler, [c[0] for c in changes], wait)
+                    else:
+                        logger.info("Adjusted limit to %dW. Waiting 5s...", new_limit)
+                        await asyncio.sleep(5)
+                finally:
+                    if sampling is not None:
+                        sampling.cancel()
+                    WAIT_SECONDS.observe(time.perf_counter() - wait_start)
+
+            cycle.stage("publish")
+            snapshot.update(_state_snapshot(cfg, controller, grid, filtered, dtu, scheduler, last_sent_shares))
+            if shared is not None:
+                _publish_shared(shared, cfg, grid, filtered, dtu, max(last_sent_limit, 0),
+                                meter.is_stale(grid))
+            await mqtt.publish_state("grid_power", int(grid.power))
+            await mqtt.publish_state("dtu_commands", json.dumps(scheduler.stats()))
+            await mqtt.publish_state("compliance", json.dumps(compliance.state()))
+            CYCLE_SECONDS.observe(time.perf_counter() - cycle_start)
+
+        except Exception as e:
+            cycle.fail(e)
+            logger.exception("Control loop error in stage %s", cycle.current_stage)
+            cycle.stage("sleep")
             await asyncio.sleep(loop_interval)
+        finally:
+            tracer.finish(cycle)
 
 
 async def main():
@@ -267,15 +559,24 @@ async def main():
     )
 
     dtu = OpenDTUAdapter(cfg, cfg.inverters)
-    meter = PowerMeter(
-        ip=cfg.powermeter.ip,
-        user=cfg.powermeter.user,
-        password=cfg.powermeter.password,
-        emeter_index=cfg.powermeter.get("emeter_index", 0),
-        meter_type=cfg.powermeter.type,
+    livedata = HttpLivedataSource(cfg, dtu)
+    push_source = create_push_source(cfg, dtu)
+    meter = GuardedMeter(cfg, create_meter(cfg))
+    controller = create_controller(cfg)
+    store = TimeSeriesStore(cfg)
+    telemetry = DataLogger(cfg, store=store, local=create_local_store(cfg))
+    response = ResponseModel(
+        cfg, path=os.path.join(cfg.get("state_dir", "state"), "response_model.json")
+    )
+    response.load()
+    compliance = ComplianceTracker(
+        cfg, path=os.path.join(cfg.get("state_dir", "state"), "compliance.json")
     )
-    controller = ZeroExportController(cfg)
-    telemetry = DataLogger(cfg)
+    compliance.load()
+    scheduler = CommandScheduler(cfg, dtu, mqtt)
+    _register_metrics(cfg, dtu, scheduler)
+    tracer = Tracer(cfg)
+    readiness = Readiness(cfg, mqtt, dtu, meter)
 
     # Register MQTT handlers
     opendtu_topic = cfg.mqtt.opendtu_topic
@@ -298,14 +599,33 @@ async def main():
 
     logger.info("Zero Export Opt starting...")
 
-    http_runner = await _start_http()
+    streaming = cfg.get("streaming", {})
+    broadcaster = StateBroadcaster(
+        depth=int(streaming.get("queue_depth", 4)),
+        max_clients=int(streaming.get("max_clients", 500)),
+    )
+    snapshot = StateSnapshot()
+    shared = create_shared_state(cfg)
+    from src.http_api import start_http
+    http_runner = await start_http(_enabled, tracer, Profiling(cfg), store, broadcaster, snapshot, compliance)
 
     tasks = [
         asyncio.create_task(mqtt.run()),
         asyncio.create_task(telemetry.run()),
-        asyncio.create_task(control_loop(cfg, mqtt, dtu, meter, controller, telemetry)),
+        asyncio.create_task(scheduler.run()),
+        asyncio.create_task(livedata.run()),
+        asyncio.create_task(tracer.run()),
+        # Informational only: must not hold up the first cycle
+        asyncio.create_task(dtu.check_version_http()),
+        asyncio.create_task(control_loop(
+            cfg, mqtt, dtu, meter, controller, telemetry, response, scheduler, tracer, broadcaster,
+            snapshot, readiness, compliance, shared,
+        )),
     ]
 
+    if push_source is not None:
+        tasks.append(asyncio.create_task(push_source.run()))
+
     await stop.wait()
 
     for t in tasks:
@@ -313,6 +633,11 @@ async def main():
     await asyncio.gather(*tasks, return_exceptions=True)
     await telemetry.flush()
     await telemetry.close()
+    tracer.flush()
+    response.save()
+    compliance.save()
+    if shared is not None:
+        shared.close()
     await http_runner.cleanup()
     logger.info("Shutdown complete")
 
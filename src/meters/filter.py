@@ -0,0 +1,225 @@
+import logging
+import math
+from collections import deque
+from dataclasses import dataclass
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FilteredReading:
+    raw: float
+    value: float
+    # Raw minus the value expected before this sample, and the running
+    # variance of that innovation
+    innovation: float = 0.0
+    variance: float = 0.0
+    # Rate of change (W/s) for short-horizon extrapolation
+    rate: float = 0.0
+    bypassed: bool = False
+
+    def predict(self, horizon_s: float) -> float:
+        return self.value + self.rate * horizon_s
+
+
+class _InnovationStats:
+    """
+    Noise variance from the median absolute innovation over recent samples:
+    real load steps are rare outliers and do not inflate the estimate.
+    """
+
+    def __init__(self, window: int = 20):
+        self._abs: deque = deque(maxlen=window)
+
+    def update(self, innovation: float) -> float:
+        self._abs.append(abs(innovation))
+        ordered = sorted(self._abs)
+        sigma = 1.4826 * ordered[len(ordered) // 2]
+        return sigma * sigma
+
+
+class PassthroughFilter:
+    def update(self, raw: float, t: float) -> FilteredReading:
+        return FilteredReading(raw=raw, value=raw)
+
+    def reset(self, raw: float, t: float):
+        pass
+
+
+class EmaFilter:
+    """
+    Exponential smoothing with a time constant rather than a per-sample weight:
+    after a long gap (the wait following a limit command) the newest sample
+    dominates instead of being averaged against a stale value.
+    """
+
+    def __init__(self, time_constant_s: float = 2.0):
+        self.time_constant_s = time_constant_s
+        self._value: float | None = None
+        self._rate = 0.0
+        self._t = 0.0
+        self._stats = _InnovationStats()
+
+    def reset(self, raw: float, t: float):
+        self._value = raw
+        self._rate = 0.0
+        self._t = t
+
+    def update(self, raw: float, t: float) -> FilteredReading:
+        if self._value is None:
+            self.reset(raw, t)
+            return FilteredReading(raw=raw, value=raw)
+        dt = t - self._t
+        alpha = 1.0 - math.exp(-dt / self.time_constant_s) if dt > 0 else 0.0
+        innovation = raw - self._value
+        value = self._value + alpha * innovation
+        if dt > 0:
+            self._rate += alpha * ((value - self._value) / dt - self._rate)
+        self._value, self._t = value, t
+        return FilteredReading(raw, value, innovation, self._stats.update(innovation), self._rate)
+
+
+class MedianFilter:
+    """Median of the last `window` samples, ignoring those older than `max_age_s`."""
+
+    def __init__(self, window: int = 5, max_age_s: float = 5.0):
+        self.max_age_s = max_age_s
+        self._samples: deque = deque(maxlen=window)
+        self._stats = _InnovationStats()
+
+    def reset(self, raw: float, t: float):
+        self._samples.clear()
+        self._samples.append((t, raw))
+
+    @staticmethod
+    def _median(values) -> float:
+        ordered = sorted(values)
+        return ordered[len(ordered) // 2]
+
+    def update(self, raw: float, t: float) -> FilteredReading:
+        while self._samples and t - self._samples[0][0] > self.max_age_s:
+            self._samples.popleft()
+        expected = self._median(v for _, v in self._samples) if self._samples else raw
+        self._samples.append((t, raw))
+        samples = list(self._samples)
+        value = self._median(v for _, v in samples)
+        innovation = raw - expected
+        # Trend across the window: older vs newer half medians
+        rate = 0.0
+        if len(samples) >= 4:
+            half = len(samples) // 2
+            span = samples[-1][0] - samples[0][0]
+            if span > 0:
+                old = self._median(v for _, v in samples[:half])
+                new = self._median(v for _, v in samples[-half:])
+                rate = (new - old) / (span / 2)
+        return FilteredReading(raw, value, innovation, self._stats.update(innovation), rate)
+
+
+class KalmanFilter:
+    """
+    Constant-velocity Kalman filter over [power, rate]. Process noise is the
+    expected load change (W/s^2 as acceleration density), measurement noise
+    the meter's own jitter (W standard deviation).
+    """
+
+    def __init__(self, process_noise: float = 50.0, measurement_noise: float = 15.0):
+        self.q = process_noise
+        self.r = measurement_noise ** 2
+        self._x: list[float] | None = None
+        self._p = [[0.0, 0.0], [0.0, 0.0]]
+        self._t = 0.0
+
+    def reset(self, raw: float, t: float):
+        self._x = [raw, 0.0]
+        self._p = [[self.r, 0.0], [0.0, self.q]]
+        self._t = t
+
+    def update(self, raw: float, t: float) -> FilteredReading:
+        if self._x is None:
+            self.reset(raw, t)
+            return FilteredReading(raw=raw, value=raw, variance=self.r)
+
+        dt = max(t - self._t, 1e-3)
+        self._t = t
+        (p00, p01), (p10, p11) = self._p
+        x0, x1 = self._x
+
+        # Predict
+        x0 = x0 + dt * x1
+        q = self.q
+        p00, p01, p10, p11 = (
+            p00 + dt * (p10 + p01) + dt * dt * p11 + q * dt ** 3 / 3,
+            p01 + dt * p11 + q * dt ** 2 / 2,
+            p10 + dt * p11 + q * dt ** 2 / 2,
+            p11 + q * dt,
+        )
+
+        # Update
+        innovation = raw - x0
+        s = p00 + self.r
+        k0, k1 = p00 / s, p10 / s
+        x0 += k0 * innovation
+        x1 += k1 * innovation
+        self._x = [x0, x1]
+        self._p = [
+            [(1 - k0) * p00, (1 - k0) * p01],
+            [p10 - k1 * p00, p11 - k1 * p01],
+        ]
+        return FilteredReading(raw, x0, innovation, s, x1)
+
+
+FILTERS = {
+    "none": lambda f: PassthroughFilter(),
+    "ema": lambda f: EmaFilter(time_constant_s=float(f.get("time_constant_s", 2.0))),
+    "median": lambda f: MedianFilter(window=int(f.get("window", 5)), max_age_s=float(f.get("max_age_s", 5.0))),
+    "kalman": lambda f: KalmanFilter(
+        process_noise=float(f.get("process_noise", 50.0)),
+        measurement_noise=float(f.get("measurement_noise", 15.0)),
+    ),
+}
+
+
+class GridFilter:
+    """
+    Signal stage between the meter and the controller. Exports bypass the
+    filter: a raw value below `bypass_below_w` by more than `bypass_sigma`
+    standard deviations of the meter noise is passed straight through and the
+    filter is re-seeded with it, so cuts are never delayed by smoothing while
+    noise around a low target does not defeat the filter.
+    """
+
+    def __init__(self, cfg: Config):
+        f = cfg.powermeter.get("filter", {})
+        kind = f.get("type", "none")
+        factory = FILTERS.get(kind)
+        if factory is None:
+            raise ValueError(f"Unknown grid filter type: {kind}")
+        self.kind = kind
+        self.bypass_below = float(f.get("bypass_below_w", cfg.control.min_point_w))
+        self.bypass_sigma = float(f.get("bypass_sigma", 3.0))
+        self.horizon_s = float(f.get("horizon_s", 0.0))
+        self._filter = factory(f)
+        self.last: FilteredReading | None = None
+
+    def update(self, raw: float, t: float) -> FilteredReading:
+        # Noise level as known before this sample, a real drop must not widen its own gate
+        noise = math.sqrt(self.last.variance) if self.last is not None else 0.0
+        reading = self._filter.update(raw, t)
+        if raw < self.bypass_below - self.bypass_sigma * noise:
+            self._filter.reset(raw, t)
+            reading = FilteredReading(raw=raw, value=raw, variance=reading.variance, bypassed=True)
+        elif not math.isfinite(reading.value):
+            logger.warning("Grid filter diverged, re-seeding with raw %.0fW", raw)
+            self._filter.reset(raw, t)
+            reading = FilteredReading(raw=raw, value=raw)
+        self.last = reading
+        return reading
+
+    def control_value(self, reading: FilteredReading) -> float:
+        """Value handed to the controller: filtered, extrapolated by `horizon_s`."""
+        if reading.bypassed:
+            return reading.raw
+        return reading.predict(self.horizon_s)
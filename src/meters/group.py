@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+from src.config import Config
+from src.meters.powermeter import MeterReading, PhaseReading, PowerMeter
+from src.metrics import METER_LATE
+
+logger = logging.getLogger(__name__)
+
+
+class MeterGroupError(Exception):
+    """No usable reading from at least one meter of the group."""
+
+
+@dataclass
+class GroupMember:
+    name: str
+    meter: PowerMeter
+    deadline_s: float
+    # Single-phase meter: the phase it measures, so it joins the per-phase merge
+    phase: str | None = None
+    last: MeterReading | None = field(default=None, repr=False)
+
+
+class MeterGroup:
+    """
+    Several meters read as one grid meter, e.g. one per sub-panel. All meters
+    are polled at once, each bounded by its own deadline, so a read takes as
+    long as the slowest meter (at most its deadline), not the sum. A meter
+    that misses its deadline or fails is represented by its previous reading
+    while that is younger than `max_stale_s`; past that the read fails.
+    """
+
+    def __init__(self, members: list[GroupMember], max_stale_s: float = 5.0, clock=time.time):
+        if not members:
+            raise ValueError("A meter group needs at least one meter")
+        self.members = members
+        self.max_stale_s = max_stale_s
+        self.clock = clock
+
+    async def _read_member(self, member: GroupMember) -> MeterReading | None:
+        try:
+            reading = await asyncio.wait_for(member.meter.read_full(), member.deadline_s)
+        except asyncio.TimeoutError:
+            METER_LATE.inc(meter=member.name)
+            logger.warning("Meter %s missed its %.1fs deadline", member.name, member.deadline_s)
+            return None
+        except Exception as e:
+            logger.warning("Meter %s read failed: %s", member.name, e)
+            return None
+        if member.phase and not reading.phases:
+            reading.phases = [PhaseReading(
+                name=member.phase, power=reading.power, voltage=reading.voltage,
+                current=reading.current, pf=reading.pf, reactive=reading.reactive,
+            )]
+        member.last = reading
+        return reading
+
+    async def read_full(self) -> MeterReading:
+        results = await asyncio.gather(*(self._read_member(m) for m in self.members))
+        now = self.clock()
+        readings = []
+        stale = []
+        for member, reading in zip(self.members, results):
+            if reading is None:
+                last = member.last
+                if last is None or now - last.timestamp > self.max_stale_s:
+                    raise MeterGroupError(f"no reading from meter {member.name}")
+                stale.append(member.name)
+                reading = last
+            readings.append(reading)
+        merged = merge_readings(readings)
+        merged.stale = stale
+        return merged
+
+    async def read_watts(self) -> float:
+        reading = await self.read_full()
+        return reading.power
+
+
+def merge_readings(readings: list[MeterReading]) -> MeterReading:
+    """
+    Sum of the meters' power and energy, with phases of the same name merged:
+    power, current and reactive add up, voltage is averaged and pf follows
+    from the merged power and apparent power.
+    """
+    phases: dict[str, list[PhaseReading]] = {}
+    for reading in readings:
+        for phase in reading.phases:
+            phases.setdefault(phase.name, []).append(phase)
+
+    merged_phases = []
+    for name in sorted(phases):
+        parts = phases[name]
+        voltages = [p.voltage for p in parts if p.voltage]
+        voltage = sum(voltages) / len(voltages) if voltages else 0.0
+        power = sum(p.power for p in parts)
+        current = sum(p.current for p in parts)
+        apparent = voltage * current
+        merged_phases.append(PhaseReading(
+            name=name,
+            power=power,
+            voltage=voltage,
+            current=current,
+            pf=min(1.0, abs(power) / apparent) if apparent else 0.0,
+            reactive=sum(p.reactive for p in parts),
+        ))
+
+    first = merged_phases[0] if merged_phases else None
+    return MeterReading(
+        power=sum(r.power for r in readings),
+        voltage=first.voltage if first else readings[0].voltage,
+        current=first.current if first else readings[0].current,
+        pf=first.pf if first else readings[0].pf,
+        reactive=sum(r.reactive for r in readings),
+        total=sum(r.total for r in readings),
+        total_returned=sum(r.total_returned for r in readings),
+        phases=merged_phases,
+        # The aggregate is as old as its oldest part
+        timestamp=min(r.timestamp for r in readings),
+    )
+
+
+def create_meter(cfg: Config) -> PowerMeter | MeterGroup:
+    """The single `powermeter` device, or a MeterGroup when `powermeter.meters` is set."""
+    pm = cfg.powermeter
+    meters = pm.get("meters")
+    if not meters:
+        return PowerMeter(
+            ip=pm.ip,
+            user=pm.user,
+            password=pm.password,
+            emeter_index=pm.get("emeter_index", 0),
+            meter_type=pm.type,
+        )
+    # Inside GuardedMeter's read deadline, so a late member is replaced by its
+    # last reading rather than failing the whole read
+    loop_interval_s = float(cfg.get("control", {}).get("loop_interval_s", 1))
+    deadline_s = float(pm.get("meter_deadline_s", 0.6 * loop_interval_s))
+    members = []
+    for i, m in enumerate(meters):
+        members.append(GroupMember(
+            name=m.get("name", f"meter{i + 1}"),
+            meter=PowerMeter(
+                ip=m["ip"],
+                user=m.get("user", ""),
+                password=m.get("password", ""),
+                emeter_index=m.get("emeter_index", 0),
+                meter_type=m.get("type", "gen1_em"),
+            ),
+            deadline_s=float(m.get("deadline_s", deadline_s)),
+            phase=m.get("phase"),
+        ))
+    return MeterGroup(members, max_stale_s=float(pm.get("meter_max_stale_s", 5.0)))
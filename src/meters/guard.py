@@ -0,0 +1,110 @@
+import asyncio
+import dataclasses
+import logging
+import time
+
+from src.config import Config
+from src.meters.powermeter import MeterReading
+from src.metrics import METER_FALLBACKS, METER_HEDGES, METER_READING_AGE
+
+logger = logging.getLogger(__name__)
+
+STALE_ACTIONS = ("hold", "ramp_down", "minimum")
+
+
+class GuardedMeter:
+    """
+    Bounds every meter read by `read_deadline_s` instead of the HTTP client's
+    10s timeout. A request still running after `hedge_after_s`, or one that
+    failed, gets one more request in parallel; the first good answer wins.
+    A read that misses the deadline returns the last good reading with its
+    age; once that age passes `stale_after_s` the loop applies `stale_action`
+    instead of regulating on old data. The deadline defaults to
+    DEADLINE_SHARE of the control loop interval, so a late meter costs at
+    most one cycle.
+    """
+
+    DEADLINE_SHARE = 0.8
+
+    def __init__(self, cfg: Config, meter, clock=time.time):
+        pm = cfg.powermeter
+        self.meter = meter
+        self.clock = clock
+        loop_interval_s = float(cfg.get("control", {}).get("loop_interval_s", 1))
+        self.read_deadline_s = float(pm.get("read_deadline_s", self.DEADLINE_SHARE * loop_interval_s))
+        if self.read_deadline_s > loop_interval_s:
+            logger.warning(
+                "powermeter.read_deadline_s %.1fs exceeds control.loop_interval_s %.1fs: "
+                "a late meter read delays the control loop by more than one cycle",
+                self.read_deadline_s, loop_interval_s,
+            )
+        self.hedge_after_s = float(pm.get("hedge_after_s", min(0.5, self.read_deadline_s / 2)) or 0)
+        self.stale_after_s = float(pm.get("stale_after_s", 5.0))
+        self.stale_action = pm.get("stale_action", "ramp_down")
+        if self.stale_action not in STALE_ACTIONS:
+            raise ValueError(f"Unknown stale_action: {self.stale_action}")
+        self.stale_ramp_percent = float(pm.get("stale_ramp_percent", 10))
+        self.last: MeterReading | None = None
+
+    async def _attempts(self) -> MeterReading:
+        pending = {asyncio.ensure_future(self.meter.read_full())}
+        launched = 1
+        error: BaseException | None = None
+        try:
+            while pending:
+                hedge = self.hedge_after_s > 0 and launched < 2
+                done, pending = await asyncio.wait(
+                    pending, timeout=self.hedge_after_s if hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    METER_HEDGES.inc(reason="slow")
+                    pending.add(asyncio.ensure_future(self.meter.read_full()))
+                    launched += 1
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if hedge:
+                    METER_HEDGES.inc(reason="failed")
+                    pending.add(asyncio.ensure_future(self.meter.read_full()))
+                    launched += 1
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def read_full(self) -> MeterReading:
+        try:
+            reading = await asyncio.wait_for(self._attempts(), self.read_deadline_s)
+        except Exception as e:
+            if self.last is None:
+                raise
+            age = self.clock() - self.last.timestamp
+            METER_FALLBACKS.inc()
+            METER_READING_AGE.set(age)
+            logger.warning(
+                "Meter read failed (%s), using the reading from %.1fs ago",
+                type(e).__name__ if isinstance(e, asyncio.TimeoutError) else e, age,
+            )
+            return dataclasses.replace(self.last, age_s=age)
+        self.last = reading
+        METER_READING_AGE.set(0.0)
+        return reading
+
+    async def read_watts(self) -> float:
+        reading = await self.read_full()
+        return reading.power
+
+    def is_stale(self, reading: MeterReading) -> bool:
+        return reading.age_s > self.stale_after_s
+
+    def stale_limit(self, last_limit: float, min_watt: int, max_watt: int) -> int:
+        """Total limit to apply while the meter is stale."""
+        if self.stale_action == "hold":
+            return int(last_limit)
+        if self.stale_action == "minimum":
+            return min_watt
+        step = max_watt * self.stale_ramp_percent / 100
+        return int(max(min_watt, last_limit - step))
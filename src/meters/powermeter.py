@@ -1,20 +1,37 @@
 import logging
+import time
 from dataclasses import dataclass, field
 
-import aiohttp
-
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class PhaseReading:
+    name: str
+    power: float = 0.0
+    voltage: float = 0.0
+    current: float = 0.0
+    pf: float = 0.0
+    reactive: float = 0.0
+
+
 @dataclass
 class MeterReading:
     power: float = 0.0
+    # voltage/current/pf of the first phase on three-phase meters; see phases
     voltage: float = 0.0
     current: float = 0.0
     pf: float = 0.0
     reactive: float = 0.0
     total: float = 0.0
     total_returned: float = 0.0
+    phases: list[PhaseReading] = field(default_factory=list)
+    # Unix time the reading was taken
+    timestamp: float = 0.0
+    # Meters of a group whose previous reading stood in for a late one
+    stale: list[str] = field(default_factory=list)
+    # Seconds since the reading was taken when it is a fallback, 0 when fresh
+    age_s: float = 0.0
 
 
 class PowerMeter:
@@ -25,19 +42,23 @@ class PowerMeter:
         self.password = password
         self.emeter_index = emeter_index
         self.meter_type = meter_type
-        self._timeout = aiohttp.ClientTimeout(total=10)
+        self._timeout_s = 10
 
     async def _get_json(self, path: str) -> dict:
+        import aiohttp
+
         url = f"http://{self.ip}{path}"
         auth = aiohttp.BasicAuth(self.user, self.password) if self.user else None
-        async with aiohttp.ClientSession(timeout=self._timeout) as session:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self._timeout_s)) as session:
             async with session.get(url, auth=auth) as resp:
                 return await resp.json()
 
     async def _get_rpc_json(self, path: str) -> dict:
+        import aiohttp
+
         url = f"http://{self.ip}/rpc{path}"
         auth = aiohttp.BasicAuth(self.user, self.password) if self.user else None
-        async with aiohttp.ClientSession(timeout=self._timeout) as session:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self._timeout_s)) as session:
             async with session.get(url, auth=auth) as resp:
                 return await resp.json()
 
@@ -62,7 +83,9 @@ class PowerMeter:
         reader = readers.get(self.meter_type)
         if not reader:
             raise ValueError(f"Unknown meter type: {self.meter_type}")
-        return await reader()
+        reading = await reader()
+        reading.timestamp = time.time()
+        return reading
 
     async def _read_em_full(self) -> MeterReading:
         if self.emeter_index is not None:
@@ -91,24 +114,49 @@ class PowerMeter:
 
     async def _read_3em_full(self) -> MeterReading:
         data = await self._get_json("/status")
+        phases = [
+            PhaseReading(
+                name=name,
+                power=float(e.get("power", 0)),
+                voltage=float(e.get("voltage", 0)),
+                current=float(e.get("current", 0)),
+                pf=float(e.get("pf", 0)),
+                reactive=float(e.get("reactive", 0)),
+            )
+            for name, e in zip("abc", data.get("emeters", []))
+        ]
+        first = phases[0] if phases else PhaseReading("a")
         return MeterReading(
             power=float(data.get("total_power", 0)),
-            voltage=float(data.get("emeters", [{}])[0].get("voltage", 0)),
-            current=float(data.get("emeters", [{}])[0].get("current", 0)),
-            pf=float(data.get("emeters", [{}])[0].get("pf", 0)),
+            voltage=first.voltage,
+            current=first.current,
+            pf=first.pf,
+            reactive=sum(p.reactive for p in phases),
             total=sum(float(e.get("total", 0)) for e in data.get("emeters", [])),
             total_returned=sum(float(e.get("total_returned", 0)) for e in data.get("emeters", [])),
+            phases=phases,
         )
 
     async def _read_3em_pro_full(self) -> MeterReading:
         data = await self._get_rpc_json("/EM.GetStatus?id=0")
+        phases = [
+            PhaseReading(
+                name=name,
+                power=float(data.get(f"{name}_act_power", 0)),
+                voltage=float(data.get(f"{name}_voltage", 0)),
+                current=float(data.get(f"{name}_current", 0)),
+                pf=float(data.get(f"{name}_pf", 0)),
+            )
+            for name in "abc"
+        ]
         return MeterReading(
             power=float(data.get("total_act_power", 0)),
-            voltage=float(data.get("a_voltage", 0)),
-            current=float(data.get("a_current", 0)),
-            pf=float(data.get("a_pf", 0)),
+            voltage=phases[0].voltage,
+            current=phases[0].current,
+            pf=phases[0].pf,
             total=float(data.get("total_act", 0)),
             total_returned=float(data.get("total_act_ret", 0)),
+            phases=phases,
         )
 
     async def _read_1pm_full(self) -> MeterReading:
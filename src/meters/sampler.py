@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+
+from src.config import Config
+from src.metrics import METER_POLL_RATE
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveSampler:
+    """
+    Paces meter reads by how much the next reading matters. Near or below
+    `control.min_point_w`, or while grid power moves fast, the meter is polled
+    at `max_rate_hz`; once readings stay within `stable_band_w` for
+    `stable_after_s` the rate falls to `stable_rate_hz`, and to `min_rate_hz`
+    while no inverter produces (nothing to export). Speed-ups apply to the
+    next read, slow-downs step down gradually. Disabled, reads are passed
+    through unpaced and the rate stays at 1 / poll_interval_s.
+    """
+
+    SLOW_DOWN = 0.7
+
+    def __init__(self, cfg: Config, meter, clock=time.monotonic, sleep=asyncio.sleep):
+        pm = cfg.powermeter
+        ad = pm.get("adaptive", {})
+        self.meter = meter
+        self.clock = clock
+        self.sleep = sleep
+        self.enabled = ad.get("enabled", False)
+        self.base_rate_hz = 1.0 / float(pm.get("poll_interval_s", 1))
+        self.min_rate_hz = float(ad.get("min_rate_hz", 0.2))
+        self.stable_rate_hz = float(ad.get("stable_rate_hz", 0.5))
+        self.max_rate_hz = float(ad.get("max_rate_hz", 4.0))
+        self.near_margin_w = float(ad.get("near_margin_w", 50))
+        self.fast_change_w_per_s = float(ad.get("fast_change_w_per_s", 100))
+        self.stable_band_w = float(ad.get("stable_band_w", 20))
+        self.stable_after_s = float(ad.get("stable_after_s", 30))
+        self.min_point_w = float(cfg.control.get("min_point_w", 0))
+
+        self.rate_hz = self.base_rate_hz
+        self.producing = True
+        self.reads = 0
+        self._last: tuple[float, float] | None = None
+        self._stable_ref: tuple[float, float] | None = None
+        METER_POLL_RATE.set(self.rate_hz)
+
+    @property
+    def interval_s(self) -> float:
+        return 1.0 / self.rate_hz
+
+    async def wait(self):
+        """Sleep until the current interval since the previous read is up."""
+        if self.enabled and self._last is not None:
+            delay = self._last[0] + self.interval_s - self.clock()
+            if delay > 0:
+                await self.sleep(delay)
+
+    async def read(self):
+        reading = await self.meter.read_full()
+        self.observe(reading.power, self.clock())
+        return reading
+
+    def observe(self, power: float, t: float):
+        self.reads += 1
+        if self.enabled:
+            self._adapt(power, t)
+        self._last = (t, power)
+
+    def _target(self, power: float, t: float) -> float:
+        if not self.producing:
+            return self.min_rate_hz
+        if power < self.min_point_w + self.near_margin_w:
+            return self.max_rate_hz
+        if self._last is not None and t > self._last[0]:
+            change = abs(power - self._last[1]) / (t - self._last[0])
+            if change > self.fast_change_w_per_s:
+                return self.max_rate_hz
+
+        if self._stable_ref is None or abs(power - self._stable_ref[1]) > self.stable_band_w:
+            self._stable_ref = (t, power)
+        if t - self._stable_ref[0] >= self.stable_after_s:
+            return self.stable_rate_hz
+        return self.base_rate_hz
+
+    def _adapt(self, power: float, t: float):
+        target = self._target(power, t)
+        if target >= self.rate_hz:
+            rate = target
+        else:
+            rate = max(target, self.rate_hz * self.SLOW_DOWN)
+        if rate != self.rate_hz:
+            logger.debug("Meter poll rate %.2f -> %.2f Hz", self.rate_hz, rate)
+            self.rate_hz = rate
+            METER_POLL_RATE.set(rate)
@@ -0,0 +1,174 @@
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+
+def _escape(value: str) -> str:
+    """Label value escaping of the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: dict[tuple, float] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def clear(self):
+        self._values.clear()
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_labels(self.label_names, key)} {value:g}"
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return head + "".join(line + "\n" for line in self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; observe() is a bisect and two additions."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self) -> Iterable[str]:
+        cumulative = 0
+        for bound, n in zip(self.buckets, self._counts):
+            cumulative += n
+            yield f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}'
+        cumulative += self._counts[-1]
+        yield f'{self.name}_bucket{{le="+Inf"}} {cumulative}'
+        yield f"{self.name}_sum {self._sum:g}"
+        yield f"{self.name}_count {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect: Callable[[], None]):
+        """Called on every scrape to refresh gauges that are cheaper to compute on demand."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            collect()
+        return "".join(m.render() for m in self._metrics)
+
+
+REGISTRY = Registry()
+
+# Latencies in seconds: meter HTTP reads take tens of ms, compute is sub-ms
+_LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+METER_READ_SECONDS = REGISTRY.register(Histogram(
+    "zeroexport_meter_read_seconds", "Power meter read latency", _LATENCY_BUCKETS))
+COMPUTE_SECONDS = REGISTRY.register(Histogram(
+    "zeroexport_compute_seconds", "Controller and allocation time per cycle", _LATENCY_BUCKETS))
+DISPATCH_SECONDS = REGISTRY.register(Histogram(
+    "zeroexport_dispatch_seconds", "Time to publish one limit command", _LATENCY_BUCKETS))
+# Whole cycles and the post-command wait run up to response_model.max_wait_s and beyond
+_CYCLE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 15.0, 30.0)
+CYCLE_SECONDS = REGISTRY.register(Histogram(
+    "zeroexport_cycle_seconds", "Control cycle time, post-command wait included", _CYCLE_BUCKETS))
+WAIT_SECONDS = REGISTRY.register(Histogram(
+    "zeroexport_command_wait_seconds", "Post-command wait for the inverters to follow a limit change",
+    _CYCLE_BUCKETS))
+
+MQTT_MESSAGES = REGISTRY.register(Counter(
+    "zeroexport_mqtt_messages_total", "MQTT messages ingested"))
+COMMANDS = REGISTRY.register(Counter(
+    "zeroexport_limit_commands_total", "Limit commands by outcome", ("result",)))
+TELEMETRY_POINTS = REGISTRY.register(Counter(
+    "zeroexport_telemetry_points_total", "Telemetry points by stage", ("stage",)))
+
+INVERTER_STALENESS = REGISTRY.register(Gauge(
+    "zeroexport_inverter_staleness_seconds", "Age of the latest AC power sample", ("serial",)))
+COMMAND_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "zeroexport_command_queue_depth", "Limit commands waiting for radio budget"))
+TIME_TO_FIRST_CONTROL = REGISTRY.register(Gauge(
+    "zeroexport_time_to_first_control_seconds", "Process start to the first cycle with meter and inverter data"))
+STARTUP_SIGNAL_SECONDS = REGISTRY.register(Gauge(
+    "zeroexport_startup_signal_seconds", "Process start to each readiness signal", ("signal",)))
+METER_LATE = REGISTRY.register(Counter(
+    "zeroexport_meter_late_total", "Meter reads of a meter group that missed their deadline", ("meter",)))
+METER_POLL_RATE = REGISTRY.register(Gauge(
+    "zeroexport_meter_poll_rate_hz", "Current meter polling rate"))
+METER_HEDGES = REGISTRY.register(Counter(
+    "zeroexport_meter_hedged_requests_total", "Extra meter requests by cause", ("reason",)))
+METER_FALLBACKS = REGISTRY.register(Counter(
+    "zeroexport_meter_fallbacks_total", "Meter reads answered with the last good reading"))
+METER_READING_AGE = REGISTRY.register(Gauge(
+    "zeroexport_meter_reading_age_seconds", "Age of the reading the last cycle controlled on"))
+ENERGY_SAMPLES_REJECTED = REGISTRY.register(Counter(
+    "zeroexport_energy_samples_rejected_total", "Meter samples energy accounting dropped as not newer than the last"))
+INVERTER_DATA_AGE = REGISTRY.register(Gauge(
+    "zeroexport_inverter_data_age_seconds", "Age of the newest inverter topic per field group", ("serial", "group")))
+LIVEDATA_HTTP_ACTIVE = REGISTRY.register(Gauge(
+    "zeroexport_livedata_http_active", "1 while inverter data is polled over HTTP instead of MQTT"))
+LIVEDATA_FETCHES = REGISTRY.register(Counter(
+    "zeroexport_livedata_fetches_total", "OpenDTU livedata HTTP requests by outcome", ("result",)))
+LIVEDATA_FETCH_SECONDS = REGISTRY.register(Histogram(
+    "zeroexport_livedata_fetch_seconds", "OpenDTU livedata request and ingest time", _LATENCY_BUCKETS))
+LIVEDATA_WS_FRAMES = REGISTRY.register(Counter(
+    "zeroexport_livedata_ws_frames_total", "OpenDTU livedata WebSocket frames ingested"))
+LIVEDATA_WS_RECONNECTS = REGISTRY.register(Counter(
+    "zeroexport_livedata_ws_reconnects_total", "OpenDTU livedata WebSocket reconnect attempts"))
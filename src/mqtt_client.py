@@ -3,25 +3,42 @@ import json
 import logging
 from typing import Callable
 
-import aiomqtt
+from src.metrics import MQTT_MESSAGES
 
 logger = logging.getLogger(__name__)
 
 
+def __getattr__(name):
+    # aiomqtt (and paho) load on first connect, not with the module
+    if name == "aiomqtt":
+        import aiomqtt
+        return aiomqtt
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class MqttClient:
     def __init__(self, broker: str, port: int, client_id: str, topic_prefix: str):
         self.broker = broker
         self.port = port
         self.client_id = client_id
         self.topic_prefix = topic_prefix
-        self._client: aiomqtt.Client | None = None
+        self._client: "aiomqtt.Client | None" = None
         self._handlers: dict[str, Callable] = {}
         self._connected = asyncio.Event()
 
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def wait_connected(self):
+        await self._connected.wait()
+
     def on_topic(self, pattern: str, handler: Callable):
         self._handlers[pattern] = handler
 
     async def connect(self):
+        import aiomqtt
+
         will = aiomqtt.Will(
             topic=f"{self.topic_prefix}/status",
             payload="offline",
@@ -36,6 +53,8 @@ class MqttClient:
         )
 
     async def run(self):
+        import aiomqtt
+
         retry_delay = 1
         max_delay = 30
 
@@ -59,6 +78,7 @@ class MqttClient:
                         logger.info("Subscribed to %s", pattern)
 
                     async for message in self._client.messages:
+                        MQTT_MESSAGES.inc()
                         topic_str = str(message.topic)
                         payload = message.payload
                         if isinstance(payload, bytes):
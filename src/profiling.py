@@ -0,0 +1,314 @@
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _collapse(frame) -> str:
+    """Stack as 'file:function;...' from the outermost frame, flamegraph.pl style."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread from a background thread at a fixed interval."""
+
+    def __init__(self, thread_id: int, interval_s: float = 0.005):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cpu-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+                self.samples += 1
+            del frame
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+class CpuProfile:
+    """
+    One CPU profiling session: `sample` mode (stack sampling, collapsed-stack
+    output, low overhead) or `cprofile` mode (deterministic, pstats output).
+    Stops itself after `seconds`.
+    """
+
+    def __init__(self, mode: str, seconds: float, interval_s: float):
+        if mode not in ("sample", "cprofile"):
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.seconds = seconds
+        self.started = time.time()
+        self.stopped: float | None = None
+        self._sampler: SamplingProfiler | None = None
+        self._profile: cProfile.Profile | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        if mode == "sample":
+            self._sampler = SamplingProfiler(threading.get_ident(), interval_s)
+            self._sampler.start()
+        else:
+            # cProfile hooks the calling thread: the event loop thread
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._timer = asyncio.get_running_loop().call_later(seconds, self.stop)
+
+    @property
+    def running(self) -> bool:
+        return self.stopped is None
+
+    def stop(self):
+        if not self.running:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._profile is not None:
+            self._profile.disable()
+        self.stopped = time.time()
+        logger.info("CPU profile (%s) stopped after %.1fs", self.mode, self.stopped - self.started)
+
+    def status(self) -> dict:
+        out = {
+            "mode": self.mode,
+            "running": self.running,
+            "elapsed_s": round((self.stopped or time.time()) - self.started, 3),
+            "seconds": self.seconds,
+        }
+        if self._sampler is not None:
+            out["samples"] = self._sampler.samples
+        return out
+
+    def collapsed(self) -> str:
+        if self._sampler is not None:
+            return self._sampler.collapsed()
+        # Deterministic profile: one line per function with its own time in microseconds
+        stats = pstats.Stats(self._profile).stats
+        lines = []
+        for (file, line, func), (_, _, tottime, _, _) in stats.items():
+            us = int(tottime * 1e6)
+            if us:
+                lines.append(f"{os.path.basename(file)}:{func} {us}\n")
+        return "".join(sorted(lines))
+
+    def pstats_dump(self) -> bytes:
+        """pstats.Stats.dump_stats() format, readable with pstats.Stats(path)."""
+        if self._profile is None:
+            raise ValueError("pstats output needs a cprofile-mode session")
+        return marshal.dumps(pstats.Stats(self._profile).stats)
+
+    def pstats_text(self, limit: int = 40) -> str:
+        if self._profile is None:
+            raise ValueError("pstats output needs a cprofile-mode session")
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+class MemoryTracker:
+    """tracemalloc snapshots; each new snapshot is diffed against the previous one."""
+
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self.previous: tracemalloc.Snapshot | None = None
+        self.latest: tracemalloc.Snapshot | None = None
+        self._started_here = False
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def snapshot(self, limit: int = 20) -> dict:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_here = True
+            logger.info("tracemalloc started (%d frames)", self.frames)
+        snap = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        self.previous, self.latest = self.latest, snap
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [self._stat(s) for s in snap.statistics("lineno")[:limit]],
+        }
+
+    def diff(self, limit: int = 20) -> dict:
+        if self.latest is None or self.previous is None:
+            raise ValueError("need two snapshots to diff")
+        stats = self.latest.compare_to(self.previous, "lineno")
+        return {"top": [
+            {**self._stat(s), "size_diff": s.size_diff, "count_diff": s.count_diff}
+            for s in stats[:limit]
+        ]}
+
+    def stop(self):
+        if self._started_here and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_here = False
+        self.previous = self.latest = None
+
+    @staticmethod
+    def _stat(stat) -> dict:
+        frame = stat.traceback[0]
+        return {"site": f"{frame.filename}:{frame.lineno}", "size": stat.size, "count": stat.count}
+
+
+def dump_tasks() -> str:
+    """Stack of every pending asyncio task, as text."""
+    out = io.StringIO()
+    tasks = sorted(asyncio.all_tasks(), key=lambda t: t.get_name())
+    out.write(f"{len(tasks)} task(s)\n")
+    for task in tasks:
+        out.write(f"\n--- {task.get_name()} {task.get_coro()!r}\n")
+        task.print_stack(file=out)
+    return out.getvalue()
+
+
+class Profiling:
+    """Admin-side state: at most one CPU session and one memory tracker."""
+
+    def __init__(self, cfg: Config):
+        prof = cfg.get("profiling", {})
+        self.enabled = prof.get("enabled", False)
+        self.token = prof.get("token") or None
+        self.max_seconds = float(prof.get("max_seconds", 300))
+        self.interval_s = float(prof.get("sample_interval_s", 0.005))
+        self.cpu: CpuProfile | None = None
+        self.memory = MemoryTracker(int(prof.get("tracemalloc_frames", 10)))
+
+    def start_cpu(self, mode: str, seconds: float) -> CpuProfile:
+        if self.cpu is not None and self.cpu.running:
+            raise RuntimeError("a CPU profile is already running")
+        seconds = min(max(seconds, 0.1), self.max_seconds)
+        self.cpu = CpuProfile(mode, seconds, self.interval_s)
+        logger.info("CPU profile (%s) started for %.1fs", mode, seconds)
+        return self.cpu
+
+
+def setup_routes(app, profiling: Profiling):
+    """Register /admin endpoints on the control API (only when profiling.enabled)."""
+    from aiohttp import web
+
+    if not profiling.enabled:
+        return
+
+    @web.middleware
+    async def check_token(request, handler):
+        if profiling.token and request.path.startswith("/admin/"):
+            given = request.headers.get("X-Admin-Token") or request.query.get("token")
+            if given != profiling.token:
+                raise web.HTTPUnauthorized(text="admin token required")
+        return await handler(request)
+
+    def _number(request, name: str, default: float) -> float:
+        try:
+            return float(request.query.get(name, default))
+        except ValueError:
+            raise web.HTTPBadRequest(text=f"{name} must be a number")
+
+    def _session() -> CpuProfile:
+        if profiling.cpu is None:
+            raise web.HTTPNotFound(text="no CPU profile taken yet")
+        return profiling.cpu
+
+    async def cpu_start(request):
+        try:
+            cpu = profiling.start_cpu(request.query.get("mode", "sample"), _number(request, "seconds", 30))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        except RuntimeError as e:
+            raise web.HTTPConflict(text=str(e))
+        return web.json_response(cpu.status())
+
+    async def cpu_stop(request):
+        cpu = _session()
+        cpu.stop()
+        return web.json_response(cpu.status())
+
+    async def cpu_status(request):
+        return web.json_response(_session().status())
+
+    async def cpu_result(request):
+        cpu = _session()
+        if cpu.running:
+            raise web.HTTPConflict(text="profile still running, stop it or wait")
+        fmt = request.query.get("format", "collapsed")
+        try:
+            if fmt == "pstats":
+                return web.Response(
+                    body=cpu.pstats_dump(),
+                    content_type="application/octet-stream",
+                    headers={"Content-Disposition": 'attachment; filename="cpu.pstats"'},
+                )
+            if fmt == "text":
+                return web.Response(text=cpu.pstats_text(int(_number(request, "limit", 40))))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        if fmt != "collapsed":
+            raise web.HTTPBadRequest(text="format must be collapsed, pstats or text")
+        return web.Response(
+            text=cpu.collapsed(),
+            headers={"Content-Disposition": 'attachment; filename="cpu.collapsed"'},
+        )
+
+    async def memory_snapshot(request):
+        return web.json_response(profiling.memory.snapshot(int(_number(request, "limit", 20))))
+
+    async def memory_diff(request):
+        try:
+            return web.json_response(profiling.memory.diff(int(_number(request, "limit", 20))))
+        except ValueError as e:
+            raise web.HTTPConflict(text=str(e))
+
+    async def memory_stop(request):
+        profiling.memory.stop()
+        return web.json_response({"tracing": profiling.memory.tracing})
+
+    async def tasks(request):
+        return web.Response(text=dump_tasks())
+
+    app.middlewares.append(check_token)
+    app.router.add_post("/admin/profile/cpu/start", cpu_start)
+    app.router.add_post("/admin/profile/cpu/stop", cpu_stop)
+    app.router.add_get("/admin/profile/cpu", cpu_status)
+    app.router.add_get("/admin/profile/cpu/result", cpu_result)
+    app.router.add_post("/admin/memory/snapshot", memory_snapshot)
+    app.router.add_get("/admin/memory/diff", memory_diff)
+    app.router.add_post("/admin/memory/stop", memory_stop)
+    app.router.add_get("/admin/tasks", tasks)
+    logger.warning("Profiling endpoints enabled under /admin%s", "" if profiling.token else " without a token")
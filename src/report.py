@@ -0,0 +1,303 @@
+"""
+Interval compliance report: streams grid power and inverter yield from
+InfluxDB, the local store or the running service's in-memory series into
+15-minute rows (import/export Wh, peak export, violation time, yield per
+inverter), written to CSV or Parquet in bounded chunks.
+
+    python -m src.report --start 2025-06-01 --end 2025-07-01 -o june.csv
+"""
+import argparse
+import asyncio
+import csv
+import heapq
+import importlib.util
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import AsyncIterator
+
+from src.compliance import ComplianceTracker, IntervalStats, interval_start
+from src.config import Config, load_config
+
+logger = logging.getLogger(__name__)
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# (unix time, inverter serial or None for grid power, value): grid power in W,
+# inverter yield_total in kWh
+Event = tuple[float, str | None, float]
+
+GRID_COLUMNS = ("import_wh", "export_wh", "max_export_w", "violation_s", "violation_wh", "covered_s")
+
+
+class ReportBuilder:
+    """
+    Turns a time-ordered event stream into one row per interval. Grid
+    energy comes from ComplianceTracker; inverter yield is the growth of
+    yield_total between the last samples of consecutive intervals. Holds
+    one interval of state, whatever the length of the stream.
+    """
+
+    def __init__(self, serials: list[str], interval_s: float = 900, threshold_w: float = 0,
+                 max_gap_s: float = 30):
+        self.serials = serials
+        self.interval_s = interval_s
+        self.tracker = ComplianceTracker(Config({"compliance": {
+            "intervals_s": [interval_s], "threshold_w": threshold_w, "max_gap_s": max_gap_s,
+        }}), log_violations=False)
+        self.columns = ["interval_start", "interval_end", *GRID_COLUMNS, *(f"yield_wh_{s}" for s in serials)]
+        # interval start -> serial -> last yield_total (kWh) seen in it
+        self._yields: dict[float, dict[str, float]] = {}
+        self._prev_yield: dict[str, float] = {}
+
+    def add(self, event: Event) -> list[list]:
+        """Feed one event; returns the rows it completed."""
+        t, serial, value = event
+        if serial is None:
+            done = self.tracker.observe(value, t)
+            return self._rows(max(s.end for s in done), done) if done else []
+        if serial in self.serials:
+            self._yields.setdefault(interval_start(t, self.interval_s), {})[serial] = value
+        return []
+
+    def finish(self) -> list[list]:
+        """Rows of the interval(s) still open at the end of the stream."""
+        open_stats = list(self.tracker.current.values())
+        self.tracker.current.clear()
+        return self._rows(float("inf"), open_stats)
+
+    def _rows(self, end: float, completed: list[IntervalStats]) -> list[list]:
+        # Intervals before `end` with yield samples but no grid data still get a row
+        stats = {s.start: s for s in completed}
+        for start in self._yields:
+            if start < end and start not in stats:
+                stats[start] = IntervalStats(start, self.interval_s)
+        return [self._row(stats[start]) for start in sorted(stats)]
+
+    def _row(self, stats: IntervalStats) -> list:
+        yields = self._yields.pop(stats.start, {})
+        row = [
+            datetime.fromtimestamp(stats.start).astimezone().isoformat(),
+            datetime.fromtimestamp(stats.end).astimezone().isoformat(),
+            round(stats.import_wh, 3), round(stats.export_wh, 3), round(stats.max_export_w, 1),
+            round(stats.violation_s, 2), round(stats.violation_wh, 3), round(stats.covered_s, 2),
+        ]
+        for serial in self.serials:
+            last = yields.get(serial)
+            prev = self._prev_yield.get(serial)
+            if last is None:
+                row.append(0.0)
+                continue
+            # A counter reset (inverter replaced) counts from zero
+            row.append(round((last - prev) * 1000, 1) if prev is not None and last >= prev else 0.0)
+            self._prev_yield[serial] = last
+        return row
+
+
+class CsvSink:
+    def __init__(self, path: str | None, columns: list[str], chunk_rows: int):
+        self._file = open(path, "w", newline="") if path else sys.stdout
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+        self._chunk_rows = chunk_rows
+        self._pending = 0
+
+    def write(self, rows: list[list]):
+        self._writer.writerows(rows)
+        self._pending += len(rows)
+        if self._pending >= self._chunk_rows:
+            self._file.flush()
+            self._pending = 0
+
+    def close(self):
+        self._file.flush()
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class ParquetSink:
+    """Writes one Parquet row group per `chunk_rows` rows."""
+
+    def __init__(self, path: str, columns: list[str], chunk_rows: int):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([
+            (name, pa.string() if name.startswith("interval_") else pa.float64()) for name in columns
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._chunk_rows = chunk_rows
+        self._rows: list[list] = []
+
+    def write(self, rows: list[list]):
+        self._rows.extend(rows)
+        if len(self._rows) >= self._chunk_rows:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            columns = list(zip(*self._rows))
+            self._writer.write_table(self._pa.Table.from_arrays(
+                [self._pa.array(c, type=f.type) for c, f in zip(columns, self._schema)], schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+async def influx_events(cfg: Config, start: float, end: float, window_s: float = 86400) -> AsyncIterator[Event]:
+    """Grid power and inverter yield_total from InfluxDB, one time-sorted query per window."""
+    from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
+
+    influx = cfg.influxdb
+    async with InfluxDBClientAsync(url=influx.url, token=influx.token, org=influx.org, timeout=600_000) as client:
+        api = client.query_api()
+        t = start
+        while t < end:
+            stop = min(t + window_s, end)
+            query = f'''
+from(bucket: "{influx.bucket}")
+  |> range(start: {int(t)}, stop: {int(stop)})
+  |> filter(fn: (r) => (r._measurement == "grid" and r._field == "power")
+                    or (r._measurement == "inverter" and r._field == "yield_total"))
+  |> keep(columns: ["_time", "_measurement", "_value", "serial"])
+  |> group()
+  |> sort(columns: ["_time"])
+'''
+            async for record in await api.query_stream(query):
+                serial = record.values.get("serial") if record.get_measurement() == "inverter" else None
+                yield record.get_time().timestamp(), serial, float(record.get_value())
+            t = stop
+
+
+async def series_events(url: str, serials: list[str], start: float, end: float,
+                        window_s: float = 1800) -> AsyncIterator[Event]:
+    """
+    The same data from a running service's in-memory series (/api/series),
+    which only reach back `timeseries.retention_s`.
+    """
+    import aiohttp
+
+    async with aiohttp.ClientSession(base_url=url) as session:
+        async def get(path, **params):
+            async with session.get(path, params=params) as resp:
+                resp.raise_for_status()
+                return await resp.json()
+
+        keys = {None: "grid.power",
+                **_yield_keys((await get("/api/series", prefix="inverter.yield_total"))["series"], serials)}
+        t = start
+        while t < end:
+            stop = min(t + window_s, end)
+            streams = []
+            for serial, key in keys.items():
+                try:
+                    data = await get("/api/series/query", key=key, start=t, end=stop, step=1)
+                except aiohttp.ClientResponseError as e:
+                    if e.status == 404:
+                        continue
+                    raise
+                streams.append([(p[0], serial, p[3]) for p in data["points"] if p[0] < stop])
+            for event in heapq.merge(*streams, key=lambda e: e[0]):
+                yield event
+            t = stop
+
+
+def _yield_keys(keys: list[str], serials: list[str]) -> dict[str | None, str]:
+    """Series key per serial, matched on the whole `serial=` tag of the TimeSeriesStore.key tag set."""
+    wanted = {f"serial={serial}": serial for serial in serials}
+    found = {}
+    for key in keys:
+        tags = key.partition("{")[2].removesuffix("}")
+        for tag in tags.split(","):
+            serial = wanted.get(tag)
+            if serial is not None:
+                found[serial] = key
+    return found
+
+
+async def local_events(store, serials: list[str], start: float, end: float,
+                       window_s: float = 3600) -> AsyncIterator[Event]:
+    """The same data from the on-disk local store (src/local_store.py)."""
+    keys = {None: "grid.power", **_yield_keys(store.series("inverter.yield_total"), serials)}
+    t = start
+    while t < end:
+        stop = min(t + window_s, end)
+        streams = []
+        for serial, key in keys.items():
+            try:
+                streams.append([(pt, serial, value) for pt, value in store.query(key, t, stop)])
+            except KeyError:
+                continue
+        for event in heapq.merge(*streams, key=lambda e: e[0]):
+            yield event
+        t = stop
+
+
+async def build_report(events: AsyncIterator[Event], builder: ReportBuilder, sink) -> int:
+    rows = 0
+    try:
+        async for event in events:
+            done = builder.add(event)
+            if done:
+                sink.write(done)
+                rows += len(done)
+        done = builder.finish()
+        sink.write(done)
+        return rows + len(done)
+    finally:
+        sink.close()
+
+
+def _timestamp(value: str) -> float:
+    """ISO date or datetime, local time unless an offset is given."""
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.report", description="Interval compliance report")
+    parser.add_argument("--start", required=True, type=_timestamp, help="ISO date or datetime (local time)")
+    parser.add_argument("--end", required=True, type=_timestamp, help="ISO date or datetime, exclusive")
+    parser.add_argument("--source", choices=("influx", "local", "series"), default="influx",
+                        help="InfluxDB, the local store on disk, or the running service's in-memory "
+                             "series (recent hours only)")
+    parser.add_argument("--url", default="http://localhost:8080", help="service URL for --source series")
+    parser.add_argument("--interval", type=float, default=900, help="row length in seconds")
+    parser.add_argument("--format", choices=("csv", "parquet"), help="default: from the output suffix, else csv")
+    parser.add_argument("-o", "--output", help="output file (CSV only: stdout when omitted)")
+    parser.add_argument("--chunk-rows", type=int, default=96, help="rows buffered per write / row group")
+    parser.add_argument("--config", default=os.environ.get("CONFIG_PATH", "config.yaml"))
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("parquet" if (args.output or "").endswith(".parquet") else "csv")
+    if fmt == "parquet" and not HAS_PYARROW:
+        parser.error("Parquet output needs pyarrow (pip install pyarrow)")
+    if fmt == "parquet" and not args.output:
+        parser.error("Parquet output needs --output")
+    if args.end <= args.start:
+        parser.error("--end must be after --start")
+
+    cfg = load_config(args.config)
+    comp = cfg.get("compliance", {})
+    serials = [str(inv.serial) for inv in cfg.inverters]
+    builder = ReportBuilder(serials, args.interval, float(comp.get("threshold_w", 0)),
+                            float(comp.get("max_gap_s", 30)))
+    if args.source == "influx":
+        events = influx_events(cfg, args.start, args.end)
+    elif args.source == "local":
+        from src.local_store import LocalStore
+        path = cfg.get("local_store", {}).get("path") or os.path.join(cfg.get("state_dir", "state"), "telemetry")
+        events = local_events(LocalStore(cfg, path), serials, args.start, args.end)
+    else:
+        events = series_events(args.url, serials, args.start, args.end)
+    sink = (ParquetSink if fmt == "parquet" else CsvSink)(args.output, builder.columns, args.chunk_rows)
+    rows = asyncio.run(build_report(events, builder, sink))
+    logger.info("Wrote %d rows", rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    main()
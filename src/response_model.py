@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResponseParams:
+    dead_time_s: float
+    ramp_w_per_s: float
+    samples: int = 0
+
+
+@dataclass
+class _Transition:
+    start: float
+    from_w: float
+    to_w: float
+    # Previous transition, still in flight when this one was commanded. Its
+    # path is followed until our own dead time is over; no learning then.
+    lead: "_Transition | None" = None
+    moved_at: float | None = None
+    max_slope: float = 0.0
+
+
+class InverterResponse:
+    """
+    First-order view of one inverter: after a limit command nothing happens for
+    `dead_time_s`, then output ramps towards the new limit at `ramp_w_per_s`.
+    Parameters are refined online from (timestamp, AC power) samples of
+    transitions that started from rest: the dead time from the first movement,
+    the ramp rate from mid-ramp slopes.
+    """
+
+    def __init__(self, params: ResponseParams, band_w: float = 20.0, min_step_w: float = 50.0,
+                 alpha: float = 0.3, max_transition_s: float = 60.0):
+        self.params = params
+        self.band_w = band_w
+        self.min_step_w = min_step_w
+        self.alpha = alpha
+        self.max_transition_s = max_transition_s
+        self._transition: _Transition | None = None
+        self._last_sample: tuple[float, float] | None = None
+
+    @property
+    def settling(self) -> bool:
+        return self._transition is not None
+
+    def command(self, now: float, from_w: float, limit_w: float):
+        lead = self._transition
+        if lead is not None:
+            lead.lead = None
+            # Where the previous ramp will be when this command takes effect
+            from_w = self._path(lead, now + self.params.dead_time_s)
+        self._transition = _Transition(start=now, from_w=from_w, to_w=float(limit_w), lead=lead)
+
+    def _path(self, tr: _Transition, t: float) -> float:
+        elapsed = t - tr.start - self.params.dead_time_s
+        if elapsed <= 0:
+            return self._path(tr.lead, t) if tr.lead is not None else tr.from_w
+        step = self.params.ramp_w_per_s * elapsed
+        if tr.to_w >= tr.from_w:
+            return min(tr.to_w, tr.from_w + step)
+        return max(tr.to_w, tr.from_w - step)
+
+    def trajectory(self, t: float) -> float | None:
+        """Expected output at time t for the pending transition, None when idle."""
+        if self._transition is None:
+            return None
+        return self._path(self._transition, t)
+
+    def settle_time(self, from_w: float, to_w: float) -> float:
+        return self.params.dead_time_s + abs(to_w - from_w) / max(self.params.ramp_w_per_s, 1e-3)
+
+    def remaining(self, now: float) -> float:
+        """Change still expected from the pending transition (signed, W)."""
+        at_now = self.trajectory(now)
+        if at_now is None:
+            return 0.0
+        return self._transition.to_w - at_now
+
+    def predict(self, now: float, measured_w: float, measured_at: float) -> float:
+        """Measured output moved forward along the expected trajectory to `now`."""
+        at_now = self.trajectory(now)
+        at_sample = self.trajectory(measured_at)
+        if at_now is None or at_sample is None:
+            return measured_w
+        return max(0.0, measured_w + at_now - at_sample)
+
+    def observe(self, sample_at: float, power_w: float) -> bool:
+        """Feed one AC power sample. Returns True when the parameters were updated."""
+        if self._last_sample is not None and sample_at == self._last_sample[0]:
+            return False
+        prev, self._last_sample = self._last_sample, (sample_at, power_w)
+
+        tr = self._transition
+        if tr is None or sample_at < tr.start:
+            return False
+        if sample_at - tr.start > self.max_transition_s:
+            # Never reached the limit: sun-limited or command lost
+            self._transition = None
+            return False
+
+        # Small trims need a tighter band, otherwise they look settled before moving
+        step = abs(tr.to_w - tr.from_w)
+        band = min(self.band_w, step / 2)
+        reached = abs(power_w - tr.to_w) <= band
+
+        if tr.lead is not None:
+            # Output may still be following the previous command, so movement
+            # says nothing yet: prediction only, no learning
+            elapsed = sample_at - tr.start
+            if reached and elapsed >= self.params.dead_time_s:
+                self._transition = None
+            elif elapsed > self.settle_time(tr.from_w, tr.to_w) + self.params.dead_time_s:
+                self._transition = None
+            return False
+
+        raising = tr.to_w > tr.from_w
+        if tr.moved_at is None:
+            # Only movement towards the new limit counts; after an overlapping
+            # command the output may still be heading the other way
+            if (power_w - tr.from_w if raising else tr.from_w - power_w) > band:
+                tr.moved_at = sample_at
+            elif not raising and sample_at - tr.start > self.params.dead_time_s:
+                # A cut below current output must show up; still nothing after
+                # the expected dead time means it is longer than we think
+                self.params.dead_time_s += self.alpha * (sample_at - tr.start - self.params.dead_time_s)
+            elif raising and sample_at - tr.start > max(2 * self.params.dead_time_s, self.params.dead_time_s + 5):
+                # A raise may never show up when the sun is the limit
+                self._transition = None
+                return False
+        elif not reached and prev is not None and prev[0] > tr.moved_at - 1e-9:
+            progress = (power_w - prev[1]) if raising else (prev[1] - power_w)
+            if progress <= self.band_w / 4:
+                # Output stopped short of the limit: sun-limited, stop crediting
+                self._transition = None
+                return False
+            # Two samples mid-ramp: their slope is a direct ramp-rate reading
+            tr.max_slope = max(tr.max_slope, progress / (sample_at - prev[0]))
+
+        if not reached:
+            return False
+
+        self._transition = None
+        if step < self.min_step_w:
+            return False
+
+        p = self.params
+        dead = p.dead_time_s
+        if tr.moved_at is not None and tr.moved_at < sample_at:
+            dead = tr.moved_at - tr.start
+        p.dead_time_s += self.alpha * (dead - p.dead_time_s)
+        ramp = tr.max_slope or step / max(sample_at - tr.start - dead, 0.5)
+
+        p.ramp_w_per_s += self.alpha * (ramp - p.ramp_w_per_s)
+        p.samples += 1
+        return True
+
+
+class ResponseModel:
+    def __init__(self, cfg: Config, path: str | None = None):
+        rm = cfg.get("response_model", {})
+        self.enabled = rm.get("enabled", True)
+        self.default_dead_time_s = float(rm.get("dead_time_s", 2.0))
+        self.default_ramp_w_per_s = float(rm.get("ramp_w_per_s", 50.0))
+        self.min_wait_s = float(rm.get("min_wait_s", 1.0))
+        self.max_wait_s = float(rm.get("max_wait_s", 10.0))
+        self.band_w = float(rm.get("settle_band_w", 20.0))
+        self.path = Path(path) if path else None
+        self._inverters: dict[str, InverterResponse] = {}
+        self._saved_samples = 0
+
+    def get(self, serial: str) -> InverterResponse:
+        inv = self._inverters.get(serial)
+        if inv is None:
+            params = ResponseParams(self.default_dead_time_s, self.default_ramp_w_per_s)
+            inv = InverterResponse(params, band_w=self.band_w)
+            self._inverters[serial] = inv
+        return inv
+
+    def params(self) -> dict[str, ResponseParams]:
+        return {serial: inv.params for serial, inv in self._inverters.items()}
+
+    def wait_time(self, changes: list[tuple[str, float, float]]) -> float:
+        """Seconds until the slowest of the (serial, from_w, to_w) changes should have settled."""
+        longest = max((self.get(s).settle_time(f, t) for s, f, t in changes), default=0.0)
+        return max(self.min_wait_s, min(self.max_wait_s, longest))
+
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            for serial, raw in data.items():
+                self.get(serial).params = ResponseParams(**raw)
+            self._saved_samples = self._total_samples()
+            logger.info("Loaded inverter response model for %d inverter(s)", len(data))
+        except (OSError, ValueError, TypeError):
+            logger.warning("Could not load inverter response model from %s", self.path)
+
+    def _total_samples(self) -> int:
+        return sum(inv.params.samples for inv in self._inverters.values())
+
+    def save(self):
+        """Write learned parameters, skipped when nothing was learned since the last save."""
+        total = self._total_samples()
+        if self.path is None or total == self._saved_samples:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump({s: asdict(p) for s, p in self.params().items()}, f)
+            os.replace(tmp, self.path)
+            self._saved_samples = total
+        except OSError:
+            logger.warning("Could not save inverter response model to %s", self.path)
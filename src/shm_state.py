@@ -0,0 +1,183 @@
+"""
+Control loop state in a memory-mapped file, for sidecars on the same host
+(display, watchdog) that would otherwise poll HTTP or subscribe to MQTT.
+
+Fixed layout, little endian:
+
+    header    magic 8s | layout version u32 | max inverters u32 | sequence u64
+    state     time f64 | grid W f64 | grid V f64 | filtered W f64 | meter age s f64 |
+              setpoint W f64 | flags u32 | inverter count u32
+    inverter  serial 16s | power W f64 | limit W f64 | data age s f64 | flags u32 | pad u32
+              (max inverters slots)
+
+The sequence is a seqlock: the writer makes it odd before changing the
+state and even again after. A reader that sees the same even sequence
+before and after unpacking got a consistent snapshot; otherwise it retries.
+Only the standard library is imported, so sidecars can vendor this file:
+
+    reader = SharedStateReader("/dev/shm/zero-export.state")
+    snap = reader.read()
+    print(snap.grid_power, [(i.serial, i.power) for i in snap.inverters])
+"""
+import math
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+MAGIC = b"ZXSTATE\x00"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+SEQ_OFFSET = struct.calcsize("<8sII")
+SEQ = struct.Struct("<Q")
+STATE = struct.Struct("<6dII")
+INVERTER = struct.Struct("<16s3dII")
+
+ENABLED = 1
+METER_STALE = 2
+REACHABLE = 1
+PRODUCING = 2
+FRESH = 4
+
+
+class SharedStateError(Exception):
+    pass
+
+
+@dataclass
+class InverterState:
+    serial: str
+    power: float
+    limit: float
+    # NaN when no AC data arrived yet
+    age_s: float
+    flags: int
+
+    @property
+    def reachable(self) -> bool:
+        return bool(self.flags & REACHABLE)
+
+    @property
+    def producing(self) -> bool:
+        return bool(self.flags & PRODUCING)
+
+
+@dataclass
+class SharedSnapshot:
+    sequence: int
+    time: float
+    grid_power: float
+    grid_voltage: float
+    filtered: float
+    meter_age_s: float
+    setpoint: float
+    flags: int
+    inverters: list[InverterState] = field(default_factory=list)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.flags & ENABLED)
+
+
+def _size(max_inverters: int) -> int:
+    return HEADER.size + STATE.size + INVERTER.size * max_inverters
+
+
+class SharedStateWriter:
+    """The control loop's side: one publish() per cycle."""
+
+    def __init__(self, path: str | os.PathLike, max_inverters: int = 16):
+        self.path = Path(path)
+        self.max_inverters = max_inverters
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = _size(max_inverters)
+        # Readers keep their mapping of an older file: write a new one and swap
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.truncate(size)
+            f.write(HEADER.pack(MAGIC, LAYOUT_VERSION, max_inverters, 0))
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self.sequence = 0
+
+    def publish(self, grid_power: float, grid_voltage: float, filtered: float, meter_age_s: float,
+                setpoint: float, flags: int, inverters: list[tuple[str, float, float, float | None, int]],
+                now: float | None = None):
+        """Write one snapshot; `inverters` are (serial, power, limit, data age or None, flags)."""
+        mm = self._mm
+        inverters = inverters[:self.max_inverters]
+        seq = self.sequence
+        SEQ.pack_into(mm, SEQ_OFFSET, seq + 1)
+        STATE.pack_into(mm, HEADER.size, time.time() if now is None else now, grid_power, grid_voltage,
+                        filtered, meter_age_s, setpoint, flags, len(inverters))
+        offset = HEADER.size + STATE.size
+        for serial, power, limit, age, inv_flags in inverters:
+            INVERTER.pack_into(mm, offset, serial.encode()[:16], power, limit,
+                               math.nan if age is None else age, inv_flags, 0)
+            offset += INVERTER.size
+        self.sequence = seq + 2
+        SEQ.pack_into(mm, SEQ_OFFSET, self.sequence)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def create_shared_state(cfg) -> SharedStateWriter | None:
+    """The writer if `shared_state.enabled`."""
+    ss = cfg.get("shared_state", {})
+    if not ss.get("enabled", False):
+        return None
+    return SharedStateWriter(ss.get("path") or "/dev/shm/zero-export.state", int(ss.get("max_inverters", 16)))
+
+
+class SharedStateReader:
+    """A sidecar's side: consistent snapshots straight from the shared mapping."""
+
+    def __init__(self, path: str | os.PathLike):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_inverters, _ = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self.close()
+            raise SharedStateError(f"{path}: not a state file of layout version {LAYOUT_VERSION}")
+        self._layouts: dict[int, struct.Struct] = {}
+
+    def _slots(self, count: int) -> struct.Struct:
+        layout = self._layouts.get(count)
+        if layout is None:
+            layout = self._layouts[count] = struct.Struct("<" + INVERTER.format[1:] * count)
+        return layout
+
+    @property
+    def sequence(self) -> int:
+        """Changes with every published snapshot; cheap to poll."""
+        return SEQ.unpack_from(self._mm, SEQ_OFFSET)[0]
+
+    def read(self, retries: int = 10000) -> SharedSnapshot:
+        mm = self._mm
+        for attempt in range(retries):
+            before = SEQ.unpack_from(mm, SEQ_OFFSET)[0]
+            if before & 1:
+                # A writer preempted mid-publish needs the CPU to finish
+                if attempt >= 100:
+                    time.sleep(0)
+                continue
+            *state, count = STATE.unpack_from(mm, HEADER.size)
+            count = min(count, self.max_inverters)
+            # All slots in one call: the shorter the read, the less often a write overlaps it
+            values = self._slots(count).unpack_from(mm, HEADER.size + STATE.size)
+            if SEQ.unpack_from(mm, SEQ_OFFSET)[0] != before:
+                continue
+            return SharedSnapshot(before, *state, inverters=[
+                InverterState(values[i].rstrip(b"\x00").decode(), *values[i + 1:i + 5])
+                for i in range(0, len(values), 6)
+            ])
+        raise SharedStateError(f"No consistent snapshot after {retries} attempts")
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
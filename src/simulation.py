@@ -0,0 +1,348 @@
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Callable
+
+from src.config import Config
+from src.allocation import AllocationUnit, create_allocator
+from src.controller import create_controller
+from src.meters.filter import GridFilter
+from src.response_model import ResponseModel
+
+
+@dataclass
+class SimInverter:
+    """Hoymiles-like inverter: limit applies after a dead time, output ramps towards it."""
+    max_watt: int
+    dead_time_s: float = 1.0
+    ramp_w_per_s: float = 200.0
+    available: Callable[[float], float] | None = None
+    output: float = 0.0
+    limit: float = 0.0
+    _pending: list = field(default_factory=list)
+
+    def command(self, now: float, limit: float):
+        self._pending.append((now + self.dead_time_s, limit))
+
+    def step(self, now: float, dt: float):
+        while self._pending and self._pending[0][0] <= now:
+            self.limit = self._pending.pop(0)[1]
+        sun = self.available(now) if self.available else self.max_watt
+        target = min(self.limit, sun, self.max_watt)
+        delta = target - self.output
+        max_delta = self.ramp_w_per_s * dt
+        self.output += max(-max_delta, min(max_delta, delta))
+
+
+@dataclass
+class SimulationResult:
+    export_wh: float = 0.0
+    import_wh: float = 0.0
+    commands: int = 0
+    trace: list = field(default_factory=list)
+    command_times: list = field(default_factory=list)
+
+    def settling_time(self, after_s: float, target: float, band: float,
+                      until_s: float | None = None) -> float:
+        """Seconds from `after_s` until grid stays within target +/- band (up to `until_s`)."""
+        last_outside = after_s
+        for t, grid in self.trace:
+            if until_s is not None and t >= until_s:
+                break
+            if t >= after_s and abs(grid - target) > band:
+                last_outside = t
+        return last_outside - after_s
+
+    def convergence_cycles(self, after_s: float, target: float, band: float,
+                           until_s: float | None = None) -> int:
+        """Limit commands sent from `after_s` until the grid settled."""
+        settled_at = after_s + self.settling_time(after_s, target, band, until_s)
+        return sum(1 for t in self.command_times if after_s <= t <= settled_at)
+
+
+class Simulation:
+    """
+    Closed-loop plant model mirroring control_loop timing: one meter sample per
+    poll interval passed through the configured grid filter, the configured
+    allocation, and after each limit change either the fixed legacy wait or a
+    wait bounded by the response model.
+    """
+
+    def __init__(self, cfg: Config, inverters: list[SimInverter], load: Callable[[float], float],
+                 noise_w: float = 0.0, seed: int = 0, post_command_wait_s: float = 5.0,
+                 tick_s: float = 0.1, response: ResponseModel | None = None):
+        self.cfg = cfg
+        self.inverters = inverters
+        self.load = load
+        self.noise_w = noise_w
+        self.post_command_wait_s = post_command_wait_s
+        self.tick_s = tick_s
+        self.now = 0.0
+        self.response = response
+        self._rng = random.Random(seed)
+        self.controller = create_controller(cfg, clock=self.clock)
+        self.allocator = create_allocator(cfg)
+        self.grid_filter = GridFilter(cfg)
+        self._next_poll = 0.0
+
+    def clock(self) -> float:
+        return self.now
+
+    def grid_power(self) -> float:
+        return self.load(self.now) - sum(inv.output for inv in self.inverters)
+
+    def _observe(self) -> bool:
+        """Feed inverter output to the response model, True while any is still settling."""
+        pending = False
+        for i, inv in enumerate(self.inverters):
+            model = self.response.get(f"inv{i}")
+            model.observe(self.now, inv.output)
+            pending |= model.settling
+        return pending
+
+    def _wait_for_inverters(self, seconds: float, result: SimulationResult):
+        end = self.now + seconds
+        while self.now < end - 1e-9:
+            self._advance(min(0.5, end - self.now), result)
+            if not self._observe():
+                return
+
+    def _sample(self) -> float:
+        return self.grid_power() + self._rng.gauss(0.0, self.noise_w)
+
+    def _advance(self, seconds: float, result: SimulationResult):
+        end = self.now + seconds
+        poll_interval = float(self.cfg.powermeter.poll_interval_s)
+        while self.now < end - 1e-9:
+            if self.grid_filter.kind != "none" and self.now >= self._next_poll - 1e-9:
+                # The meter keeps being polled while waiting, so the filter
+                # has a full window when the next decision is made
+                self.grid_filter.update(self._sample(), self.now)
+                self._next_poll = self.now + poll_interval
+            for inv in self.inverters:
+                inv.step(self.now, self.tick_s)
+            grid = self.grid_power()
+            energy_wh = abs(grid) * self.tick_s / 3600
+            if grid < 0:
+                result.export_wh += energy_wh
+            else:
+                result.import_wh += energy_wh
+            self.now += self.tick_s
+
+    def run(self, duration_s: float) -> SimulationResult:
+        result = SimulationResult()
+        poll_interval = float(self.cfg.powermeter.poll_interval_s)
+        total_max = sum(inv.max_watt for inv in self.inverters)
+        last_sent = -1
+        last_shares = {}
+        tolerance = self.cfg.control.tolerance_w
+
+        while self.now < duration_s:
+            grid = self._sample()
+            result.trace.append((self.now, grid))
+            grid = self.grid_filter.control_value(self.grid_filter.update(grid, self.now))
+            self._next_poll = self.now + poll_interval
+            current = sum(inv.output for inv in self.inverters)
+            if self.response is not None:
+                # Act on the settled prediction: output still to come is
+                # credited now instead of being corrected for twice
+                self._observe()
+                pending = sum(self.response.get(f"inv{i}").remaining(self.now)
+                              for i in range(len(self.inverters)))
+                grid -= pending
+                current += pending
+            new_limit = self.controller.compute(grid, current, total_max, 0)
+
+            units = [
+                AllocationUnit(
+                    serial=f"inv{i}",
+                    max_watt=inv.max_watt,
+                    inverter_watt=inv.max_watt,
+                    min_watt=0,
+                    output=inv.output,
+                    limit=inv.limit,
+                    settled=self.response is None or self.response.get(f"inv{i}").remaining(self.now) == 0,
+                )
+                for i, inv in enumerate(self.inverters)
+            ]
+            shares = self.allocator.allocate(new_limit, units)
+            reshuffled = any(abs(share - last_shares.get(serial, -1)) > tolerance
+                             for serial, share in shares.items())
+
+            if new_limit != last_sent or reshuffled:
+                changes = []
+                for i, inv in enumerate(self.inverters):
+                    share = shares[f"inv{i}"]
+                    inv.command(self.now, share)
+                    changes.append((f"inv{i}", inv.output, share))
+                    if self.response is not None:
+                        self.response.get(f"inv{i}").command(self.now, inv.output, share)
+                result.commands += 1
+                result.command_times.append(self.now)
+                last_sent = new_limit
+                last_shares = shares
+                if self.response is not None:
+                    self._wait_for_inverters(self.response.wait_time(changes), result)
+                else:
+                    self._advance(self.post_command_wait_s, result)
+            else:
+                self._advance(poll_interval, result)
+
+        return result
+
+
+def load_step(t: float) -> float:
+    """House load with a large switch-on, a drop into export and a second rise."""
+    load = 300.0
+    if t >= 60:
+        load += 900
+    if t >= 180:
+        load -= 700
+    if t >= 300:
+        load += 400
+    return load
+
+
+LOAD_STEPS_S = (60, 180, 300)
+
+
+def shaded_load(t: float) -> float:
+    load = 500.0
+    if t >= 120:
+        load += 600
+    if t >= 240:
+        load -= 700
+    return load
+
+
+def shade(t: float) -> float:
+    """Second array shaded down to 100W between t=30s and t=330s."""
+    return 100.0 if 30 <= t < 330 else 1000.0
+
+
+SHADE_EVENTS_S = (30, 120, 240, 330)
+
+
+def spiky_load(t: float) -> float:
+    """load_step with a fridge compressor start every 45s and a 3s kettle blip every 70s."""
+    load = load_step(t)
+    if t % 45 < 2:
+        load += 600
+    if 20 <= t % 70 < 23:
+        load += 1500
+    return load
+
+
+def _scenario_config(kind: str, allocation: str = "proportional", grid_filter: dict | None = None) -> Config:
+    return Config({
+        "control": {
+            "target_point_w": 15,
+            "tolerance_w": 15,
+            "max_point_w": 31,
+            "min_point_w": 0,
+            "slow_approx_limit_percent": 50,
+            "slow_approx_factor_percent": 50,
+            "on_grid_jump_percent": 0,
+            "fast_limit_decrease": True,
+            "allocation": allocation,
+        },
+        "powermeter": {"poll_interval_s": 1, "filter": grid_filter or {"type": "none"}},
+        "controller": {"type": kind},
+    })
+
+
+def compare_controllers(kinds=("legacy", "pid"), ramp_w_per_s: float = 30.0,
+                        dead_time_s: float = 2.0, noise_w: float = 0.0,
+                        response_model: bool = False) -> dict:
+    results = {}
+    for kind in kinds:
+        cfg = _scenario_config(kind)
+        sim = Simulation(
+            cfg,
+            [SimInverter(1200, dead_time_s=dead_time_s, ramp_w_per_s=ramp_w_per_s)],
+            load_step,
+            noise_w=noise_w,
+            response=ResponseModel(cfg) if response_model else None,
+        )
+        results[kind] = sim.run(420)
+    return results
+
+
+def compare_allocation(kind: str = "pid", allocations=("proportional", "headroom"),
+                       response_model: bool = False) -> dict:
+    """Two 1000W inverters, one of them shaded for most of the run."""
+    results = {}
+    for allocation in allocations:
+        cfg = _scenario_config(kind, allocation)
+        sim = Simulation(
+            cfg,
+            [
+                SimInverter(1000, dead_time_s=2.0, ramp_w_per_s=30.0),
+                SimInverter(1000, dead_time_s=2.0, ramp_w_per_s=30.0, available=shade),
+            ],
+            shaded_load,
+            response=ResponseModel(cfg) if response_model else None,
+        )
+        results[allocation] = sim.run(420)
+    return results
+
+
+FILTER_SCENARIOS = {
+    "none": {"type": "none"},
+    "ema": {"type": "ema", "time_constant_s": 2},
+    "median": {"type": "median", "window": 5},
+    "kalman": {"type": "kalman", "process_noise": 50, "measurement_noise": 15},
+}
+
+
+def compare_filters(kind: str = "pid", filters=tuple(FILTER_SCENARIOS), noise_w: float = 15.0,
+                    seed: int = 1) -> dict:
+    """Noisy meter and short load spikes on top of the step scenario."""
+    results = {}
+    for name in filters:
+        cfg = _scenario_config(kind, grid_filter=FILTER_SCENARIOS[name])
+        sim = Simulation(
+            cfg,
+            [SimInverter(1200, dead_time_s=2.0, ramp_w_per_s=30.0)],
+            spiky_load,
+            noise_w=noise_w,
+            seed=seed,
+        )
+        results[name] = sim.run(420)
+    return results
+
+
+def _report(label: str, r: SimulationResult, events=LOAD_STEPS_S, window: float = 120):
+    settle = [r.settling_time(s, 15, 40, s + window) for s in events]
+    cycles = sum(r.convergence_cycles(s, 15, 40, s + window) for s in events)
+    print(
+        f"{label:22s} export {r.export_wh:6.2f} Wh  import {r.import_wh:6.2f} Wh  "
+        f"commands {r.commands:3d}  convergence cycles {cycles:3d}  settling "
+        + " / ".join(f"{x:.0f}s" for x in settle)
+    )
+
+
+def main():
+    logging.disable(logging.INFO)
+    for kind, r in compare_controllers().items():
+        _report(kind, r)
+    for kind, r in compare_controllers(response_model=True).items():
+        _report(f"{kind}+model", r)
+    print()
+    for kind in ("legacy", "pid"):
+        for allocation, r in compare_allocation(kind).items():
+            _report(f"{kind} {allocation}", r, SHADE_EVENTS_S, 90)
+    print()
+    for kind in ("legacy", "pid"):
+        results = compare_filters(kind)
+        base = results["none"]
+        for name, r in results.items():
+            print(
+                f"{kind + ' filter ' + name:22s} export {r.export_wh:6.2f} Wh "
+                f"({100 * (r.export_wh - base.export_wh) / base.export_wh:+4.0f}%)  import {r.import_wh:6.2f} Wh  "
+                f"commands {r.commands:3d} ({100 * (r.commands - base.commands) / base.commands:+.0f}%)"
+            )
+
+
+if __name__ == "__main__":
+    main()
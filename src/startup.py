@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import math
+import time
+
+from src.config import Config
+from src.meters.powermeter import MeterReading
+from src.metrics import STARTUP_SIGNAL_SECONDS, TIME_TO_FIRST_CONTROL
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """
+    Gates the first control cycle on what it actually needs instead of fixed
+    sleeps: MQTT connected, OpenDTU's retained state for every enabled
+    inverter, and one valid meter sample. Past `startup.timeout_s` the loop
+    starts with whatever has arrived; the cycle itself copes with missing
+    inverters and meter errors.
+    """
+
+    SIGNALS = ("mqtt", "inverters", "meter")
+
+    def __init__(self, cfg: Config, mqtt, dtu, meter, clock=time.monotonic):
+        st = cfg.get("startup", {})
+        self.timeout_s = float(st.get("timeout_s", 30))
+        self.meter_retry_s = float(st.get("meter_retry_s", 0.5))
+        self.mqtt = mqtt
+        self.dtu = dtu
+        self.meter = meter
+        self.serials = [inv.serial for inv in cfg.inverters if inv.get("enabled", True)]
+        self.clock = clock
+        self.started = clock()
+        self.ready_at: dict[str, float] = {}
+        self.first_control_s: float | None = None
+        self.sample: MeterReading | None = None
+
+    async def _meter_sample(self) -> MeterReading:
+        while True:
+            try:
+                reading = await self.meter.read_full()
+                if math.isfinite(reading.power):
+                    return reading
+                logger.warning("Startup: meter returned %r, retrying", reading.power)
+            except Exception as e:
+                logger.warning("Startup: meter not ready (%s), retrying", e)
+            await asyncio.sleep(self.meter_retry_s)
+
+    async def _signal(self, name: str, coro):
+        result = await coro
+        elapsed = self.clock() - self.started
+        self.ready_at[name] = elapsed
+        STARTUP_SIGNAL_SECONDS.set(elapsed, signal=name)
+        logger.info("Startup: %s ready after %.2fs", name, elapsed)
+        return result
+
+    async def wait(self) -> bool:
+        """Wait for all signals (or the timeout). True when everything arrived."""
+        meter = asyncio.create_task(self._signal("meter", self._meter_sample()))
+        tasks = [
+            asyncio.create_task(self._signal("mqtt", self.mqtt.wait_connected())),
+            asyncio.create_task(self._signal("inverters", self.dtu.wait_for_state(self.serials))),
+            meter,
+        ]
+        remaining = max(0.0, self.timeout_s - (self.clock() - self.started))
+        _, pending = await asyncio.wait(tasks, timeout=remaining)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        if meter.done() and not meter.cancelled():
+            self.sample = meter.result()
+        missing = [name for name in self.SIGNALS if name not in self.ready_at]
+        if missing:
+            if "inverters" in missing:
+                absent = [s for s in self.serials if not self.dtu.has_state(s)]
+                logger.warning("Startup: no OpenDTU state yet for %s", ", ".join(absent))
+            logger.warning(
+                "Startup: %s not ready after %.0fs, starting control anyway",
+                ", ".join(missing), self.timeout_s,
+            )
+        return not missing
+
+    def first_control(self):
+        """Mark the first cycle that has meter and inverter data (once)."""
+        if self.first_control_s is not None:
+            return
+        self.first_control_s = self.clock() - self.started
+        TIME_TO_FIRST_CONTROL.set(self.first_control_s)
+        logger.info("First control cycle %.2fs after start", self.first_control_s)
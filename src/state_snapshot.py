@@ -0,0 +1,62 @@
+import gzip
+import hashlib
+import json
+
+
+class StateSnapshot:
+    """
+    Full service state for /api/state, serialized once per control cycle.
+    Requests are answered from the cached bytes: 304 when If-None-Match
+    carries the current ETag, gzip (compressed once per state) when accepted.
+    """
+
+    def __init__(self, gzip_min_bytes: int = 512, gzip_level: int = 6):
+        self.gzip_min_bytes = gzip_min_bytes
+        self.gzip_level = gzip_level
+        self._body: bytes | None = None
+        self._gzipped: bytes | None = None
+        self.etag: str | None = None
+
+    def update(self, state: dict):
+        body = json.dumps(state, separators=(",", ":")).encode()
+        if body == self._body:
+            return
+        self._body = body
+        self._gzipped = None
+        # Weak: the gzip and identity variants carry the same state
+        self.etag = f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+    @property
+    def body(self) -> bytes | None:
+        return self._body
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self._body, self.gzip_level, mtime=0)
+        return self._gzipped
+
+    def _not_modified(self, request) -> bool:
+        header = request.headers.get("If-None-Match")
+        if not header:
+            return False
+        tags = {t.strip() for t in header.split(",")}
+        # Weak comparison: W/"x" and "x" name the same state
+        return "*" in tags or self.etag in tags or self.etag[2:] in tags
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        if self._body is None:
+            raise web.HTTPServiceUnavailable(text="no state yet")
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if self._not_modified(request):
+            return web.Response(status=304, headers=headers)
+        body = self._body
+        if len(body) >= self.gzip_min_bytes and "gzip" in request.headers.get("Accept-Encoding", ""):
+            body = self.gzipped()
+            headers["Content-Encoding"] = "gzip"
+        return web.Response(body=body, content_type="application/json", headers=headers)
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Frame:
+    """One cycle's state, encoded once and shared by every subscriber."""
+
+    __slots__ = ("text", "_sse")
+
+    def __init__(self, state: dict):
+        self.text = json.dumps(state, separators=(",", ":"))
+        self._sse: bytes | None = None
+
+    @property
+    def sse(self) -> bytes:
+        if self._sse is None:
+            self._sse = b"data: " + self.text.encode() + b"\n\n"
+        return self._sse
+
+
+class Subscriber:
+    def __init__(self, depth: int):
+        self.queue: asyncio.Queue[Frame] = asyncio.Queue(maxsize=depth)
+        self.dropped = 0
+
+    def offer(self, frame: Frame) -> bool:
+        """Queue a frame, True when an older one had to be dropped for it."""
+        # Slow reader: the oldest frame goes, the client always gets the latest state
+        dropped = self.queue.full()
+        if dropped:
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+        return dropped
+
+
+class StateBroadcaster:
+    """
+    Fans per-cycle state frames out to WebSocket and SSE clients. Each
+    subscriber has a queue of `depth` frames; a client that does not keep up
+    loses its oldest frames instead of growing memory.
+    """
+
+    def __init__(self, depth: int = 4, max_clients: int = 500):
+        self.depth = depth
+        self.max_clients = max_clients
+        self._subscribers: set[Subscriber] = set()
+        self.last: Frame | None = None
+        self.frames = 0
+        self.dropped = 0
+
+    @property
+    def clients(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, state: dict):
+        frame = Frame(state)
+        self.last = frame
+        self.frames += 1
+        for sub in self._subscribers:
+            if sub.offer(frame):
+                self.dropped += 1
+
+    def subscribe(self) -> Subscriber:
+        from aiohttp import web
+
+        if len(self._subscribers) >= self.max_clients:
+            raise web.HTTPServiceUnavailable(text="too many stream clients")
+        sub = Subscriber(self.depth)
+        if self.last is not None:
+            sub.offer(self.last)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self._subscribers.discard(sub)
+
+    async def handle_sse(self, request):
+        from aiohttp import web
+
+        sub = self.subscribe()
+        try:
+            resp = web.StreamResponse(headers={
+                "Content-Type": "text/event-stream",
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            })
+            await resp.prepare(request)
+            while True:
+                frame = await sub.queue.get()
+                await resp.write(frame.sse)
+        except ConnectionResetError:
+            pass
+        finally:
+            self.unsubscribe(sub)
+        return resp
+
+    async def handle_ws(self, request):
+        from aiohttp import web, WSMsgType
+
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        sub = self.subscribe()
+
+        async def writer():
+            while True:
+                frame = await sub.queue.get()
+                await ws.send_str(frame.text)
+
+        task = asyncio.create_task(writer())
+        try:
+            # Reading is only for close/ping handling; clients send nothing
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    break
+                if task.done():
+                    break
+        finally:
+            task.cancel()
+            self.unsubscribe(sub)
+        return ws
+
+
+def state_frame(t: float, enabled: bool, grid: float, setpoint: int, inverters: dict) -> dict:
+    """Compact per-cycle frame: inverters map serial -> [power, limit]."""
+    return {
+        "t": round(t, 3),
+        "enabled": enabled,
+        "grid": round(grid, 1),
+        "setpoint": setpoint,
+        "inv": {serial: [round(p, 1), round(l, 1)] for serial, (p, l) in inverters.items()},
+    }
@@ -0,0 +1,181 @@
+import logging
+import math
+import time
+from array import array
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = -1
+
+
+class _Level:
+    """
+    One resolution of a series as a slot ring: slot n (= t // resolution)
+    lives at index n % capacity, and `slots` tells which n is stored there.
+    Level 0 keeps the raw value, coarser levels min/max/sum/count.
+    """
+
+    def __init__(self, resolution_s: float, capacity: int, raw: bool):
+        self.resolution_s = resolution_s
+        self.capacity = capacity
+        self.raw = raw
+        self.slots = array("q", [_EMPTY]) * capacity
+        if raw:
+            self.values = array("d", [0.0]) * capacity
+        else:
+            self.mins = array("d", [0.0]) * capacity
+            self.maxs = array("d", [0.0]) * capacity
+            self.sums = array("d", [0.0]) * capacity
+            self.counts = array("I", [0]) * capacity
+
+    def add(self, t: float, value: float):
+        slot = int(t // self.resolution_s)
+        i = slot % self.capacity
+        if self.raw:
+            self.slots[i] = slot
+            self.values[i] = value
+        elif self.slots[i] != slot:
+            self.slots[i] = slot
+            self.mins[i] = self.maxs[i] = value
+            self.sums[i] = value
+            self.counts[i] = 1
+        else:
+            if value < self.mins[i]:
+                self.mins[i] = value
+            if value > self.maxs[i]:
+                self.maxs[i] = value
+            self.sums[i] += value
+            self.counts[i] += 1
+
+    def scan(self, start: float, end: float):
+        """(t, min, max, sum, count) of stored slots within [start, end], oldest first."""
+        res = self.resolution_s
+        last = int(end // res)
+        first = max(int(start // res), last - self.capacity + 1)
+        if last < first:
+            return
+        # The range covers at most one wrap of the ring: walk it as two
+        # contiguous slices instead of indexing slot by slot
+        a, b = first % self.capacity, last % self.capacity + 1
+        segments = [(a, b)] if a < b else [(a, self.capacity), (0, b)]
+        for lo, hi in segments:
+            valid = [i for i, slot in enumerate(self.slots[lo:hi], lo) if first <= slot <= last]
+            if self.raw:
+                values = self.values
+                for i in valid:
+                    v = values[i]
+                    yield self.slots[i] * res, v, v, v, 1
+            else:
+                for i in valid:
+                    yield self.slots[i] * res, self.mins[i], self.maxs[i], self.sums[i], self.counts[i]
+
+
+class RingSeries:
+    """Fixed-retention series with rollups, so long ranges never scan raw points."""
+
+    def __init__(self, retention_s: float, resolution_s: float, rollups_s=(10, 60)):
+        self.levels = [_Level(resolution_s, max(1, int(retention_s / resolution_s)), raw=True)]
+        for res in rollups_s:
+            if res > resolution_s:
+                self.levels.append(_Level(res, max(1, int(retention_s / res)), raw=False))
+        self.last: tuple[float, float] | None = None
+
+    def add(self, t: float, value: float):
+        for level in self.levels:
+            level.add(t, value)
+        self.last = (t, value)
+
+    def query(self, start: float, end: float, step: float) -> list[list[float]]:
+        """[bucket start, min, max, mean, count] per step-wide bucket that has data."""
+        level = self.levels[0]
+        for candidate in self.levels[1:]:
+            if candidate.resolution_s <= step:
+                level = candidate
+        # Slots come oldest first, so buckets close in order
+        points = []
+        current = None
+        for t, lo, hi, total, n in level.scan(start, end):
+            # A rollup slot may begin just before start
+            b = max(0, int((t - start) // step))
+            if current is None or b != current[0]:
+                if current is not None:
+                    points.append(current)
+                current = [b, lo, hi, total, n]
+                continue
+            if lo < current[1]:
+                current[1] = lo
+            if hi > current[2]:
+                current[2] = hi
+            current[3] += total
+            current[4] += n
+        if current is not None:
+            points.append(current)
+        return [[start + b * step, lo, hi, total / n, n] for b, lo, hi, total, n in points]
+
+
+class TimeSeriesStore:
+    """
+    In-process store of recent telemetry, fed from DataLogger.record. One
+    series per measurement field and tag set, e.g. `inverter.power{serial=...}`.
+    """
+
+    def __init__(self, cfg: Config):
+        ts = cfg.get("timeseries", {})
+        self.enabled = ts.get("enabled", True)
+        self.retention_s = float(ts.get("retention_s", 6 * 3600))
+        self.resolution_s = float(ts.get("resolution_s", 1))
+        self.rollups_s = tuple(ts.get("rollups_s", (10, 60)))
+        self.measurements = set(ts.get("measurements", ("grid", "grid_phase", "inverter", "control", "dtu")))
+        self.max_buckets = int(ts.get("max_buckets", 2000))
+        self._series: dict[str, RingSeries] = {}
+
+    @staticmethod
+    def key(measurement: str, field: str, tags: dict | None = None) -> str:
+        if not tags:
+            return f"{measurement}.{field}"
+        return f"{measurement}.{field}{{" + ",".join(f"{k}={tags[k]}" for k in sorted(tags)) + "}"
+
+    def record(self, measurement: str, fields: dict, tags: dict | None = None, t: float | None = None):
+        if not self.enabled or measurement not in self.measurements:
+            return
+        t = time.time() if t is None else t
+        for field, value in fields.items():
+            if isinstance(value, bool):
+                value = float(value)
+            elif not isinstance(value, (int, float)) or not math.isfinite(value):
+                continue
+            key = self.key(measurement, field, tags)
+            series = self._series.get(key)
+            if series is None:
+                series = RingSeries(self.retention_s, self.resolution_s, self.rollups_s)
+                self._series[key] = series
+            series.add(t, float(value))
+
+    def series(self, prefix: str = "") -> list[str]:
+        return sorted(k for k in self._series if k.startswith(prefix))
+
+    def latest(self, key: str) -> tuple[float, float] | None:
+        series = self._series.get(key)
+        return series.last if series else None
+
+    def query(self, key: str, start: float | None = None, end: float | None = None,
+              step: float | None = None) -> dict:
+        series = self._series.get(key)
+        if series is None:
+            raise KeyError(key)
+        end = time.time() if end is None else end
+        start = end - 300 if start is None else start
+        if end <= start:
+            raise ValueError("end must be after start")
+        # Bounded bucket count keeps every answer cheap, whatever range is asked
+        step = max(step or self.resolution_s, self.resolution_s, (end - start) / self.max_buckets)
+        return {
+            "series": key,
+            "start": start,
+            "end": end,
+            "step": step,
+            "columns": ["time", "min", "max", "mean", "count"],
+            "points": series.query(start, end, step),
+        }
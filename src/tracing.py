@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    duration: float = 0.0
+    error: str | None = None
+
+
+@dataclass
+class CycleTrace:
+    """
+    Stage breakdown of one control cycle. Stages are sequential: starting a
+    stage ends the previous one, so the loop body needs no re-nesting.
+    """
+
+    seq: int
+    started_ns: int
+    started: float = field(default_factory=time.perf_counter)
+    spans: list[Span] = field(default_factory=list)
+    inputs: dict = field(default_factory=dict)
+    duration: float = 0.0
+    slow: bool = False
+
+    @property
+    def current_stage(self) -> str | None:
+        return self.spans[-1].name if self.spans else None
+
+    def stage(self, name: str):
+        now = time.perf_counter()
+        self._close(now)
+        self.spans.append(Span(name, now - self.started))
+
+    def set(self, **inputs):
+        self.inputs.update(inputs)
+
+    def fail(self, exc: BaseException):
+        if self.spans:
+            self.spans[-1].error = f"{type(exc).__name__}: {exc}"
+
+    def _close(self, now: float):
+        if self.spans and not self.spans[-1].duration:
+            span = self.spans[-1]
+            span.duration = now - self.started - span.start
+
+    def busy_time(self, idle: frozenset) -> float:
+        return self.duration - sum(s.duration for s in self.spans if s.name in idle)
+
+    def to_dict(self) -> dict:
+        return {
+            "seq": self.seq,
+            "start": self.started_ns / 1e9,
+            "duration_s": round(self.duration, 6),
+            "slow": self.slow,
+            "stages": [
+                {"name": s.name, "offset_s": round(s.start, 6), "duration_s": round(s.duration, 6),
+                 **({"error": s.error} if s.error else {})}
+                for s in self.spans
+            ],
+            "inputs": self.inputs,
+        }
+
+
+class _NullCycle:
+    """Stand-in while tracing is off: every call is a no-op."""
+
+    current_stage = None
+
+    def stage(self, name: str):
+        pass
+
+    def set(self, **inputs):
+        pass
+
+    def fail(self, exc: BaseException):
+        pass
+
+
+_NULL_CYCLE = _NullCycle()
+
+
+class Tracer:
+    """
+    Keeps the last `ring_size` cycle breakdowns and, separately, the last
+    `slow_size` cycles whose busy time (excluding idle stages like the
+    post-command wait) exceeded `slow_cycle_s`. Finished cycles can be
+    appended to `otlp_file` as OTLP/JSON lines, buffered and written from a
+    worker thread every `otlp_flush_s` (run()), not on the event loop.
+    """
+
+    IDLE_STAGES = frozenset({"wait", "sleep"})
+
+    def __init__(self, cfg: Config):
+        tr = cfg.get("tracing", {})
+        self.enabled = tr.get("enabled", False)
+        self.slow_cycle_s = float(tr.get("slow_cycle_s", 1.0))
+        self.otlp_file = tr.get("otlp_file") or None
+        self.otlp_flush_s = float(tr.get("otlp_flush_s", 5.0))
+        # Lines not written yet; oldest dropped while the file is unwritable
+        self._lines: deque[str] = deque(maxlen=int(tr.get("otlp_buffer", 1000)))
+        self.service_name = tr.get("service_name", "zero-export")
+        self.recent: deque[CycleTrace] = deque(maxlen=int(tr.get("ring_size", 100)))
+        self.slow: deque[CycleTrace] = deque(maxlen=int(tr.get("slow_size", 20)))
+        self._seq = 0
+
+    def cycle(self):
+        if not self.enabled:
+            return _NULL_CYCLE
+        self._seq += 1
+        return CycleTrace(seq=self._seq, started_ns=time.time_ns())
+
+    def finish(self, cycle):
+        if cycle is _NULL_CYCLE:
+            return
+        now = time.perf_counter()
+        cycle._close(now)
+        cycle.duration = now - cycle.started
+        self.recent.append(cycle)
+        busy = cycle.busy_time(self.IDLE_STAGES)
+        if busy > self.slow_cycle_s:
+            cycle.slow = True
+            self.slow.append(cycle)
+            slowest = max(cycle.spans, key=lambda s: s.duration if s.name not in self.IDLE_STAGES else 0)
+            logger.warning(
+                "Slow control cycle #%d: %.2fs busy, slowest stage %s (%.2fs)",
+                cycle.seq, busy, slowest.name, slowest.duration,
+            )
+        if self.otlp_file:
+            self._lines.append(json.dumps(self.to_otlp(cycle)))
+
+    def query(self, limit: int = 20, slow_only: bool = False) -> list[dict]:
+        source = self.slow if slow_only else self.recent
+        return [c.to_dict() for c in list(source)[-limit:]]
+
+    def to_otlp(self, cycle: CycleTrace) -> dict:
+        trace_id = os.urandom(16).hex()
+        root_id = os.urandom(8).hex()
+        end_ns = cycle.started_ns + int(cycle.duration * 1e9)
+
+        def attrs(values: dict) -> list:
+            out = []
+            for k, v in values.items():
+                if isinstance(v, bool):
+                    value = {"boolValue": v}
+                elif isinstance(v, int):
+                    value = {"intValue": str(v)}
+                elif isinstance(v, float):
+                    value = {"doubleValue": v}
+                else:
+                    value = {"stringValue": json.dumps(v) if isinstance(v, (dict, list)) else str(v)}
+                out.append({"key": k, "value": value})
+            return out
+
+        spans = [{
+            "traceId": trace_id,
+            "spanId": root_id,
+            "name": "control_cycle",
+            "kind": 1,
+            "startTimeUnixNano": str(cycle.started_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": attrs({"cycle.seq": cycle.seq, "cycle.slow": cycle.slow, **cycle.inputs}),
+        }]
+        for s in cycle.spans:
+            start_ns = cycle.started_ns + int(s.start * 1e9)
+            span = {
+                "traceId": trace_id,
+                "spanId": os.urandom(8).hex(),
+                "parentSpanId": root_id,
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int(s.duration * 1e9)),
+            }
+            if s.error:
+                span["status"] = {"code": 2, "message": s.error}
+            spans.append(span)
+
+        return {"resourceSpans": [{
+            "resource": {"attributes": attrs({"service.name": self.service_name})},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]}
+
+    def _write(self, lines: list[str]):
+        try:
+            with open(self.otlp_file, "a") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError:
+            logger.warning("Could not write trace to %s, export disabled", self.otlp_file)
+            self.otlp_file = None
+
+    def flush(self):
+        """Write buffered OTLP lines now (blocking)."""
+        if self.otlp_file and self._lines:
+            lines = list(self._lines)
+            self._lines.clear()
+            self._write(lines)
+
+    async def run(self):
+        while self.otlp_file:
+            await asyncio.sleep(self.otlp_flush_s)
+            if self._lines:
+                # Taken on the loop, written off it
+                lines = list(self._lines)
+                self._lines.clear()
+                await asyncio.to_thread(self._write, lines)
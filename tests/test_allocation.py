@@ -0,0 +1,72 @@
+import pytest
+from src.allocation import (
+    AllocationUnit, HeadroomAllocator, ProportionalAllocator, create_allocator,
+)
+from src.config import Config
+
+@pytest.fixture
+def cfg():
+    return Config({"control": {"allocation": "headroom", "sun_limited_ratio": 0.95, "sun_limited_probe_w": 50}})
+
+def unit(serial, output=0.0, limit=0.0, max_watt=1000, min_watt=50, factor=1.0, settled=True):
+    return AllocationUnit(
+        serial=serial, max_watt=max_watt, inverter_watt=max_watt, min_watt=min_watt,
+        compensate_factor=factor, output=output, limit=limit, settled=settled,
+    )
+
+def test_create_allocator(cfg):
+    assert isinstance(create_allocator(cfg), HeadroomAllocator)
+    assert isinstance(create_allocator(Config({"control": {}})), ProportionalAllocator)
+    with pytest.raises(ValueError):
+        create_allocator(Config({"control": {"allocation": "random"}}))
+
+def test_proportional_matches_legacy_dispatch():
+    units = [unit("a", max_watt=600), unit("b", max_watt=1200, factor=1.1)]
+
+    shares = ProportionalAllocator().allocate(900, units)
+
+    # a: 900 * 600/1800 = 300; b: 600 * 1.1 = 660
+    assert shares == {"a": 300, "b": 660}
+
+def test_proportional_respects_min_watt():
+    shares = ProportionalAllocator().allocate(40, [unit("a"), unit("b")])
+    assert shares == {"a": 50, "b": 50}
+
+def test_headroom_moves_share_from_shaded(cfg):
+    # b applies a 500W limit but only produces 100W
+    units = [unit("a", output=500, limit=500), unit("b", output=100, limit=500)]
+
+    shares = HeadroomAllocator(cfg).allocate(1000, units)
+
+    # b is counted at 100W and keeps a 50W probe margin, a takes the rest
+    assert shares == {"a": 900, "b": 150}
+
+def test_headroom_no_shade_is_proportional(cfg):
+    units = [unit("a", output=490, limit=500), unit("b", output=495, limit=500)]
+    assert HeadroomAllocator(cfg).allocate(1000, units) == {"a": 500, "b": 500}
+
+def test_headroom_ramping_inverter_is_not_shaded(cfg):
+    units = [unit("a", output=500, limit=500), unit("b", output=100, limit=500, settled=False)]
+    assert HeadroomAllocator(cfg).allocate(1000, units) == {"a": 500, "b": 500}
+
+def test_headroom_leftover_goes_back_to_shaded(cfg):
+    units = [unit("a", output=1000, limit=1000), unit("b", output=100, limit=1000)]
+
+    # More than a can take: b may climb again
+    shares = HeadroomAllocator(cfg).allocate(1600, units)
+    assert shares == {"a": 1000, "b": 600}
+
+def test_headroom_capped_stays_classified(cfg):
+    allocator = HeadroomAllocator(cfg)
+    first = allocator.allocate(1000, [unit("a", output=500, limit=500), unit("b", output=100, limit=500)])
+
+    # Next cycle b applies its capped limit and still produces 100W
+    b = unit("b", output=100, limit=first["b"])
+    assert allocator.is_sun_limited(b)
+
+def test_headroom_cut_reaches_the_shaded_inverter(cfg):
+    units = [unit("a", output=1000, limit=1000, min_watt=0), unit("b", output=100, limit=1000, min_watt=0)]
+
+    # Below what b produces: no probe margin, both are cut
+    assert HeadroomAllocator(cfg).allocate(0, units) == {"a": 0, "b": 0}
+    assert HeadroomAllocator(cfg).allocate(120, units) == {"a": 60, "b": 60}
@@ -0,0 +1,236 @@
+"""
+Throughput of the per-cycle hot paths at realistic fleet sizes, gated
+against tests/data/benchmark_baseline.json.
+
+Rates are divided by that of a fixed pure-Python calibration workload
+timed next to them, so the baseline carries over between machines of
+different speed. A benchmark fails when its normalised rate stays more
+than BENCH_TOLERANCE (default 0.35) below the baseline over ATTEMPTS
+measurements. After an intentional change, refresh the baseline with
+
+    BENCH_UPDATE=1 pytest tests/test_benchmarks.py
+"""
+import json
+import os
+import platform
+import statistics
+import time
+from pathlib import Path
+
+import pytest
+from src.allocation import HeadroomAllocator, ProportionalAllocator
+from src.config import Config
+from src.controller import PIDController, ZeroExportController
+from src.data_logger import DataLogger
+from src.dtu.opendtu import OpenDTUAdapter
+from src.main import _allocation_units
+from src.response_model import ResponseModel
+from src.timeseries import TimeSeriesStore
+
+BASELINE = Path(__file__).parent / "data" / "benchmark_baseline.json"
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", 0.35))
+UPDATE = os.environ.get("BENCH_UPDATE") == "1"
+# A run below the tolerance is measured again before it counts as a regression
+ATTEMPTS = 3
+
+# A single home, a small commercial roof, a large one
+FLEETS = (2, 16, 64)
+
+CONTROL = {
+    "target_point_w": 20, "tolerance_w": 10, "max_point_w": 5000, "min_point_w": -5000,
+    "slow_approx_limit_percent": 10, "slow_approx_factor_percent": 50, "on_grid_jump_percent": 20,
+    "fast_limit_decrease": True, "loop_interval_s": 1, "set_limit_timeout_s": 5,
+}
+
+
+def _batch(op, min_time: float) -> int:
+    """Calls of `op` that take about `min_time / 10`."""
+    n = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(n):
+            op()
+        if time.perf_counter() - started >= min_time / 10:
+            return n
+        n *= 2
+
+
+def _rate(op, n: int, min_time: float) -> float:
+    count = 0
+    started = time.perf_counter()
+    while (elapsed := time.perf_counter() - started) < min_time:
+        for _ in range(n):
+            op()
+        count += n
+    return count / elapsed
+
+
+def measure(op, min_time: float = 0.05, repeat: int = 9) -> tuple[float, float]:
+    """
+    Median calls per second of `op`, and the median over `repeat` rounds of
+    its rate divided by the calibration rate timed right next to it. The
+    two swap order every round, so a machine that speeds up or slows down
+    mid-run shifts both sides of each ratio alike.
+    """
+    n, n_cal = _batch(op, min_time), _batch(_calibration_op, min_time)
+    rates, ratios = [], []
+    for i in range(repeat):
+        if i % 2:
+            calibration = _rate(_calibration_op, n_cal, min_time)
+            rate = _rate(op, n, min_time)
+        else:
+            rate = _rate(op, n, min_time)
+            calibration = _rate(_calibration_op, n_cal, min_time)
+        rates.append(rate)
+        ratios.append(rate / calibration)
+    return statistics.median(rates), statistics.median(ratios)
+
+
+def _calibration_op():
+    # Dict, attribute-free arithmetic and string work, like the code under test
+    d = {}
+    for i in range(100):
+        d[f"k{i}"] = i * 1.5
+    return sum(v for v in d.values() if v > 10)
+
+
+def fleet_config(size: int) -> Config:
+    return Config({
+        "mqtt": {"opendtu_topic": "solar"},
+        "opendtu": {"ip": "127.0.0.1", "user": "admin", "password": ""},
+        "control": CONTROL,
+        "response_model": {"enabled": True},
+        "inverters": [{"serial": f"1161{i:08d}", "max_watt": 800 if i % 2 else 1600, "inverter_watt": 1600,
+                       "min_watt_percent": 5, "enabled": True} for i in range(size)],
+    })
+
+
+def fleet_dtu(cfg: Config) -> OpenDTUAdapter:
+    dtu = OpenDTUAdapter(cfg, cfg.inverters)
+    for i, inv in enumerate(cfg.inverters):
+        values = {f"{inv.serial}/0/power": str(300 + 7 * i), f"{inv.serial}/status/limit_absolute": "600",
+                  f"{inv.serial}/status/reachable": "1", f"{inv.serial}/status/producing": "1"}
+        dtu.ingest(values, time.monotonic())
+    return dtu
+
+
+def bench_legacy_compute():
+    controller = ZeroExportController(Config({"control": CONTROL}))
+    grid = [250.0, -80.0, 15.0, 600.0, -300.0, 30.0]
+    state = {"i": 0}
+
+    def op():
+        i = state["i"] = state["i"] + 1
+        controller.compute(grid[i % 6], 1500.0 + grid[(i + 3) % 6], 4000, 100)
+    return op
+
+
+def bench_pid_compute():
+    controller = PIDController(Config({"control": CONTROL, "controller": {"type": "pid", "kd": 0.05}}))
+    grid = [250.0, -80.0, 15.0, 600.0, -300.0, 30.0]
+    state = {"i": 0}
+
+    def op():
+        i = state["i"] = state["i"] + 1
+        controller.compute(grid[i % 6], 1500.0 + grid[(i + 3) % 6], 4000, 100)
+    return op
+
+
+def bench_distribution(allocator_cls, size):
+    """What control_loop does per cycle to split the total: build the units, allocate."""
+    def factory():
+        cfg = fleet_config(size)
+        dtu = fleet_dtu(cfg)
+        response = ResponseModel(cfg)
+        allocator = allocator_cls(cfg)
+        inverters = cfg.inverters
+        watts = {inv.serial: dtu.get_ac_power(inv.serial) for inv in inverters}
+        total = int(sum(inv.max_watt for inv in inverters) * 0.6)
+
+        def op():
+            allocator.allocate(total, _allocation_units(inverters, watts, dtu, response, time.monotonic()))
+        return op
+    return factory
+
+
+def bench_getters(size):
+    """The adapter reads of one cycle: activity checks, output, limit and freshness per inverter."""
+    def factory():
+        cfg = fleet_config(size)
+        dtu = fleet_dtu(cfg)
+        serials = [inv.serial for inv in cfg.inverters]
+
+        def op():
+            now = time.monotonic()
+            for serial in serials:
+                dtu.is_reachable(serial)
+                dtu.is_producing(serial)
+                dtu.get_ac_power(serial)
+                dtu.get_limit_absolute(serial)
+                dtu.data_age(serial, "ac", now)
+                dtu.is_fresh(serial, "ac")
+        return op
+    return factory
+
+
+def bench_record(influx: bool):
+    """One inverter's telemetry point, into the in-memory series (and the InfluxDB buffer)."""
+    def factory():
+        cfg = Config({"influxdb": {"enabled": influx, "url": "http://127.0.0.1:9", "token": "t", "org": "o",
+                                   "bucket": "b", "max_buffer_points": 10**9}})
+        telemetry = DataLogger(cfg, store=TimeSeriesStore(cfg))
+        fields = {"power": 412.5, "dc_power": 430.1, "voltage": 231.0, "current": 1.79, "frequency": 50.01,
+                  "temperature": 41.2, "limit": 600.0, "yield_day": 1830.0, "producing": True}
+        tags = {"serial": "116100000001", "name": "Roof"}
+        buffer = getattr(telemetry, "_buffer", None)
+
+        def op():
+            telemetry.record("inverter", fields, tags)
+            if buffer is not None and len(buffer) > 10000:
+                buffer.clear()
+        return op
+    return factory
+
+
+BENCHMARKS = {
+    "controller.legacy.compute": bench_legacy_compute,
+    "controller.pid.compute": bench_pid_compute,
+    **{f"distribution.proportional.{n}": bench_distribution(ProportionalAllocator, n) for n in FLEETS},
+    **{f"distribution.headroom.{n}": bench_distribution(HeadroomAllocator, n) for n in FLEETS},
+    **{f"opendtu.getters.{n}": bench_getters(n) for n in FLEETS},
+    "data_logger.record.memory": bench_record(influx=False),
+    "data_logger.record.influx": bench_record(influx=True),
+}
+
+
+def _load_baseline() -> dict:
+    if BASELINE.exists():
+        return json.loads(BASELINE.read_text())
+    return {"benchmarks": {}}
+
+
+@pytest.mark.parametrize("name", BENCHMARKS)
+def test_throughput(name):
+    if name == "data_logger.record.influx":
+        pytest.importorskip("influxdb_client")
+    op = BENCHMARKS[name]()
+    rate, relative = measure(op)
+    baseline = _load_baseline()
+    if UPDATE:
+        baseline["benchmarks"][name] = {"ops_per_s": round(rate, 1), "relative": round(relative, 6)}
+        baseline.update(python=platform.python_version(), machine=platform.machine(),
+                        calibration_ops_per_s=round(rate / relative, 1))
+        BASELINE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        return
+
+    entry = baseline["benchmarks"].get(name)
+    assert entry is not None, f"No baseline for {name}: run BENCH_UPDATE=1 pytest {__file__}"
+    attempts = [(rate, relative)]
+    while relative < entry["relative"] * (1 - TOLERANCE) and len(attempts) < ATTEMPTS:
+        attempts.append(measure(op))
+        rate, relative = max(attempts, key=lambda a: a[1])
+    change = relative / entry["relative"] - 1
+    assert change >= -TOLERANCE, (
+        f"{name}: {rate:,.0f} ops/s is {-change:.0%} below the baseline in the best of {len(attempts)} runs "
+        f"(normalised {relative:.4f} vs {entry['relative']:.4f}, tolerance {TOLERANCE:.0%})"
+    )
@@ -0,0 +1,171 @@
+import time
+
+import pytest
+from src.compliance import ComplianceTracker, area_below, interval_start
+from src.config import Config
+
+# Local midnight, so every configured interval starts here
+DAY = interval_start(1_700_000_000, 86400)
+
+def make(path=None, **compliance):
+    return ComplianceTracker(Config({"compliance": {"intervals_s": [60, 900, 86400], **compliance}}), path=path)
+
+def feed(tracker, samples):
+    done = []
+    for t, p in samples:
+        done += tracker.observe(p, DAY + t)
+    return done
+
+def test_area_below():
+    assert area_below(100, 200, 10, 0) == (0.0, 0.0)
+    assert area_below(-360, -360, 10, 0) == (10, pytest.approx(1.0))
+    # Crossing halfway: 5s below, triangle of 100W x 5s
+    seconds, wh = area_below(100, -100, 10, 0)
+    assert seconds == pytest.approx(5.0)
+    assert wh == pytest.approx(100 * 5 / 2 / 3600)
+    assert area_below(-100, 100, 10, 0)[0] == pytest.approx(5.0)
+
+def test_constant_export_over_a_minute():
+    tracker = make()
+    done = feed(tracker, [(t, -360.0) for t in range(0, 61)])
+    minute = done[0]
+    assert minute.length_s == 60 and minute.start == DAY
+    assert minute.export_wh == pytest.approx(6.0)
+    assert minute.import_wh == 0.0
+    assert minute.violation_s == pytest.approx(60.0)
+    assert minute.violation_wh == pytest.approx(6.0)
+    assert minute.max_export_w == 360.0
+    assert tracker.current[900].export_wh == pytest.approx(6.0)
+
+def test_threshold_and_zero_crossing():
+    tracker = make(threshold_w=-100)
+    feed(tracker, [(0, 100.0), (10, -300.0)])
+    stats = tracker.current[60]
+    # Zero at 2.5s, threshold at 5s
+    assert stats.import_wh == pytest.approx(100 * 2.5 / 2 / 3600)
+    assert stats.export_wh == pytest.approx(300 * 7.5 / 2 / 3600)
+    assert stats.violation_s == pytest.approx(5.0)
+    assert stats.violation_wh == pytest.approx(200 * 5 / 2 / 3600)
+
+def test_segment_split_at_interval_boundary():
+    tracker = make()
+    done = feed(tracker, [(50, -360.0), (70, -360.0)])
+    assert [s.length_s for s in done] == [60]
+    assert done[0].export_wh == pytest.approx(1.0)
+    assert tracker.current[60].start == DAY + 60
+    assert tracker.current[60].export_wh == pytest.approx(1.0)
+    assert tracker.current[900].export_wh == pytest.approx(2.0)
+
+def test_gaps_are_not_integrated():
+    tracker = make(max_gap_s=5)
+    feed(tracker, [(0, -360.0), (1, -360.0), (30, -360.0), (31, -360.0)])
+    stats = tracker.current[60]
+    assert stats.export_wh == pytest.approx(0.2)
+    assert stats.covered_s == pytest.approx(2.0)
+    assert stats.samples == 4
+
+def test_memory_stays_constant_over_a_day():
+    tracker = make()
+    done = feed(tracker, [(t, -50.0 if 43200 <= t < 43260 else 200.0) for t in range(0, 86401, 2)])
+    assert len(tracker.current) == len(tracker.completed) == 3
+    assert sum(1 for s in done if s.length_s == 60) == 1440
+    day = tracker.completed[86400]
+    # 58s between the samples at -50W, 0.4s on each crossing
+    assert day.violation_s == pytest.approx(58.0 + 2 * 2 * 50 / 250)
+    assert day.covered_s == pytest.approx(86400.0)
+
+@pytest.fixture
+def berlin(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Berlin")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def test_days_follow_local_midnight_across_dst(berlin):
+    # Berlin switches to summer time on 2026-03-29 and back on 2026-10-25
+    tracker = make(intervals_s=[900, 86400])
+    spring = time.mktime((2026, 3, 28, 0, 0, 0, 0, 0, -1))
+    days = [d for d in feed_from(tracker, spring, 3 * 86400) if d.length_s == 86400]
+    assert [time.localtime(d.start)[:4] for d in days] == [(2026, 3, d, 0) for d in (28, 29, 30)]
+    assert [round(d.covered_s / 3600) for d in days] == [24, 23, 24]
+
+    tracker = make(intervals_s=[900, 86400])
+    autumn = time.mktime((2026, 10, 24, 0, 0, 0, 0, 0, -1))
+    done = feed_from(tracker, autumn, 3 * 86400)
+    days = [d for d in done if d.length_s == 86400]
+    assert [time.localtime(d.start)[:4] for d in days] == [(2026, 10, d, 0) for d in (24, 25)]
+    assert [round(d.covered_s / 3600) for d in days] == [24, 25]
+    quarters = [d for d in done if d.length_s == 900]
+    assert all(time.localtime(d.start).tm_min % 15 == 0 for d in quarters)
+    assert {d.end - d.start for d in quarters} == {900}
+
+def feed_from(tracker, start, duration):
+    done = []
+    for t in range(0, int(duration), 20):
+        done += tracker.observe(100.0, start + t)
+    return done
+
+def test_group_readings_are_accounted_at_read_time(monkeypatch):
+    from unittest.mock import MagicMock
+
+    from src.main import _account
+    from src.meters.powermeter import MeterReading
+
+    tracker = make()
+    # A meter group reports its oldest member's time, here stuck on a late member
+    reading = MeterReading(power=-360.0, timestamp=DAY)
+    for t in range(0, 61):
+        monkeypatch.setattr("src.main.time.time", lambda t=t: DAY + t)
+        _account(tracker, MagicMock(), reading)
+    assert tracker.rejected == 0
+    assert tracker.completed[60].export_wh == pytest.approx(6.0)
+
+    # Out-of-order samples are counted, not integrated
+    tracker.observe(-360.0, DAY + 30)
+    assert tracker.rejected == 1
+    assert tracker.current[60].samples == 1
+
+def test_checkpoint_survives_restart(tmp_path):
+    path = tmp_path / "state" / "compliance.json"
+    tracker = make(path)
+    feed(tracker, [(t, -360.0) for t in range(0, 31)])
+    tracker.save()
+
+    restarted = make(path)
+    restarted.load()
+    assert restarted.current[60].export_wh == pytest.approx(3.0)
+    # Continues integrating from the checkpointed sample
+    feed(restarted, [(t, -360.0) for t in range(32, 61)])
+    assert restarted.completed[60].export_wh == pytest.approx(6.0)
+    assert restarted.state()["intervals"]["60"]["last"]["export_wh"] == pytest.approx(6.0)
+
+def test_checkpoint_is_rate_limited(tmp_path):
+    path = tmp_path / "compliance.json"
+    tracker = make(path, checkpoint_s=60)
+    tracker.observe(100.0, time.time())
+    tracker.maybe_save(100.0)
+    assert path.exists()
+    path.unlink()
+    tracker.maybe_save(130.0)
+    assert not path.exists()
+    tracker.maybe_save(161.0)
+    assert path.exists()
+
+@pytest.mark.asyncio
+async def test_compliance_endpoint():
+    import json
+
+    from aiohttp import web
+    from src.http_api import COMPLIANCE_KEY, _http_compliance
+
+    class Request:
+        app = web.Application()
+
+    tracker = make()
+    feed(tracker, [(0, -360.0), (10, -360.0)])
+    Request.app[COMPLIANCE_KEY] = tracker
+    resp = await _http_compliance(Request())
+    body = json.loads(resp.body)
+    assert body["intervals"]["900"]["current"]["export_wh"] == pytest.approx(1.0)
+    assert body["intervals"]["60"]["last"] is None
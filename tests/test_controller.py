@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import MagicMock
-from src.controller import ZeroExportController
+from src.controller import ZeroExportController, PIDController, create_controller
 from src.config import Config
 
 @pytest.fixture
@@ -149,3 +149,105 @@ def test_tolerance(controller):
     )
     
     assert new_setpoint == 500
+
+
+@pytest.fixture
+def pid_config(mock_config):
+    data = dict(mock_config.raw())
+    data["controller"] = {"type": "pid", "kp": 0.5, "ki": 0.1, "kd": 0.0}
+    return Config(data)
+
+@pytest.fixture
+def clock():
+    class Clock:
+        now = 0.0
+        def __call__(self):
+            return self.now
+    return Clock()
+
+def test_create_controller_selects_type(mock_config, pid_config):
+    assert isinstance(create_controller(mock_config), ZeroExportController)
+    assert isinstance(create_controller(pid_config), PIDController)
+
+    bad = Config({**mock_config.raw(), "controller": {"type": "fuzzy"}})
+    with pytest.raises(ValueError):
+        create_controller(bad)
+
+def test_pid_feed_forward(pid_config, clock):
+    pid = PIDController(pid_config, clock=clock)
+    clock.now = 1.0
+
+    # Error = 220. FF 1000 + P 110 + I 22
+    new_setpoint = pid.compute(
+        grid_watts=240,
+        current_inverter_watts=1000,
+        max_watt=2000,
+        min_watt=0
+    )
+
+    assert new_setpoint == 1132
+
+def test_pid_anti_windup(pid_config, clock):
+    pid = PIDController(pid_config, clock=clock)
+
+    # Sun-limited: importing at max, integral must stop growing once clamped
+    for step in range(1, 50):
+        clock.now = float(step)
+        pid.compute(grid_watts=1000, current_inverter_watts=400, max_watt=1200, min_watt=0)
+
+    assert pid._last_setpoint == 1200
+    assert pid._integral <= 1200 - 400
+
+def test_pid_fast_cut_drops_integral(pid_config, clock):
+    pid = PIDController(pid_config, clock=clock)
+    pid._integral = 300.0
+    clock.now = 1.0
+
+    # Grid -6000 < min -5000: cut straight from measured output
+    new_setpoint = pid.compute(
+        grid_watts=-6000,
+        current_inverter_watts=2000,
+        max_watt=2000,
+        min_watt=0
+    )
+
+    assert new_setpoint == 0
+    assert pid._integral == 0.0
+
+def test_pid_tolerance(pid_config, clock):
+    pid = PIDController(pid_config, clock=clock)
+    pid._last_setpoint = 500
+    clock.now = 1.0
+
+    assert pid.compute(grid_watts=25, current_inverter_watts=480, max_watt=2000, min_watt=0) == 500
+
+def test_state_reports_mode(controller, pid_config, clock):
+    assert controller.state() == {"type": "legacy", "mode": "idle", "last_setpoint": 0}
+    controller._last_setpoint = 2000
+    controller.compute(grid_watts=-6000, current_inverter_watts=2000, max_watt=2000, min_watt=0)
+    assert controller.state()["mode"] == "fast_cut"
+
+    pid = PIDController(pid_config, clock=clock)
+    clock.now = 1.0
+    pid.compute(grid_watts=240, current_inverter_watts=1000, max_watt=2000, min_watt=0)
+    state = pid.state()
+    assert state["type"] == "pid" and state["mode"] == "regulate"
+    assert state["last_setpoint"] == 1132
+
+def test_stale_output_skips_saturation_rebase(controller):
+    # Output 200W against a 1000W setpoint looks like saturation...
+    controller._last_setpoint = 1000
+    assert controller.compute(grid_watts=-100, current_inverter_watts=200, max_watt=2000, min_watt=0) == 80
+
+    # ...unless the measurement is stale: regulate from the setpoint
+    controller._last_setpoint = 1000
+    assert controller.compute(grid_watts=-100, current_inverter_watts=200, max_watt=2000, min_watt=0,
+                              output_fresh=False) == 880
+
+def test_pid_stale_output_uses_last_setpoint(pid_config, clock):
+    pid = PIDController(pid_config, clock=clock)
+    pid._last_setpoint = 900
+    clock.now = 1.0
+    # Error 220: FF 900 (not the stale 100W) + P 110 + I 22
+    assert pid.compute(grid_watts=240, current_inverter_watts=100, max_watt=2000, min_watt=0,
+                       output_fresh=False) == 1032
@@ -61,3 +61,20 @@ async def test_flush_exception_rebuffering(data_logger):
         
         assert len(data_logger._buffer) == 1
         assert data_logger._client is None
+
+@pytest.mark.asyncio
+async def test_rebuffer_drops_oldest_when_full(data_logger):
+    from src.metrics import TELEMETRY_POINTS
+    data_logger._max_buffer = 2
+    dropped = TELEMETRY_POINTS.get(stage="dropped")
+    with patch("src.data_logger.InfluxDBClientAsync") as MockClient:
+        mock_write_api = AsyncMock()
+        mock_write_api.write.side_effect = Exception("Influx Error")
+        MockClient.return_value.write_api.return_value = mock_write_api
+
+        for i in range(3):
+            data_logger.record("measurement", {"field": i})
+        await data_logger.flush()
+
+        assert len(data_logger._buffer) == 2
+        assert TELEMETRY_POINTS.get(stage="dropped") == dropped + 1
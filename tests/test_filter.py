@@ -0,0 +1,70 @@
+import random
+
+import pytest
+from src.config import Config
+from src.meters.filter import EmaFilter, GridFilter, KalmanFilter, MedianFilter
+
+def make(kind, **params):
+    return GridFilter(Config({
+        "control": {"min_point_w": 0},
+        "powermeter": {"filter": {"type": kind, **params}},
+    }))
+
+def test_unknown_filter_type():
+    with pytest.raises(ValueError):
+        make("lowpass")
+
+def test_passthrough_by_default():
+    f = GridFilter(Config({"control": {"min_point_w": 0}, "powermeter": {}}))
+    assert f.kind == "none"
+    assert f.update(123.0, 0.0).value == 123.0
+
+def test_median_rejects_short_spike():
+    f = MedianFilter(window=5)
+    values = [f.update(v, t).value for t, v in enumerate([100, 100, 100, 1600, 1600, 100])]
+    assert max(values) == 100
+
+def test_median_drops_stale_samples():
+    f = MedianFilter(window=5, max_age_s=5.0)
+    for t in range(4):
+        f.update(100.0, t)
+    # After a long wait only the fresh sample counts
+    assert f.update(500.0, 20.0).value == 500.0
+
+def test_ema_weights_by_elapsed_time():
+    short, long = EmaFilter(time_constant_s=2.0), EmaFilter(time_constant_s=2.0)
+    short.update(0.0, 0.0)
+    long.update(0.0, 0.0)
+    assert short.update(100.0, 1.0).value < long.update(100.0, 10.0).value < 100.0
+
+def test_kalman_reduces_noise_and_tracks_trend():
+    rng = random.Random(0)
+    f = KalmanFilter(process_noise=0.5, measurement_noise=20.0)
+    errors, rates = [], []
+    for t in range(120):
+        truth = 200.0 + 2.0 * t
+        reading = f.update(truth + rng.gauss(0.0, 20.0), float(t))
+        if t >= 60:
+            errors.append(abs(reading.value - truth))
+            rates.append(reading.rate)
+    assert sum(errors) / len(errors) < 10.0
+    assert sum(rates) / len(rates) == pytest.approx(2.0, abs=0.5)
+    assert reading.predict(5.0) == pytest.approx(reading.value + 5.0 * reading.rate)
+
+def test_export_bypasses_filter():
+    f = make("median", window=5)
+    for t in range(5):
+        f.update(200.0, float(t))
+    reading = f.update(-400.0, 5.0)
+    assert reading.bypassed
+    assert f.control_value(reading) == -400.0
+    # The filter restarts from the export, not from the old import
+    assert f.update(-380.0, 6.0).value < 0
+
+def test_noise_around_target_is_not_bypassed():
+    f = make("ema", time_constant_s=2.0)
+    rng = random.Random(1)
+    readings = [f.update(15.0 + rng.gauss(0.0, 10.0), float(t)) for t in range(60)]
+    # Noise dipping just below zero stays filtered once the noise level is known
+    assert not any(r.bypassed for r in readings[20:] if r.raw > -10)
+    assert 5.0 < readings[-1].variance ** 0.5 < 25.0
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+from src.import_profile import LAZY_MODULES, ROOT, measure, report, total_ms
+
+# Generous for a dev machine (~100 ms here); eager aiohttp/influxdb-client alone add ~300 ms
+BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 250))
+
+def test_heavy_dependencies_load_lazily():
+    code = f"import sys, src.main; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT)
+    assert out.stdout.strip() == ""
+
+def test_import_time_budget(capsys):
+    # Best of three: the budget is about what we import, not machine jitter
+    runs = [measure() for _ in range(3)]
+    best = min(runs, key=total_ms)
+    with capsys.disabled():
+        print(f"\n  import src.main: {total_ms(best):.1f} ms (budget {BUDGET_MS:.0f} ms)")
+    assert total_ms(best) < BUDGET_MS, report(best)
+
+def test_report_lists_direct_imports():
+    text = report(measure(), top=5)
+    assert text.startswith("src.main: ")
+    assert "src.config" in text
+    assert "Loaded eagerly (should be lazy): none" in text
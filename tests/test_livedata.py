@@ -0,0 +1,419 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.config import Config
+from src.dtu.livedata import HttpLivedataSource, WebSocketLivedataSource, create_push_source, inverter_values
+from src.dtu.opendtu import OpenDTUAdapter
+from src.metrics import LIVEDATA_HTTP_ACTIVE, LIVEDATA_WS_FRAMES
+
+# Frames of a two-inverter OpenDTU's /livedata WebSocket
+RECORDED_FRAMES = (Path(__file__).parent / "data" / "opendtu_livedata_frames.jsonl").read_text().splitlines()
+
+SERIALS = [f"1161{i:08d}" for i in range(8)]
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def v(value, unit=""):
+    return {"v": value, "u": unit, "d": 1}
+
+def inverter(serial, power=300.0, data_age=2, detail=True):
+    inv = {
+        "serial": serial, "name": f"inv-{serial[-2:]}", "data_age": data_age,
+        "reachable": True, "producing": True, "limit_relative": 50.0, "limit_absolute": 400.0,
+    }
+    if detail:
+        inv["AC"] = {"0": {"Power": v(power, "W"), "Voltage": v(231.2, "V"), "Current": v(1.3, "A"),
+                           "Frequency": v(50.01, "Hz"), "PowerFactor": v(0.99), "ReactivePower": v(2.1, "var")}}
+        inv["INV"] = {"0": {"Power DC": v(power + 12, "W"), "YieldDay": v(1234, "Wh"),
+                            "YieldTotal": v(456.7, "kWh"), "Temperature": v(38.5, "°C")}}
+        inv["DC"] = {str(ch): {"Power": v(power / 4 + 3, "W"), "Voltage": v(31.0 + ch, "V"),
+                               "Current": v(2.5, "A"), "YieldDay": v(300, "Wh"),
+                               "YieldTotal": v(110.0, "kWh"), "Irradiation": v(41.0, "%")}
+                     for ch in range(4)}
+    return inv
+
+class StubDTU:
+    """OpenDTU /api/livedata/status, either with full detail or summary only (newer firmware)."""
+
+    def __init__(self):
+        self.detail = True
+        self.fail = False
+        self.requests = 0
+
+    async def livedata(self, request):
+        self.requests += 1
+        if self.fail:
+            return web.Response(status=503)
+        serial = request.query.get("inv")
+        if serial:
+            return web.json_response({"inverters": [inverter(serial)]})
+        return web.json_response({
+            "inverters": [inverter(s, 300.0 + i, detail=self.detail) for i, s in enumerate(SERIALS)],
+            "total": {"Power": v(2428.0, "W")},
+        })
+
+@pytest_asyncio.fixture
+async def stub():
+    dtu = StubDTU()
+    app = web.Application()
+    app.router.add_get("/api/livedata/status", dtu.livedata)
+    async with TestServer(app) as server:
+        dtu.address = f"{server.host}:{server.port}"
+        yield dtu
+
+def make(stub, clock, **fallback):
+    cfg = Config({
+        "mqtt": {"opendtu_topic": "solar"},
+        "opendtu": {"ip": stub.address, "user": "admin", "password": "secret",
+                    "http_fallback": {"after_s": 10, "interval_s": 2, **fallback}},
+    })
+    inverters = [Config({"serial": s}) for s in SERIALS]
+    dtu = OpenDTUAdapter(cfg, inverters, clock=clock)
+    return dtu, HttpLivedataSource(cfg, dtu, clock=clock)
+
+def test_livedata_maps_to_mqtt_topic_paths():
+    status, data = inverter_values(inverter("116100000001", power=420.0))
+    assert status["116100000001/status/reachable"] == "1"
+    assert status["116100000001/status/limit_absolute"] == "400.0"
+    assert status["116100000001/name"] == "inv-01"
+    assert data["116100000001/0/power"] == "420.0"
+    assert data["116100000001/0/powerdc"] == "432.0"
+    assert data["116100000001/0/yieldday"] == "1234"
+    # DC channel 0 is MQTT channel 1
+    assert data["116100000001/1/voltage"] == "31.0"
+    assert data["116100000001/4/voltage"] == "34.0"
+
+@pytest.mark.asyncio
+async def test_fetch_fills_inverter_state(stub):
+    clock = FakeClock()
+    dtu, source = make(stub, clock)
+    try:
+        await source.fetch()
+    finally:
+        await source.close()
+    serial = SERIALS[3]
+    assert dtu.get_ac_power(serial) == 303.0
+    assert dtu.get_panel_voltages(serial) == [31.0, 32.0, 33.0, 34.0]
+    assert dtu.is_reachable(serial) and dtu.is_producing(serial)
+    assert dtu.is_dtu_online()
+    # AC data as old as OpenDTU says, the status as of the response
+    assert dtu.data_age(serial, "ac") == 2.0
+    assert dtu.data_age(serial, "status") == 0.0
+    assert stub.requests == 1
+
+@pytest.mark.asyncio
+async def test_summary_only_firmware_fetches_details(stub):
+    stub.detail = False
+    dtu, source = make(stub, FakeClock())
+    try:
+        await source.fetch()
+    finally:
+        await source.close()
+    assert stub.requests == 1 + len(SERIALS)
+    assert all(dtu.get_ac_power(s) == 300.0 for s in SERIALS)
+
+@pytest.mark.asyncio
+async def test_mqtt_wins_over_older_http_values(stub):
+    clock = FakeClock()
+    dtu, source = make(stub, clock)
+    await dtu.handle_mqtt(f"solar/{SERIALS[0]}/0/power", "777")
+    try:
+        await source.fetch()
+    finally:
+        await source.close()
+    # The HTTP value is 2s old, the MQTT one is current
+    assert dtu.get_ac_power(SERIALS[0]) == 777.0
+
+@pytest.mark.asyncio
+async def test_switches_on_when_mqtt_stale_and_back_off(stub):
+    clock = FakeClock()
+    dtu, source = make(stub, clock)
+    await dtu.handle_mqtt("solar/dtu/status", "1")
+
+    assert await source.step() == 2
+    assert not source.active and stub.requests == 0
+
+    clock.now += 11
+    assert await source.step() == 2
+    assert source.active and stub.requests == 1
+    assert LIVEDATA_HTTP_ACTIVE.get() == 1
+    assert dtu.get_ac_power(SERIALS[0]) == 300.0
+
+    stub.fail = True
+    assert await source.step() == 4
+    assert await source.step() == 8
+
+    await dtu.handle_mqtt(f"solar/{SERIALS[0]}/0/power", "310")
+    await source.step()
+    assert not source.active and source._session is None
+    assert LIVEDATA_HTTP_ACTIVE.get() == 0
+    assert stub.requests == 3
+
+@pytest.mark.asyncio
+async def test_switches_on_while_only_other_topics_arrive(stub):
+    clock = FakeClock()
+    dtu, source = make(stub, clock)
+    await dtu.handle_mqtt(f"solar/{SERIALS[0]}/0/power", "310")
+    for _ in range(3):
+        clock.now += 5
+        # DTU housekeeping and the echo of our own limit command
+        await dtu.handle_mqtt("solar/dtu/uptime", "1234")
+        await dtu.handle_mqtt(f"solar/{SERIALS[0]}/cmd/limit_nonpersistent_absolute", "600")
+    assert dtu.push_age() == 15
+    try:
+        await source.step()
+    finally:
+        await source.close()
+    assert source.active and stub.requests == 1
+
+@pytest.mark.asyncio
+async def test_bulk_fetch_against_mqtt_ingest(stub, capsys):
+    """One livedata request against the per-topic MQTT messages carrying the same values."""
+    clock = FakeClock()
+    dtu, source = make(stub, clock)
+    messages = []
+    for i, serial in enumerate(SERIALS):
+        status, data = inverter_values(inverter(serial, 300.0 + i))
+        messages += [(f"solar/{path}", payload) for path, payload in {**status, **data}.items()]
+
+    rounds = 50
+    try:
+        await source.fetch()  # Connection set up outside the measurement
+        wall, cpu = time.perf_counter(), time.process_time()
+        for _ in range(rounds):
+            count = await source.fetch()
+        http_wall = (time.perf_counter() - wall) / rounds
+        http_cpu = (time.process_time() - cpu) / rounds
+    finally:
+        await source.close()
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(rounds):
+        for topic, payload in messages:
+            await dtu.handle_mqtt(topic, payload)
+    mqtt_wall = (time.perf_counter() - wall) / rounds
+    mqtt_cpu = (time.process_time() - cpu) / rounds
+
+    with capsys.disabled():
+        print(f"\n  {len(SERIALS)} inverters, {count} values: "
+              f"HTTP bulk {http_wall * 1e3:.2f} ms ({http_cpu * 1e3:.2f} ms CPU, stub server included), "
+              f"MQTT ingest of {len(messages)} topics {mqtt_wall * 1e3:.2f} ms ({mqtt_cpu * 1e3:.2f} ms CPU)")
+    assert count == len(messages)
+    assert http_wall < 0.1
+
+
+class ReplayDTU:
+    """Stand-in for OpenDTU's /livedata WebSocket: replays recorded frames, then closes."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.connections = 0
+        self.sent_at: list[float] = []
+
+    async def livedata(self, request):
+        self.connections += 1
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str("not json")
+        for frame in self.frames:
+            self.sent_at.append(time.perf_counter())
+            await ws.send_str(frame)
+            await asyncio.sleep(0.002)
+        await ws.close()
+        return ws
+
+@pytest_asyncio.fixture
+async def replay():
+    dtu = ReplayDTU(RECORDED_FRAMES)
+    app = web.Application()
+    app.router.add_get("/livedata", dtu.livedata)
+    async with TestServer(app) as server:
+        dtu.address = f"{server.host}:{server.port}"
+        yield dtu
+
+def make_ws(address, clock, sleep):
+    cfg = Config({
+        "mqtt": {"opendtu_topic": "solar"},
+        "opendtu": {"ip": address, "user": "admin", "password": "secret", "source": "websocket",
+                    "websocket": {"reconnect_min_s": 1, "reconnect_max_s": 4}},
+    })
+    inverters = [Config({"serial": "116190123456"}), Config({"serial": "114182345678"})]
+    dtu = OpenDTUAdapter(cfg, inverters, clock=clock)
+    return dtu, WebSocketLivedataSource(cfg, dtu, clock=clock, sleep=sleep)
+
+@pytest.mark.asyncio
+async def test_websocket_replay_fills_state_and_reconnects(replay):
+    clock = FakeClock()
+    delays = []
+    reconnected = asyncio.Event()
+
+    async def sleep(seconds):
+        delays.append(seconds)
+        if len(delays) == 2:
+            reconnected.set()
+        await asyncio.sleep(0)
+
+    dtu, source = make_ws(replay.address, clock, sleep)
+    clock.now += 30
+    frames = LIVEDATA_WS_FRAMES.get()
+    task = asyncio.create_task(source.run())
+    try:
+        await asyncio.wait_for(reconnected.wait(), 5)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert replay.connections == 2
+    assert source.frames == 2 * len(RECORDED_FRAMES)
+    assert LIVEDATA_WS_FRAMES.get() == frames + 2 * len(RECORDED_FRAMES)
+    # Each connection worked: the backoff starts over
+    assert delays == [1, 1]
+    # Last recorded frame of each inverter
+    assert dtu.get_ac_power("116190123456") == pytest.approx(891.0)
+    assert dtu.get_panel_powers("114182345678") == [130.0, 127.0, 0.0, 0.0]
+    assert dtu.get_limit_absolute("114182345678") == 600.0
+    assert dtu.push_age() == 0.0 and dtu.data_age("116190123456") == 0.0
+
+@pytest.mark.asyncio
+async def test_websocket_backoff_while_dtu_down():
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+        if len(delays) == 5:
+            raise asyncio.CancelledError
+        await asyncio.sleep(0)
+
+    # Nothing listens on port 9
+    dtu, source = make_ws("127.0.0.1:9", FakeClock(), sleep)
+    with pytest.raises(asyncio.CancelledError):
+        await source.run()
+    assert delays == [1, 2, 4, 4, 4]
+
+def test_push_source_selection():
+    def source(name):
+        cfg = Config({"mqtt": {"opendtu_topic": "solar"},
+                      "opendtu": {"ip": "10.0.0.5", "user": "", "password": "", "source": name}})
+        return create_push_source(cfg, OpenDTUAdapter(cfg, []))
+
+    assert source("mqtt") is None
+    ws = source("websocket")
+    assert isinstance(ws, WebSocketLivedataSource) and ws.url == "ws://10.0.0.5/livedata"
+    with pytest.raises(ValueError):
+        source("carrier_pigeon")
+
+class BrokerHop:
+    """
+    Stands in for the broker: publisher -> relay -> subscriber over two
+    localhost TCP connections, one line per MQTT message, as OpenDTU
+    publishes every value on its own topic.
+    """
+
+    def __init__(self):
+        self.subscriber = None
+
+    async def _client(self, reader, writer):
+        if self.subscriber is None:
+            # First connection subscribes, held open until the end
+            self.subscriber = writer
+            await reader.read()
+            return
+        while line := await reader.readline():
+            self.subscriber.write(line)
+            await self.subscriber.drain()
+
+    async def start(self, handle):
+        self.server = await asyncio.start_server(self._client, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        reader, self._sub_writer = await asyncio.open_connection("127.0.0.1", port)
+        while self.subscriber is None:
+            await asyncio.sleep(0.001)
+        _, self.publisher = await asyncio.open_connection("127.0.0.1", port)
+
+        async def receive():
+            while line := await reader.readline():
+                topic, _, payload = line.decode().rstrip("\n").partition("\t")
+                await handle(topic, payload)
+        self.receiver = asyncio.create_task(receive())
+
+    async def stop(self):
+        self.receiver.cancel()
+        self.publisher.close()
+        self._sub_writer.close()
+        self.server.close()
+
+@pytest.mark.asyncio
+async def test_websocket_latency_against_mqtt(replay, capsys):
+    """Frame sent to inverter state updated, against the same update as MQTT messages through a broker hop."""
+    serial = "116190123456"
+    clock = FakeClock()
+    dtu, source = make_ws(replay.address, clock, asyncio.sleep)
+
+    ws_latencies = []
+    handle_frame = source.handle_frame
+
+    def timed_frame(text):
+        count = handle_frame(text)
+        if count:
+            ws_latencies.append(time.perf_counter() - replay.sent_at[len(ws_latencies)])
+        return count
+
+    source.handle_frame = timed_frame
+    task = asyncio.create_task(source.run())
+    try:
+        while len(ws_latencies) < len(RECORDED_FRAMES):
+            await asyncio.sleep(0.005)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    # The same updates as OpenDTU's per-value MQTT publishes
+    updates = []
+    for frame in RECORDED_FRAMES:
+        for inv in json.loads(frame)["inverters"]:
+            status, data = inverter_values(inv)
+            updates.append([(f"solar/{path}", payload) for path, payload in {**status, **data}.items()])
+
+    done = asyncio.Event()
+    last_topic = None
+
+    async def handle(topic, payload):
+        await dtu.handle_mqtt(topic, payload)
+        if topic == last_topic:
+            done.set()
+
+    hop = BrokerHop()
+    await hop.start(handle)
+    mqtt_latencies = []
+    try:
+        for messages in updates:
+            last_topic = messages[-1][0]
+            done.clear()
+            started = time.perf_counter()
+            for topic, payload in messages:
+                hop.publisher.write(f"{topic}\t{payload}\n".encode())
+            await hop.publisher.drain()
+            await asyncio.wait_for(done.wait(), 2)
+            mqtt_latencies.append(time.perf_counter() - started)
+    finally:
+        await hop.stop()
+
+    def median_ms(values):
+        return sorted(values)[len(values) // 2] * 1e3
+
+    with capsys.disabled():
+        print(f"\n  update latency, median of {len(RECORDED_FRAMES)}: WebSocket frame {median_ms(ws_latencies):.2f} ms, "
+              f"MQTT via broker hop ({len(updates[0])} messages) {median_ms(mqtt_latencies):.2f} ms")
+    assert dtu.get_ac_power(serial) == pytest.approx(891.0)
+    assert median_ms(ws_latencies) < 50
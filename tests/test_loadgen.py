@@ -0,0 +1,47 @@
+import json
+import os
+import random
+
+import pytest
+from src.dtu.opendtu import field_group
+from src.loadgen import ROUND_END, main, round_messages, run_load, serials
+
+def test_round_follows_opendtu_layout():
+    messages = round_messages("solar", "116100000001", 2, random.Random(1))
+    paths = [topic.split("/", 2)[2] for topic, _ in messages]
+    assert paths[-1] == ROUND_END
+    assert {field_group(p) for p in paths} == {"ac", "dc", "limit", "status"}
+    assert "0/power" in paths and "0/yieldtotal" in paths
+    assert "2/irradiation" in paths and "3/power" not in paths
+    assert all(float(payload) >= 0 for _, payload in messages)
+    assert len(set(serials(3))) == 3
+
+@pytest.mark.asyncio
+async def test_every_published_message_is_ingested():
+    result = await run_load(5, channels=2, rate_hz=10, duration_s=0.5)
+    assert result.mode == "stand-in"
+    assert result.published == 5 * 10 * 0.5 * result.messages_per_round
+    assert result.ingested == result.published
+    assert not result.lagging
+    assert set(result.lag_ms) == {"p50", "p95", "p99", "max"}
+    assert result.loop_lag_ms["max"] >= 0
+
+def test_cli_appends_json_lines(tmp_path):
+    out = tmp_path / "loadgen.jsonl"
+    for _ in range(2):
+        main(["--inverters", "2,3", "--channels", "1", "--rate", "4", "--duration", "0.25", "-o", str(out)])
+    runs = [json.loads(line) for line in out.read_text().splitlines()]
+    assert len(runs) == 2
+    assert [r["inverters"] for r in runs[1]["results"]] == [2, 3]
+    assert {"python", "machine", "cpus", "time"} <= set(runs[0])
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.environ.get("LOADGEN_CAPACITY") != "1", reason="set LOADGEN_CAPACITY=1 to run")
+async def test_ingest_capacity():
+    """Fleets of 4-channel inverters polled at 1 Hz, and the saturated ingest rate."""
+    for inverters, rate in ((20, 1), (100, 1), (200, 10)):
+        r = await run_load(inverters, channels=4, rate_hz=rate, duration_s=1.0)
+        assert r.ingested == r.published, (
+            f"{inverters} inverters @ {rate} Hz: {r.ingested} of {r.published} messages ingested, "
+            f"{r.ingest_per_s:,.0f} msg/s, lag p99 {r.lag_ms['p99']:.1f} ms, CPU {r.cpu_percent:.0f}%"
+        )
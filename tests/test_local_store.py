@@ -0,0 +1,236 @@
+import time
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.config import Config
+from src.data_logger import DataLogger
+from src.local_store import LocalStore, Segment, create_local_store
+from src.report import ReportBuilder, build_report, local_events
+
+T0 = 1_700_000_000.0 // 3600 * 3600
+
+def make(path, **local_store):
+    return LocalStore(Config({"local_store": {"partition_s": 3600, "segment_rows": 1000, **local_store}}), path)
+
+def fill(store, start, seconds, serial="116190123456"):
+    for t in range(seconds):
+        store.record("grid", {"power": float(t), "voltage": 230.0}, t=start + t)
+        store.record("inverter", {"yield_total": 10.0 + t * 0.001, "producing": True},
+                     {"serial": serial, "name": "Roof"}, t=start + t)
+
+def test_range_query_across_segments_and_partitions(tmp_path):
+    store = make(tmp_path)
+    fill(store, T0, 7200)
+    assert store.series("grid.") == ["grid.power", "grid.voltage"]
+    assert len(store.partitions()) == 2
+    # 4 values a second, 1000 rows per segment
+    assert len(list(tmp_path.glob("*.raw"))) == 2 * 15
+
+    points = store.query("grid.power", T0 + 3590, T0 + 3610)
+    assert [t for t, _ in points] == [T0 + s for s in range(3590, 3610)]
+    assert [v for _, v in points] == [float(s) for s in range(3590, 3610)]
+    assert store.query("inverter.producing{name=Roof,serial=116190123456}", T0, T0 + 2) == [(T0, 1.0), (T0 + 1, 1.0)]
+    with pytest.raises(KeyError):
+        store.query("grid.nothing", T0, T0 + 10)
+    store.close()
+
+def test_compaction_keeps_results_and_retention_drops(tmp_path):
+    store = make(tmp_path, retention_s=7200)
+    fill(store, T0, 7200)
+    before = store.query("grid.power", T0 + 100, T0 + 7000)
+
+    store.maintain(now=T0 + 7200 + 61)
+    assert [p.name for p in tmp_path.glob("*.seg")] == [f"{int(T0)}.seg", f"{int(T0) + 3600}.seg"]
+    assert not list(tmp_path.glob("*.raw"))
+    assert store.query("grid.power", T0 + 100, T0 + 7000) == before
+    seg = Segment(tmp_path / f"{int(T0)}.seg")
+    assert seg.count == seg.capacity == 4 * 3600
+    seg.close()
+
+    store.maintain(now=T0 + 3600 + 7200)
+    assert store.partitions() == [T0 + 3600]
+    assert store.query("grid.power", T0, T0 + 3600) == []
+    store.close()
+
+def test_late_points_during_compaction_are_kept(tmp_path):
+    import src.local_store
+
+    store = make(tmp_path)
+    fill(store, T0, 10)
+    store.record("grid", {"power": 1.0}, t=T0 + 3600)
+    write_sorted = src.local_store.write_sorted
+
+    def late_write(path, partition, rows):
+        # The event loop writes a late point into the partition being compacted
+        store.record("grid", {"power": -1.0}, t=T0 + 20)
+        write_sorted(path, partition, rows)
+
+    with patch("src.local_store.write_sorted", late_write):
+        store.compact(T0)
+    # The next late point opens another segment, next to the one written during compaction
+    store.record("grid", {"power": 1.0}, t=T0 + 3601)
+    store.record("grid", {"power": -2.0}, t=T0 + 21)
+    assert sorted(p.name for p in tmp_path.glob(f"{int(T0)}-*.raw")) == [f"{int(T0)}-0001.raw", f"{int(T0)}-0002.raw"]
+    store.record("grid", {"power": 1.0}, t=T0 + 3602)
+
+    store.compact(T0)
+    assert store.query("grid.power", T0 + 9, T0 + 30) == [(T0 + 9, 9.0), (T0 + 20, -1.0), (T0 + 21, -2.0)]
+    store.close()
+
+def test_reopen_after_restart(tmp_path):
+    store = make(tmp_path)
+    fill(store, T0, 100)
+    store.close()
+
+    reopened = make(tmp_path)
+    assert reopened.series("grid.") == ["grid.power", "grid.voltage"]
+    fill(reopened, T0 + 100, 100)
+    points = reopened.query("grid.power", T0, T0 + 200)
+    assert len(points) == 200 and points[-1] == (T0 + 199, 99.0)
+    reopened.maintain(now=T0 + 3600 + 61)
+    assert len(reopened.query("grid.power", T0, T0 + 200)) == 200
+    reopened.close()
+
+def test_rows_past_the_header_count_are_ignored(tmp_path):
+    store = make(tmp_path)
+    fill(store, T0, 10)
+    seg = store._active
+    # A row written but not yet counted (crash mid-append)
+    seg.ts[seg.count] = T0 + 10
+    seg.values[seg.count] = 99.0
+    store.close()
+    assert len(make(tmp_path).query("grid.power", T0, T0 + 3600)) == 10
+
+def test_create_local_store(tmp_path):
+    def cfg(enabled, influx=True):
+        return Config({"state_dir": str(tmp_path), "influxdb": {"enabled": influx},
+                       "local_store": {"enabled": enabled}})
+
+    with patch("src.data_logger.HAS_INFLUX", True):
+        assert create_local_store(cfg("auto")) is None
+        assert create_local_store(cfg("auto", influx=False)).path == tmp_path / "telemetry"
+        assert create_local_store(cfg(True)) is not None
+    with patch("src.data_logger.HAS_INFLUX", False):
+        assert create_local_store(cfg("auto")) is not None
+        assert create_local_store(cfg(False)) is None
+
+@pytest.mark.asyncio
+async def test_data_logger_writes_local_store_without_influx(tmp_path):
+    store = make(tmp_path)
+    with patch("src.data_logger.HAS_INFLUX", False):
+        telemetry = DataLogger(Config({"influxdb": {}}), local=store)
+    telemetry.record("grid", {"power": -42.0})
+    await telemetry.flush()
+    assert store.query("grid.power", 0, time.time() + 1)[-1][1] == -42.0
+    await telemetry.close()
+
+@pytest.mark.asyncio
+async def test_report_from_local_store(tmp_path):
+    store = make(tmp_path)
+    fill(store, T0, 1800)
+    builder = ReportBuilder(["116190123456"])
+    rows = []
+
+    class Sink:
+        def write(self, done):
+            rows.extend(done)
+
+        def close(self):
+            pass
+
+    await build_report(local_events(store, ["116190123456"], T0, T0 + 1800), builder, Sink())
+    assert len(rows) == 2
+    assert rows[1][-1] == pytest.approx(900.0)
+    store.close()
+
+class InfluxStandIn:
+    """InfluxDB v2 write and query endpoints: line protocol in, annotated CSV out."""
+
+    def __init__(self):
+        self.lines = 0
+        self.rows = 0
+
+    async def write(self, request):
+        body = await request.read()
+        self.lines += body.count(b"\n") + 1
+        return web.Response(status=204)
+
+    async def query(self, request):
+        head = ("#datatype,string,long,dateTime:RFC3339,double,string,string\n"
+                "#group,false,false,false,false,true,true\n"
+                "#default,_result,,,,,\n"
+                ",result,table,_time,_value,_field,_measurement\n")
+        resp = web.StreamResponse(headers={"Content-Type": "text/csv"})
+        await resp.prepare(request)
+        await resp.write(head.encode())
+        chunk = []
+        for i in range(self.rows):
+            stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(T0 + i))
+            chunk.append(f",,0,{stamp}Z,{float(i)},power,grid\n")
+            if len(chunk) == 1000:
+                await resp.write("".join(chunk).encode())
+                chunk = []
+        await resp.write("".join(chunk).encode() + b"\n")
+        return resp
+
+@pytest_asyncio.fixture
+async def influx():
+    stand_in = InfluxStandIn()
+    app = web.Application()
+    app.router.add_post("/api/v2/write", stand_in.write)
+    app.router.add_post("/api/v2/query", stand_in.query)
+    async with TestServer(app) as server:
+        stand_in.url = f"http://{server.host}:{server.port}"
+        yield stand_in
+
+@pytest.mark.asyncio
+async def test_throughput_against_influx(influx, tmp_path, capsys):
+    """Grid telemetry written and read back: local store against the InfluxDB path on a stand-in server."""
+    from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
+
+    cycles = 5000
+    fields = {"power": 250.0, "voltage": 231.0, "current": 1.1, "pf": 0.99, "reactive": 3.0}
+
+    cfg = Config({"influxdb": {"url": influx.url, "token": "t", "org": "o", "bucket": "b"}})
+    telemetry = DataLogger(cfg)
+    started = time.perf_counter()
+    for _ in range(cycles):
+        telemetry.record("grid", fields)
+    await telemetry.flush()
+    influx_write = cycles * len(fields) / (time.perf_counter() - started)
+    await telemetry.close()
+    assert influx.lines == cycles
+
+    store = make(tmp_path, segment_rows=65536)
+    telemetry = DataLogger(Config({"influxdb": {"enabled": False}}), local=store)
+    started = time.perf_counter()
+    for i in range(cycles):
+        store.record("grid", fields, t=T0 + i)
+    await telemetry.flush()
+    local_write = cycles * len(fields) / (time.perf_counter() - started)
+
+    influx.rows = cycles
+    async with InfluxDBClientAsync(url=influx.url, token="t", org="o") as client:
+        started = time.perf_counter()
+        records = [r async for r in await client.query_api().query_stream('from(bucket: "b")')]
+        influx_read = len(records) / (time.perf_counter() - started)
+    assert len(records) == cycles
+
+    started = time.perf_counter()
+    points = store.query("grid.power", T0, T0 + cycles)
+    raw_read = len(points) / (time.perf_counter() - started)
+    store.maintain(now=T0 + 3 * 3600)
+    started = time.perf_counter()
+    points = store.query("grid.power", T0, T0 + cycles)
+    compacted_read = len(points) / (time.perf_counter() - started)
+    assert len(points) == cycles
+    await telemetry.close()
+
+    with capsys.disabled():
+        print(f"\n  write: InfluxDB path {influx_write:,.0f} values/s, local store {local_write:,.0f} values/s"
+              f"\n  read:  InfluxDB path {influx_read:,.0f} points/s, local store {raw_read:,.0f} points/s raw, "
+              f"{compacted_read:,.0f} points/s compacted")
+    assert local_write > influx_write
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+from src.config import Config
+from src.meters.group import GroupMember, MeterGroup, MeterGroupError, create_meter, merge_readings
+from src.meters.powermeter import MeterReading, PhaseReading, PowerMeter
+
+class FakeMeter:
+    def __init__(self, reading, latency=0.0):
+        self.reading = reading
+        self.latency = latency
+        self.fail = False
+
+    async def read_full(self):
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise OSError("unreachable")
+        return MeterReading(**{**self.reading.__dict__, "timestamp": time.time()})
+
+def three_phase(a, b, c):
+    phases = [PhaseReading(name, p, 230.0, abs(p) / 230.0, 1.0) for name, p in zip("abc", (a, b, c))]
+    return MeterReading(power=a + b + c, voltage=230.0, phases=phases, total=10.0)
+
+def member(name, reading, latency=0.0, deadline_s=0.5, phase=None):
+    return GroupMember(name, FakeMeter(reading, latency), deadline_s, phase)
+
+@pytest.mark.asyncio
+async def test_read_latency_is_the_slowest_meter():
+    group = MeterGroup([member(f"m{i}", MeterReading(power=100.0), latency=0.1) for i in range(4)])
+    started = time.perf_counter()
+    reading = await group.read_full()
+    assert time.perf_counter() - started < 0.2
+    assert reading.power == 400.0
+
+@pytest.mark.asyncio
+async def test_phases_merge_across_meters():
+    group = MeterGroup([
+        member("house", three_phase(300.0, -200.0, 100.0)),
+        member("garage", MeterReading(power=50.0, voltage=232.0, current=0.5, total=2.0), phase="b"),
+    ])
+    reading = await group.read_full()
+    assert reading.power == 250.0
+    assert reading.total == 12.0
+    phases = {p.name: p for p in reading.phases}
+    assert phases["b"].power == -150.0
+    assert phases["b"].voltage == pytest.approx(231.0)
+    assert phases["a"].power == 300.0 and phases["c"].power == 100.0
+    assert reading.timestamp > 0
+
+@pytest.mark.asyncio
+async def test_late_meter_falls_back_to_previous_reading():
+    slow = member("garage", MeterReading(power=50.0), deadline_s=0.05)
+    group = MeterGroup([member("house", MeterReading(power=100.0)), slow], max_stale_s=5.0)
+    assert (await group.read_full()).stale == []
+
+    slow.meter.latency = 1.0
+    started = time.perf_counter()
+    reading = await group.read_full()
+    assert time.perf_counter() - started < 0.2
+    assert reading.power == 150.0
+    assert reading.stale == ["garage"]
+
+    # Too old to stand in
+    group.max_stale_s = 0.0
+    slow.last.timestamp -= 1.0
+    with pytest.raises(MeterGroupError):
+        await group.read_full()
+
+@pytest.mark.asyncio
+async def test_failing_meter_without_history_fails_the_read():
+    broken = member("garage", MeterReading(power=50.0))
+    broken.meter.fail = True
+    group = MeterGroup([member("house", MeterReading(power=100.0)), broken])
+    with pytest.raises(MeterGroupError, match="garage"):
+        await group.read_full()
+
+def test_merge_without_phases_keeps_totals():
+    merged = merge_readings([MeterReading(power=10.0, voltage=231.0), MeterReading(power=-30.0)])
+    assert merged.power == -20.0
+    assert merged.voltage == 231.0
+    assert merged.phases == []
+
+def test_create_meter():
+    single = create_meter(Config({"powermeter": {"type": "gen1_em", "ip": "1.2.3.4", "user": "", "password": ""}}))
+    assert isinstance(single, PowerMeter)
+
+    group = create_meter(Config({"powermeter": {
+        "meter_deadline_s": 0.7,
+        "meters": [
+            {"name": "house", "type": "gen2_3em_pro", "ip": "10.0.0.2"},
+            {"type": "gen2_plus_1pm", "ip": "10.0.0.3", "phase": "c", "deadline_s": 0.3},
+        ],
+    }}))
+    assert isinstance(group, MeterGroup)
+    assert [(m.name, m.deadline_s, m.phase) for m in group.members] == [("house", 0.7, None), ("meter2", 0.3, "c")]
+    assert group.members[0].meter.meter_type == "gen2_3em_pro"
+
+@pytest.mark.asyncio
+async def test_3em_reading_keeps_all_phases():
+    meter = PowerMeter("1.2.3.4", "", "", meter_type="gen1_3em")
+    meter._get_json = AsyncMock(return_value={
+        "total_power": 450.0,
+        "emeters": [
+            {"power": 100.0, "voltage": 230.0, "current": 0.5, "pf": 0.9, "total": 1.0},
+            {"power": 200.0, "voltage": 231.0, "current": 0.9, "pf": 0.95, "total": 2.0},
+            {"power": 150.0, "voltage": 229.0, "current": 0.7, "pf": 0.92, "total": 3.0},
+        ],
+    })
+    reading = await meter.read_full()
+    assert [(p.name, p.power, p.voltage) for p in reading.phases] == [
+        ("a", 100.0, 230.0), ("b", 200.0, 231.0), ("c", 150.0, 229.0)]
+    assert reading.voltage == 230.0
+    assert reading.total == 6.0
+    assert reading.timestamp > 0
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.config import Config
+from src.controller import PIDController, ZeroExportController
+from src.meters.guard import GuardedMeter
+from src.meters.powermeter import PowerMeter
+from src.metrics import METER_FALLBACKS, METER_HEDGES
+
+class StubShelly:
+    """Shelly EM /emeter/0 with a scripted delay (or failure) per request."""
+
+    def __init__(self):
+        self.script: list = []
+        self.requests = 0
+        self.power = 250.0
+
+    async def emeter(self, request):
+        self.requests += 1
+        step = self.script.pop(0) if self.script else 0.0
+        if step == "error":
+            return web.Response(status=500, text="internal error")
+        await asyncio.sleep(step)
+        return web.json_response({"power": self.power, "voltage": 231.0, "total": 1000.0})
+
+@pytest_asyncio.fixture
+async def shelly():
+    stub = StubShelly()
+    app = web.Application()
+    app.router.add_get("/emeter/0", stub.emeter)
+    async with TestServer(app) as server:
+        stub.address = f"{server.host}:{server.port}"
+        yield stub
+
+def guarded(stub, **powermeter):
+    cfg = Config({"powermeter": {"read_deadline_s": 0.5, "hedge_after_s": 0.1, **powermeter}})
+    return GuardedMeter(cfg, PowerMeter(stub.address, "", "", emeter_index=0))
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged(shelly):
+    meter = guarded(shelly)
+    hedges = METER_HEDGES.get(reason="slow")
+    shelly.script = [2.0, 0.01]
+
+    started = time.perf_counter()
+    reading = await meter.read_full()
+    assert time.perf_counter() - started < 0.3
+    assert reading.power == 250.0 and reading.age_s == 0.0
+    assert shelly.requests == 2
+    assert METER_HEDGES.get(reason="slow") == hedges + 1
+
+@pytest.mark.asyncio
+async def test_failed_request_is_retried(shelly):
+    meter = guarded(shelly)
+    shelly.script = ["error", 0.0]
+    reading = await meter.read_full()
+    assert reading.power == 250.0
+    assert shelly.requests == 2
+
+@pytest.mark.asyncio
+async def test_deadline_falls_back_to_last_good_reading(shelly):
+    meter = guarded(shelly, read_deadline_s=0.3, stale_after_s=0.2)
+    await meter.read_full()
+    fallbacks = METER_FALLBACKS.get()
+
+    await asyncio.sleep(0.1)
+    shelly.power = -900.0
+    shelly.script = [5.0, 5.0]
+    started = time.perf_counter()
+    reading = await meter.read_full()
+    assert time.perf_counter() - started < 0.45
+    assert reading.power == 250.0
+    assert 0.3 < reading.age_s < 1.0
+    assert meter.is_stale(reading)
+    assert METER_FALLBACKS.get() == fallbacks + 1
+
+@pytest.mark.asyncio
+async def test_no_fallback_before_first_good_reading(shelly):
+    meter = guarded(shelly, read_deadline_s=0.2)
+    shelly.script = [5.0, 5.0]
+    with pytest.raises(asyncio.TimeoutError):
+        await meter.read_full()
+
+@pytest.mark.asyncio
+async def test_hedging_off_single_request(shelly):
+    meter = guarded(shelly, hedge_after_s=0, read_deadline_s=0.2)
+    shelly.script = ["error"]
+    with pytest.raises(Exception):
+        await meter.read_full()
+    assert shelly.requests == 1
+
+def test_deadline_follows_loop_interval(caplog):
+    meter = GuardedMeter(Config({"powermeter": {}, "control": {"loop_interval_s": 0.5}}), meter=None)
+    assert meter.read_deadline_s == pytest.approx(0.4)
+    assert meter.hedge_after_s == pytest.approx(0.2)
+    assert GuardedMeter(Config({"powermeter": {}}), meter=None).read_deadline_s == pytest.approx(0.8)
+    assert not caplog.records
+
+    GuardedMeter(Config({"powermeter": {"read_deadline_s": 2.0}, "control": {"loop_interval_s": 1}}), meter=None)
+    assert "exceeds control.loop_interval_s" in caplog.text
+
+def test_stale_actions():
+    def limit(action, last=1000):
+        cfg = Config({"powermeter": {"stale_action": action, "stale_ramp_percent": 10}})
+        return GuardedMeter(cfg, meter=None).stale_limit(last, 60, 2000)
+
+    assert limit("hold") == 1000
+    assert limit("ramp_down") == 800
+    assert limit("ramp_down", last=100) == 60
+    assert limit("minimum") == 60
+    with pytest.raises(ValueError):
+        limit("panic")
+
+def test_controllers_resume_from_tracked_setpoint():
+    cfg = Config({"control": {
+        "target_point_w": 20, "tolerance_w": 10, "max_point_w": 5000, "min_point_w": -5000,
+        "on_grid_jump_percent": 20, "fast_limit_decrease": True,
+    }})
+    legacy = ZeroExportController(cfg)
+    legacy._last_setpoint = 1500
+    legacy.track(800, "stale")
+    assert legacy.state() == {"type": "legacy", "mode": "stale", "last_setpoint": 800}
+
+    pid = PIDController(cfg)
+    pid._integral = 400.0
+    pid.track(800, "stale")
+    assert pid.state()["integral"] == 0.0 and pid.state()["last_setpoint"] == 800
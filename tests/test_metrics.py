@@ -0,0 +1,52 @@
+import pytest
+from src.metrics import Counter, Gauge, Histogram, Registry
+
+def test_counter_and_gauge_render():
+    reg = Registry()
+    c = reg.register(Counter("x_total", "Things", ("result",)))
+    g = reg.register(Gauge("y", "Level"))
+    c.inc(result="sent")
+    c.inc(2, result="sent")
+    c.inc(result="dropped")
+    g.set(1.5)
+
+    text = reg.render()
+    assert "# TYPE x_total counter" in text
+    assert 'x_total{result="sent"} 3' in text
+    assert 'x_total{result="dropped"} 1' in text
+    assert "y 1.5" in text
+    assert c.get(result="sent") == 3
+
+def test_label_values_are_escaped():
+    g = Gauge("state", "State", ("reason",))
+    g.set(1, reason='bad "value"\\path\nnext')
+    assert list(g.samples()) == ['state{reason="bad \\"value\\"\\\\path\\nnext"} 1']
+    assert g.get(reason='bad "value"\\path\nnext') == 1
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("lat_seconds", "Latency", (0.1, 1.0))
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.observe(v)
+
+    lines = list(h.samples())
+    assert lines == [
+        'lat_seconds_bucket{le="0.1"} 1',
+        'lat_seconds_bucket{le="1"} 3',
+        'lat_seconds_bucket{le="+Inf"} 4',
+        "lat_seconds_sum 4.05",
+        "lat_seconds_count 4",
+    ]
+
+def test_collectors_run_on_render():
+    reg = Registry()
+    g = reg.register(Gauge("stale_seconds", "Age", ("serial",)))
+    reg.add_collector(lambda: g.set(7, serial="abc"))
+    assert 'stale_seconds{serial="abc"} 7' in reg.render()
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    from src.http_api import _http_metrics
+    resp = await _http_metrics(None)
+    assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert b"zeroexport_cycle_seconds_bucket" in resp.body
+    assert b'zeroexport_command_wait_seconds_bucket{le="10"}' in resp.body
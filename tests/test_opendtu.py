@@ -0,0 +1,61 @@
+import pytest
+from src.config import Config
+from src.dtu.opendtu import OpenDTUAdapter, field_group
+
+SERIAL = "114100000001"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def dtu(clock):
+    cfg = Config({
+        "mqtt": {"opendtu_topic": "solar"},
+        "opendtu": {"ip": "127.0.0.1", "user": "admin", "password": "x",
+                    "freshness": {"flag_after_s": 15, "exclude_after_s": 60}},
+        "inverters": [{"serial": SERIAL}],
+    })
+    return OpenDTUAdapter(cfg, cfg.inverters, clock=clock)
+
+def test_field_groups():
+    assert field_group("0/power") == "ac"
+    assert field_group("2/voltage") == "dc"
+    assert field_group("status/limit_absolute") == "limit"
+    assert field_group("status/reachable") == "status"
+    assert field_group("name") == "info"
+
+@pytest.mark.asyncio
+async def test_freshness_index_per_group(dtu, clock):
+    assert dtu.data_age(SERIAL) is None
+    await dtu.handle_mqtt(f"solar/{SERIAL}/0/power", "400")
+    clock.now += 10
+    await dtu.handle_mqtt(f"solar/{SERIAL}/status/limit_absolute", "600")
+    clock.now += 10
+
+    assert dtu.data_age(SERIAL, "ac") == 20
+    assert dtu.data_age(SERIAL, "limit") == 10
+    assert not dtu.is_fresh(SERIAL, "ac")
+    assert dtu.is_fresh(SERIAL, "limit")
+    assert dtu.is_fresh(SERIAL, "ac", max_age_s=60)
+
+    # Other serials and the DTU's own topics stay out of the index
+    await dtu.handle_mqtt("solar/999/0/power", "1")
+    await dtu.handle_mqtt("solar/dtu/status", "1")
+    assert dtu.data_age("999") is None
+
+@pytest.mark.asyncio
+async def test_retained_reachable_expires(dtu, clock):
+    await dtu.handle_mqtt(f"solar/{SERIAL}/status/reachable", "1")
+    assert dtu.is_reachable(SERIAL)
+    clock.now += 61
+    assert not dtu.is_reachable(SERIAL)
+    await dtu.handle_mqtt(f"solar/{SERIAL}/status/reachable", "1")
+    assert dtu.is_reachable(SERIAL)
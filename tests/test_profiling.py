@@ -0,0 +1,93 @@
+import asyncio
+import pstats
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from src.config import Config
+from src.profiling import CpuProfile, MemoryTracker, Profiling, dump_tasks, setup_routes
+
+def busy_work(seconds):
+    end = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < end:
+        n += 1
+    return n
+
+@pytest.mark.asyncio
+async def test_sampling_profile_collapsed_stacks():
+    cpu = CpuProfile("sample", seconds=5, interval_s=0.001)
+    busy_work(0.1)
+    cpu.stop()
+
+    assert not cpu.running
+    assert cpu.status()["samples"] > 10
+    assert "test_profiling.py:busy_work" in cpu.collapsed()
+    with pytest.raises(ValueError):
+        cpu.pstats_dump()
+
+@pytest.mark.asyncio
+async def test_cprofile_pstats_download(tmp_path):
+    cpu = CpuProfile("cprofile", seconds=5, interval_s=0.001)
+    busy_work(0.01)
+    cpu.stop()
+
+    path = tmp_path / "cpu.pstats"
+    path.write_bytes(cpu.pstats_dump())
+    stats = pstats.Stats(str(path))
+    assert any(func == "busy_work" for _, _, func in stats.stats)
+
+@pytest.mark.asyncio
+async def test_profile_stops_after_duration():
+    cpu = CpuProfile("sample", seconds=0.05, interval_s=0.001)
+    await asyncio.sleep(0.1)
+    assert not cpu.running
+
+def test_memory_diff_finds_allocation_site():
+    tracker = MemoryTracker(frames=1)
+    try:
+        tracker.snapshot()
+        with pytest.raises(ValueError):
+            tracker.diff()
+        held = [bytearray(1000) for _ in range(1000)]
+        tracker.snapshot()
+        top = tracker.diff(limit=5)["top"]
+        assert "test_profiling.py" in top[0]["site"]
+        assert top[0]["size_diff"] >= 1_000_000
+        del held
+    finally:
+        tracker.stop()
+    assert not tracker.tracing
+
+@pytest.mark.asyncio
+async def test_dump_tasks():
+    task = asyncio.create_task(asyncio.sleep(10), name="sleeper")
+    await asyncio.sleep(0)
+    try:
+        assert "--- sleeper" in dump_tasks()
+    finally:
+        task.cancel()
+
+@pytest.mark.asyncio
+async def test_admin_routes_require_token():
+    app = web.Application()
+    setup_routes(app, Profiling(Config({"profiling": {"enabled": True, "token": "s3cret"}})))
+    async with TestClient(TestServer(app)) as client:
+        assert (await client.get("/admin/tasks")).status == 401
+        resp = await client.get("/admin/tasks", headers={"X-Admin-Token": "s3cret"})
+        assert resp.status == 200
+        assert "task(s)" in await resp.text()
+
+        resp = await client.post("/admin/profile/cpu/start?mode=sample&seconds=5&token=s3cret")
+        assert resp.status == 200
+        assert (await client.post("/admin/profile/cpu/start?token=s3cret")).status == 409
+        assert (await client.get("/admin/profile/cpu/result?token=s3cret")).status == 409
+        await client.post("/admin/profile/cpu/stop?token=s3cret")
+        resp = await client.get("/admin/profile/cpu/result?format=collapsed&token=s3cret")
+        assert resp.status == 200
+
+def test_admin_routes_off_by_default():
+    app = web.Application()
+    setup_routes(app, Profiling(Config({})))
+    assert not [r for r in app.router.routes() if r.resource.canonical.startswith("/admin")]
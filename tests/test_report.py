@@ -0,0 +1,149 @@
+import csv
+import time
+import tracemalloc
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.compliance import interval_start
+from src.config import Config
+from src.http_api import STORE_KEY, _http_series, _http_series_query
+from src.report import CsvSink, ReportBuilder, _yield_keys, build_report, main, series_events
+from src.timeseries import TimeSeriesStore
+
+DAY = interval_start(1_700_000_000, 86400)
+SERIALS = ["116190123456", "114182345678"]
+
+def events(seconds, start=DAY, export_from=None):
+    """1 Hz grid power, export of 360W from `export_from` on, yield_total every 10s."""
+    for t in range(seconds):
+        power = -360.0 if export_from is not None and t >= export_from else 500.0
+        yield start + t, None, power
+        if t % 10 == 0:
+            yield start + t, SERIALS[0], 100.0 + t * 0.0002
+            yield start + t, SERIALS[1], 50.0 + t * 0.0001
+
+async def aiter(iterable):
+    for item in iterable:
+        yield item
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+        self.closed = False
+
+    def write(self, rows):
+        self.rows += rows
+
+    def close(self):
+        self.closed = True
+
+def test_rows_per_quarter_hour():
+    builder = ReportBuilder(SERIALS)
+    rows = []
+    for event in events(3600, export_from=2700):
+        rows += builder.add(event)
+    rows += builder.finish()
+
+    assert len(rows) == 4
+    header = builder.columns
+    first, last = (dict(zip(header, r)) for r in (rows[0], rows[-1]))
+    assert first["import_wh"] == pytest.approx(125.0, abs=0.2)
+    assert first["export_wh"] == 0.0 and first["violation_s"] == 0.0
+    assert last["export_wh"] == pytest.approx(90.0, abs=0.2)
+    assert last["violation_s"] == pytest.approx(899.0, abs=1.0)
+    assert last["max_export_w"] == 360.0
+    # 0.0002 kWh/s over 900s
+    assert dict(zip(header, rows[1]))[f"yield_wh_{SERIALS[0]}"] == pytest.approx(180.0)
+    assert dict(zip(header, rows[1]))[f"yield_wh_{SERIALS[1]}"] == pytest.approx(90.0)
+    # No baseline before the first interval
+    assert first[f"yield_wh_{SERIALS[0]}"] == 0.0
+
+def test_intervals_with_only_yield_still_get_rows():
+    builder = ReportBuilder(SERIALS[:1])
+    rows = builder.add((DAY, SERIALS[0], 1.0))
+    rows += builder.add((DAY + 1000, SERIALS[0], 1.5))
+    rows += builder.add((DAY + 1900, None, 100.0))
+    rows += builder.finish()
+    assert [r[-1] for r in rows] == [0.0, 500.0, 0.0]
+
+def test_yield_keys_match_the_whole_serial_tag():
+    short, long = "11610000001", "116100000012"
+    keys = [TimeSeriesStore.key("inverter", "yield_total", {"serial": long, "name": "East"}),
+            TimeSeriesStore.key("inverter", "yield_total", {"serial": "116100000099", "name": f"serial={short}"}),
+            TimeSeriesStore.key("inverter", "yield_total", {"serial": short, "name": "West"})]
+    assert _yield_keys(keys, [short, long]) == {long: keys[0], short: keys[2]}
+    assert _yield_keys(keys[:2], [short]) == {}
+
+@pytest.mark.asyncio
+async def test_csv_output(tmp_path):
+    path = tmp_path / "report.csv"
+    builder = ReportBuilder(SERIALS)
+    count = await build_report(aiter(events(1800)), builder, CsvSink(str(path), builder.columns, chunk_rows=1))
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert count == 2
+    assert rows[0] == builder.columns
+    assert rows[1][0].startswith(time.strftime("%Y-%m-%d", time.localtime(DAY)))
+    assert float(rows[2][rows[0].index("import_wh")]) == pytest.approx(125.0, abs=0.2)
+
+@pytest_asyncio.fixture
+async def service():
+    """The service's /api/series endpoints over a store with recent telemetry."""
+    store = TimeSeriesStore(Config({"timeseries": {"retention_s": 7200}}))
+    now = time.time()
+    start = interval_start(now, 900) - 1800
+    for t in range(int(start), int(now)):
+        store.record("grid", {"power": -100.0 if t >= start + 900 else 400.0}, t=t)
+        store.record("inverter", {"yield_total": 10.0 + (t - start) * 0.0001},
+                     {"serial": SERIALS[0], "name": "Roof"}, t=t)
+    app = web.Application()
+    app[STORE_KEY] = store
+    app.router.add_get("/api/series", _http_series)
+    app.router.add_get("/api/series/query", _http_series_query)
+    async with TestServer(app) as server:
+        yield f"http://{server.host}:{server.port}", start
+
+@pytest.mark.asyncio
+async def test_report_from_service_series(service):
+    url, start = service
+    builder = ReportBuilder(SERIALS)
+    sink = ListSink()
+    await build_report(series_events(url, SERIALS, start, start + 1800, window_s=600), builder, sink)
+    rows = [dict(zip(builder.columns, r)) for r in sink.rows]
+    assert sink.closed
+    assert len(rows) == 2
+    assert rows[0]["import_wh"] == pytest.approx(100.0, abs=0.3)
+    assert rows[1]["export_wh"] == pytest.approx(25.0, abs=0.3)
+    assert rows[1][f"yield_wh_{SERIALS[0]}"] == pytest.approx(90.0)
+    assert rows[1][f"yield_wh_{SERIALS[1]}"] == 0.0
+
+def test_parquet_needs_pyarrow(monkeypatch, capsys):
+    monkeypatch.setattr("src.report.HAS_PYARROW", False)
+    with pytest.raises(SystemExit):
+        main(["--start", "2025-06-01", "--end", "2025-06-02", "-o", "june.parquet"])
+    assert "pyarrow" in capsys.readouterr().err
+
+@pytest.mark.asyncio
+async def test_memory_does_not_grow_with_range(capsys):
+    """Peak memory over one day of 1 Hz data against two days: the state is per interval, not per sample."""
+    async def peak(days):
+        builder = ReportBuilder(SERIALS)
+        sink = ListSink()
+        sink.write = lambda rows: None
+        tracemalloc.start()
+        started = time.perf_counter()
+        await build_report(aiter(events(days * 86400, export_from=43200)), builder, sink)
+        elapsed = time.perf_counter() - started
+        _, high = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return high, days * 86400 / elapsed
+
+    one_day, _ = await peak(1)
+    two_days, rate = await peak(2)
+    with capsys.disabled():
+        print(f"\n  report peak memory: 1 day {one_day / 1024:.0f} KiB, 2 days {two_days / 1024:.0f} KiB; "
+              f"{rate:,.0f} samples/s (traced), a year of 1 s data ~{365 * 86400 / rate / 60:.0f} min")
+    assert two_days < one_day * 1.5
+    assert two_days < 1024 * 1024
@@ -0,0 +1,66 @@
+import pytest
+from src.config import Config
+from src.response_model import InverterResponse, ResponseModel, ResponseParams
+
+def ramp_samples(start, from_w, to_w, dead, ramp, until, period=0.5):
+    """Samples of an ideal dead-time + ramp response."""
+    t = start
+    while t <= until:
+        elapsed = max(0.0, t - start - dead)
+        step = min(abs(to_w - from_w), ramp * elapsed)
+        yield t, from_w + step if to_w > from_w else from_w - step
+        t += period
+
+def test_learns_dead_time_and_ramp():
+    inv = InverterResponse(ResponseParams(dead_time_s=1.0, ramp_w_per_s=100.0), alpha=1.0)
+    inv.command(0.0, 200, 800)
+
+    learned = False
+    for t, p in ramp_samples(0.0, 200, 800, dead=3.0, ramp=40.0, until=30.0):
+        learned |= inv.observe(t, p)
+
+    assert learned
+    assert inv.params.dead_time_s == pytest.approx(3.5, abs=0.5)
+    assert inv.params.ramp_w_per_s == pytest.approx(40.0, abs=1.0)
+    assert not inv.settling
+
+def test_small_trim_is_not_settled_before_moving():
+    inv = InverterResponse(ResponseParams(dead_time_s=2.0, ramp_w_per_s=50.0))
+    inv.command(0.0, 480, 500)
+
+    # Still at 480W: within the default 20W band, but it has not moved yet
+    inv.observe(0.5, 480)
+    assert inv.settling
+
+def test_predict_and_remaining():
+    inv = InverterResponse(ResponseParams(dead_time_s=2.0, ramp_w_per_s=100.0))
+    assert inv.remaining(1.0) == 0.0
+
+    inv.command(0.0, 0, 1000)
+
+    # Sample taken at t=3 (100W), read at t=5: 200W more ramp since then
+    assert inv.predict(5.0, 100, 3.0) == 300
+    assert inv.remaining(5.0) == 700
+    assert inv.settle_time(0, 1000) == 12.0
+
+def test_wait_time_bounds():
+    model = ResponseModel(Config({"response_model": {"min_wait_s": 1, "max_wait_s": 8}}))
+
+    assert model.wait_time([("a", 500, 505)]) == 2.1
+    assert model.wait_time([("a", 0, 1000), ("b", 0, 10)]) == 8
+    assert model.wait_time([]) == 1
+
+def test_persistence(tmp_path):
+    path = tmp_path / "state" / "response_model.json"
+    model = ResponseModel(Config({}), path=str(path))
+    model.get("123").params = ResponseParams(dead_time_s=3.0, ramp_w_per_s=40.0, samples=5)
+    model.save()
+
+    restored = ResponseModel(Config({}), path=str(path))
+    restored.load()
+    assert restored.get("123").params == ResponseParams(3.0, 40.0, 5)
+
+    # Nothing new learned: no rewrite
+    path.unlink()
+    restored.save()
+    assert not path.exists()
@@ -0,0 +1,104 @@
+import pytest
+from src.config import Config
+from src.meters.powermeter import MeterReading
+from src.meters.sampler import AdaptiveSampler
+from src.metrics import METER_POLL_RATE
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+class ScriptedMeter:
+    def __init__(self, clock, profile):
+        self.clock = clock
+        self.profile = profile
+
+    async def read_full(self):
+        return MeterReading(power=self.profile(self.clock.now))
+
+def make(clock, profile, **adaptive):
+    cfg = Config({
+        "control": {"min_point_w": 0},
+        "powermeter": {"poll_interval_s": 1, "adaptive": {"enabled": True, **adaptive}},
+    })
+    return AdaptiveSampler(cfg, ScriptedMeter(clock, profile), clock=clock, sleep=clock.sleep)
+
+async def run(sampler, clock, until):
+    rates = []
+    while clock.now < until:
+        await sampler.wait()
+        await sampler.read()
+        rates.append(sampler.rate_hz)
+    return rates
+
+@pytest.mark.asyncio
+async def test_near_min_point_polls_fast():
+    clock = FakeClock()
+    sampler = make(clock, lambda t: 20.0)
+    rates = await run(sampler, clock, 10)
+    assert rates[-1] == 4.0
+    assert METER_POLL_RATE.get() == 4.0
+
+@pytest.mark.asyncio
+async def test_fast_change_speeds_up_then_stable_slows_down():
+    clock = FakeClock()
+    # Steady 500W import, a 1.5 kW load switching on at t=60
+    sampler = make(clock, lambda t: 500.0 if t < 60 else 2000.0, stable_after_s=20)
+    await run(sampler, clock, 57)
+    assert sampler.rate_hz == 0.5
+
+    rates = await run(sampler, clock, 63)
+    assert 4.0 in rates
+
+    await run(sampler, clock, 120)
+    assert sampler.rate_hz == 0.5
+
+@pytest.mark.asyncio
+async def test_night_polls_at_min_rate():
+    clock = FakeClock()
+    sampler = make(clock, lambda t: 300.0)
+    sampler.producing = False
+    await run(sampler, clock, 60)
+    assert sampler.rate_hz == 0.2
+    assert sampler.interval_s == pytest.approx(5.0)
+
+@pytest.mark.asyncio
+async def test_day_profile_reads_less_than_fixed_rate(capsys):
+    """Night, a calm morning, cloud transients around noon: read count against a fixed 1 Hz poll."""
+    clock = FakeClock()
+
+    def grid(t):
+        if 3600 <= t < 3900:
+            # Clouds: output swings 800W every 20s, grid swings with it
+            return 100.0 + (800.0 if int(t // 20) % 2 else 0.0)
+        return 400.0
+
+    sampler = make(clock, grid)
+    sampler.producing = False
+    await run(sampler, clock, 1800)
+    night = sampler.reads
+    sampler.producing = True
+    await run(sampler, clock, 3600)
+    calm = sampler.reads - night
+    await run(sampler, clock, 3900)
+    clouds = sampler.reads - night - calm
+
+    with capsys.disabled():
+        print(f"\n  reads: night {night} (fixed 1800), calm {calm} (1800), clouds {clouds} (300)")
+    assert night < 400
+    assert calm < 1000
+    assert clouds > 300
+
+def test_disabled_keeps_fixed_rate():
+    cfg = Config({"control": {"min_point_w": 0}, "powermeter": {"poll_interval_s": 2}})
+    sampler = AdaptiveSampler(cfg, meter=None)
+    sampler.observe(-500.0, 0.0)
+    sampler.observe(2000.0, 0.5)
+    assert not sampler.enabled
+    assert sampler.rate_hz == 0.5
@@ -0,0 +1,137 @@
+from functools import partial
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from src.config import Config
+from src.dtu.scheduler import CommandScheduler
+from src.main import _limit_sent
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def dtu():
+    d = MagicMock()
+    d.set_limit = AsyncMock()
+    return d
+
+def make(clock, dtu, **commands):
+    cfg = Config({"opendtu": {"commands": {"max_per_s": 1.0, "burst": 1, "min_interval_s": 2.0, **commands}}})
+    return CommandScheduler(cfg, dtu, mqtt=None, clock=clock)
+
+def sent(dtu):
+    return [(c.args[0], c.args[1]) for c in dtu.set_limit.call_args_list]
+
+@pytest.mark.asyncio
+async def test_budget_limits_command_rate(clock, dtu):
+    s = make(clock, dtu)
+    s.submit("a", 500, reduces=False)
+    s.submit("b", 500, reduces=False)
+
+    delay = await s.step()
+    assert sent(dtu) == [("a", 500)]
+    assert s.queue_depth == 1
+    assert delay == pytest.approx(1.0)
+
+    clock.now = 1.0
+    assert await s.step() is None
+    assert sent(dtu) == [("a", 500), ("b", 500)]
+
+@pytest.mark.asyncio
+async def test_zero_rate_is_unpaced(clock, dtu):
+    s = make(clock, dtu, max_per_s=0)
+    for serial in "abc":
+        s.submit(serial, 500, reduces=False)
+    assert await s.step() is None
+    assert sent(dtu) == [("a", 500), ("b", 500), ("c", 500)]
+    with pytest.raises(ValueError):
+        make(clock, dtu, max_per_s=-1)
+
+@pytest.mark.asyncio
+async def test_cuts_go_first(clock, dtu):
+    s = make(clock, dtu)
+    s.submit("a", 800, reduces=False)
+    clock.now = 0.1
+    s.submit("b", 200, reduces=True)
+
+    await s.step()
+    assert sent(dtu) == [("b", 200)]
+
+@pytest.mark.asyncio
+async def test_superseded_command_is_merged(clock, dtu):
+    s = make(clock, dtu)
+    s.submit("a", 800, reduces=False)
+    s.submit("a", 600, reduces=True)
+
+    await s.step()
+    assert sent(dtu) == [("a", 600)]
+    assert s.stats() == {"queue_depth": 0, "sent": 1, "merged": 1, "dropped": 0}
+
+@pytest.mark.asyncio
+async def test_min_interval_per_inverter(clock, dtu):
+    s = make(clock, dtu, burst=5)
+    s.submit("a", 800, reduces=False)
+    await s.step()
+
+    clock.now = 1.0
+    s.submit("a", 600, reduces=True)
+    assert await s.step() == pytest.approx(1.0)
+    assert len(sent(dtu)) == 1
+
+    clock.now = 2.0
+    await s.step()
+    assert sent(dtu)[-1] == ("a", 600)
+
+@pytest.mark.asyncio
+async def test_repeat_and_stale_commands_are_dropped(clock, dtu):
+    s = make(clock, dtu, max_age_s=5.0)
+    s.submit("a", 800, reduces=False)
+    await s.step()
+
+    s.submit("a", 800, reduces=False)
+    assert s.queue_depth == 0
+
+    # Increase waiting behind the budget for too long
+    s._tokens = -10
+    s.submit("b", 900, reduces=False)
+    clock.now = 6.0
+    await s.step()
+    assert s.queue_depth == 0
+    assert s.dropped == 2
+    assert sent(dtu) == [("a", 800)]
+
+@pytest.mark.asyncio
+async def test_on_sent_reports_send_time(clock, dtu):
+    s = make(clock, dtu)
+    times = []
+    s.submit("a", 800, reduces=False)
+    await s.step()
+    clock.now = 3.0
+    s.submit("a", 700, reduces=True, on_sent=times.append)
+    await s.step()
+    assert times == [3.0]
+
+@pytest.mark.asyncio
+async def test_dropped_share_is_not_recorded_as_sent(clock, dtu):
+    s = make(clock, dtu, max_age_s=5)
+    model = MagicMock()
+    shares = {}
+    s.submit("a", 800, reduces=False, on_sent=partial(_limit_sent, model, shares, "a", 0.0, 800))
+    await s.step()
+    assert shares == {"a": 800}
+
+    # The next increase goes stale behind a spent budget
+    s._tokens = -10
+    s.submit("a", 1000, reduces=False, on_sent=partial(_limit_sent, model, shares, "a", 800.0, 1000))
+    clock.now = 6.0
+    await s.step()
+    assert shares == {"a": 800}
+    model.command.assert_called_once_with(0.0, 0.0, 800)
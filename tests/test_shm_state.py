@@ -0,0 +1,156 @@
+import math
+import multiprocessing
+import time
+from types import SimpleNamespace
+
+import pytest
+from src.config import Config
+from src.dtu.opendtu import OpenDTUAdapter
+from src.main import _enabled, _publish_shared
+from src.meters.powermeter import MeterReading
+from src.shm_state import (
+    ENABLED, FRESH, METER_STALE, REACHABLE, SEQ, SEQ_OFFSET, SharedStateError, SharedStateReader, SharedStateWriter,
+    create_shared_state,
+)
+
+SERIALS = ["116190123456", "114182345678"]
+
+def test_round_trip(tmp_path):
+    writer = SharedStateWriter(tmp_path / "state", max_inverters=4)
+    reader = SharedStateReader(tmp_path / "state")
+    assert reader.max_inverters == 4
+    assert reader.read().inverters == []
+
+    writer.publish(-35.5, 231.2, -20.0, 0.0, 800.0, ENABLED,
+                   [(SERIALS[0], 410.0, 600.0, 1.5, REACHABLE), (SERIALS[1], 0.0, 200.0, None, 0)], now=1000.0)
+    snap = reader.read()
+    assert snap.sequence == reader.sequence == 2
+    assert (snap.time, snap.grid_power, snap.grid_voltage, snap.filtered, snap.setpoint) == \
+        (1000.0, -35.5, 231.2, -20.0, 800.0)
+    assert snap.enabled
+    first, second = snap.inverters
+    assert (first.serial, first.power, first.limit, first.age_s) == (SERIALS[0], 410.0, 600.0, 1.5)
+    assert first.reachable and not first.producing
+    assert second.serial == SERIALS[1] and math.isnan(second.age_s)
+
+    # Fewer inverters in the next snapshot: the stale slot is not reported
+    writer.publish(10.0, 230.0, 10.0, 0.0, 0.0, 0, [(SERIALS[0], 400.0, 600.0, 0.5, REACHABLE)])
+    assert [i.serial for i in reader.read().inverters] == SERIALS[:1]
+    reader.close()
+    writer.close()
+
+def test_reader_rejects_other_files_and_torn_state(tmp_path):
+    (tmp_path / "other").write_bytes(b"\x00" * 256)
+    with pytest.raises(SharedStateError):
+        SharedStateReader(tmp_path / "other")
+
+    writer = SharedStateWriter(tmp_path / "state")
+    reader = SharedStateReader(tmp_path / "state")
+    # A writer that died mid-publish leaves the sequence odd
+    writer.publish(1.0, 230.0, 1.0, 0.0, 0.0, 0, [])
+    SEQ.pack_into(writer._mm, SEQ_OFFSET, 3)
+    with pytest.raises(SharedStateError):
+        reader.read(retries=10)
+    reader.close()
+    writer.close()
+
+def test_restarted_writer_replaces_the_file(tmp_path):
+    writer = SharedStateWriter(tmp_path / "state", max_inverters=2)
+    writer.publish(1.0, 230.0, 1.0, 0.0, 0.0, 0, [])
+    writer.close()
+    # Changed layout after a restart: new readers see the new file
+    writer = SharedStateWriter(tmp_path / "state", max_inverters=8)
+    assert SharedStateReader(tmp_path / "state").max_inverters == 8
+    writer.close()
+
+def test_create_shared_state(tmp_path):
+    assert create_shared_state(Config({})) is None
+    writer = create_shared_state(Config({"shared_state": {"enabled": True, "path": str(tmp_path / "s"),
+                                                          "max_inverters": 3}}))
+    assert writer.max_inverters == 3
+    writer.close()
+
+@pytest.mark.asyncio
+async def test_publish_from_control_loop_state(tmp_path):
+    cfg = Config({
+        "mqtt": {"opendtu_topic": "solar"},
+        "opendtu": {"ip": "127.0.0.1", "user": "admin", "password": "x"},
+        "inverters": [{"serial": s} for s in SERIALS],
+    })
+    dtu = OpenDTUAdapter(cfg, cfg.inverters)
+    await dtu.handle_mqtt(f"solar/{SERIALS[0]}/0/power", "412.5")
+    await dtu.handle_mqtt(f"solar/{SERIALS[0]}/status/limit_absolute", "600")
+    await dtu.handle_mqtt(f"solar/{SERIALS[0]}/status/reachable", "1")
+    writer = SharedStateWriter(tmp_path / "state")
+    _enabled.set()
+    reading = MeterReading(power=-12.0, voltage=229.0, age_s=4.0)
+    # A fallback reading the guard still accepts is not flagged
+    _publish_shared(writer, cfg, reading, SimpleNamespace(value=-5.0), dtu, 700, meter_stale=False)
+    assert SharedStateReader(tmp_path / "state").read().flags == ENABLED
+    _publish_shared(writer, cfg, reading, SimpleNamespace(value=-5.0), dtu, 700, meter_stale=True)
+    snap = SharedStateReader(tmp_path / "state").read()
+    assert snap.flags == ENABLED | METER_STALE
+    assert (snap.grid_power, snap.filtered, snap.meter_age_s, snap.setpoint) == (-12.0, -5.0, 4.0, 700.0)
+    first, second = snap.inverters
+    assert (first.power, first.limit) == (412.5, 600.0)
+    assert first.flags & (REACHABLE | FRESH) == REACHABLE | FRESH
+    assert first.age_s < 1.0
+    assert second.flags == 0 and math.isnan(second.age_s)
+    writer.close()
+
+def _writer_loop(path, started, stop):
+    writer = SharedStateWriter(path, max_inverters=16)
+    i = 0
+    while not stop.is_set():
+        i += 1
+        v = float(i)
+        # Every field of a snapshot carries the same value, so a torn read shows
+        writer.publish(v, v, v, v, v, 0, [(f"{i:012d}", v, v, v, 0)] * 16, now=v)
+        if i == 1:
+            started.set()
+        # ~10 kHz, four orders of magnitude above the control loop
+        time.sleep(0.0001)
+    writer.close()
+
+def test_consistent_reads_against_a_writer_process(tmp_path, capsys):
+    """Snapshots read while another process publishes at ~10 kHz; then uncontended reads/s."""
+    path = tmp_path / "state"
+    ctx = multiprocessing.get_context("fork")
+    started, stop = ctx.Event(), ctx.Event()
+    proc = ctx.Process(target=_writer_loop, args=(path, started, stop))
+    proc.start()
+    try:
+        assert started.wait(10)
+        reader = SharedStateReader(path)
+        reads = 0
+        sequences = set()
+        started_at = time.perf_counter()
+        while time.perf_counter() - started_at < 1.0:
+            snap = reader.read()
+            v = snap.time
+            assert {snap.grid_power, snap.grid_voltage, snap.filtered, snap.meter_age_s, snap.setpoint} == {v}
+            assert all(i.serial == f"{int(v):012d}" and i.power == i.limit == i.age_s == v
+                       for i in snap.inverters)
+            sequences.add(snap.sequence)
+            reads += 1
+        contended = reads / (time.perf_counter() - started_at)
+    finally:
+        stop.set()
+        proc.join(10)
+    assert len(sequences) > 10
+
+    reader = SharedStateReader(path)
+    n = 20000
+    started_at = time.perf_counter()
+    for _ in range(n):
+        reader.read()
+    uncontended = n / (time.perf_counter() - started_at)
+    started_at = time.perf_counter()
+    for _ in range(n):
+        reader.sequence
+    polls = n / (time.perf_counter() - started_at)
+    reader.close()
+    with capsys.disabled():
+        print(f"\n  shared state, 16 inverters: {uncontended:,.0f} reads/s, {contended:,.0f} reads/s "
+              f"against a busy writer ({len(sequences):,} distinct snapshots), {polls:,.0f} sequence polls/s")
+    assert uncontended > 10000
@@ -0,0 +1,60 @@
+import logging
+
+import pytest
+from src.simulation import (
+    SimInverter, compare_allocation, compare_controllers, compare_filters, LOAD_STEPS_S, SHADE_EVENTS_S,
+)
+
+@pytest.fixture(autouse=True)
+def quiet_logs():
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+def test_inverter_dead_time_and_ramp():
+    inv = SimInverter(1000, dead_time_s=1.0, ramp_w_per_s=100.0)
+    inv.command(0.0, 500)
+
+    # Nothing happens within the dead time
+    inv.step(0.5, 0.5)
+    assert inv.output == 0.0
+
+    # Then ramps at 100 W/s
+    inv.step(1.0, 1.0)
+    assert inv.output == 100.0
+
+def test_pid_settles_faster_than_legacy():
+    results = compare_controllers()
+    legacy, pid = results["legacy"], results["pid"]
+
+    drop = LOAD_STEPS_S[1]
+    assert pid.settling_time(drop, 15, 40, drop + 120) < legacy.settling_time(drop, 15, 40, drop + 120)
+    assert pid.export_wh <= legacy.export_wh
+    assert pid.commands <= legacy.commands
+
+def test_response_model_reduces_export():
+    fixed = compare_controllers(kinds=("pid",))["pid"]
+    modelled = compare_controllers(kinds=("pid",), response_model=True)["pid"]
+
+    assert modelled.export_wh < fixed.export_wh
+    assert modelled.commands <= fixed.commands
+
+def test_headroom_allocation_converges_faster():
+    results = compare_allocation("pid")
+    proportional, headroom = results["proportional"], results["headroom"]
+
+    def cycles(r):
+        return sum(r.convergence_cycles(s, 15, 40, s + 90) for s in SHADE_EVENTS_S)
+
+    assert cycles(headroom) < cycles(proportional)
+    assert headroom.commands < proportional.commands
+    assert headroom.import_wh < proportional.import_wh
+    assert headroom.export_wh <= proportional.export_wh
+
+@pytest.mark.parametrize("kind", ["legacy", "pid"])
+def test_median_filter_reduces_command_rate(kind):
+    results = compare_filters(kind, ("none", "median"))
+    raw, median = results["none"], results["median"]
+
+    assert median.commands < 0.85 * raw.commands
+    assert median.export_wh <= raw.export_wh
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+from src.config import Config
+from src.dtu.opendtu import OpenDTUAdapter
+from src.meters.powermeter import MeterReading
+from src.metrics import TIME_TO_FIRST_CONTROL
+from src.startup import Readiness
+
+SERIALS = ["114100000001", "114100000002"]
+
+def make_cfg(timeout_s=5.0, serials=SERIALS):
+    return Config({
+        "mqtt": {"opendtu_topic": "solar"},
+        "opendtu": {"ip": "127.0.0.1", "user": "admin", "password": "x"},
+        "startup": {"timeout_s": timeout_s, "meter_retry_s": 0.01},
+        "inverters": [{"serial": s, "enabled": True} for s in serials],
+    })
+
+class FakeMqtt:
+    """Broker stand-in: connects after `delay` seconds."""
+
+    def __init__(self, delay):
+        self._connected = asyncio.Event()
+        asyncio.get_running_loop().call_later(delay, self._connected.set)
+
+    async def wait_connected(self):
+        await self._connected.wait()
+
+class FakeMeter:
+    """Fails `failures` times, then answers after `latency` seconds."""
+
+    def __init__(self, latency=0.03, failures=0):
+        self.latency = latency
+        self.failures = failures
+        self.calls = 0
+
+    async def read_full(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.calls <= self.failures:
+            raise OSError("connection refused")
+        return MeterReading(power=123.0)
+
+async def deliver_retained(dtu, serials, delay):
+    await asyncio.sleep(delay)
+    for serial in serials:
+        await dtu.handle_mqtt(f"solar/{serial}/0/power", "400")
+        await dtu.handle_mqtt(f"solar/{serial}/status/reachable", "1")
+        await asyncio.sleep(0.005)
+
+@pytest.mark.asyncio
+async def test_ready_when_all_signals_arrive():
+    cfg = make_cfg()
+    dtu = OpenDTUAdapter(cfg, cfg.inverters)
+    ready = Readiness(cfg, FakeMqtt(0.02), dtu, FakeMeter(failures=2))
+    feeder = asyncio.create_task(deliver_retained(dtu, SERIALS, 0.05))
+
+    assert await ready.wait()
+    await feeder
+    assert set(ready.ready_at) == {"mqtt", "inverters", "meter"}
+    assert ready.sample.power == 123.0
+    assert ready.meter.calls == 3
+
+    ready.first_control()
+    first = ready.first_control_s
+    ready.first_control()
+    assert ready.first_control_s == first
+    assert TIME_TO_FIRST_CONTROL.get() == first
+
+@pytest.mark.asyncio
+async def test_timeout_starts_with_missing_inverter(caplog):
+    cfg = make_cfg(timeout_s=0.2)
+    dtu = OpenDTUAdapter(cfg, cfg.inverters)
+    ready = Readiness(cfg, FakeMqtt(0.01), dtu, FakeMeter())
+    await deliver_retained(dtu, SERIALS[:1], 0.0)
+
+    started = time.monotonic()
+    assert not await ready.wait()
+    assert time.monotonic() - started < 0.5
+    assert "inverters" not in ready.ready_at
+    assert ready.sample is not None
+    assert SERIALS[1] in caplog.text
+
+@pytest.mark.asyncio
+async def test_startup_benchmark(capsys):
+    """Time to first control with local stand-ins, against the fixed 2 x 3s sleeps it replaces."""
+    serials = [f"1141000000{n:02d}" for n in range(8)]
+    cfg = make_cfg(serials=serials)
+    dtu = OpenDTUAdapter(cfg, cfg.inverters)
+    # Broker connect 50ms, retained state right after, meter refuses once (service still booting)
+    ready = Readiness(cfg, FakeMqtt(0.05), dtu, FakeMeter(latency=0.04, failures=1))
+    feeder = asyncio.create_task(deliver_retained(dtu, serials, 0.06))
+
+    assert await ready.wait()
+    ready.first_control()
+    await feeder
+
+    with capsys.disabled():
+        print()
+        signals = ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in sorted(ready.ready_at.items(), key=lambda i: i[1]))
+        print(f"  startup: {signals}; first control {ready.first_control_s * 1000:.0f} ms"
+              f" (fixed sleeps: >= 6000 ms + version check)")
+    assert ready.first_control_s < 1.0
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from src.streaming import StateBroadcaster, state_frame
+
+def frame(n):
+    return state_frame(1000.0 + n, True, 12.3, 800, {"114": (400.0, 450.0)})
+
+def test_frame_is_encoded_once_for_all_subscribers():
+    b = StateBroadcaster()
+    subs = [b.subscribe() for _ in range(3)]
+    b.publish(frame(1))
+    frames = [s.queue.get_nowait() for s in subs]
+    assert all(f is frames[0] for f in frames)
+    assert json.loads(frames[0].text)["inv"] == {"114": [400.0, 450.0]}
+    assert frames[0].sse.startswith(b"data: {") and frames[0].sse.endswith(b"\n\n")
+
+def test_slow_subscriber_drops_oldest():
+    b = StateBroadcaster(depth=2)
+    sub = b.subscribe()
+    for n in range(5):
+        b.publish(frame(n))
+    assert sub.dropped == 3
+    assert [json.loads(sub.queue.get_nowait().text)["t"] for _ in range(2)] == [1003.0, 1004.0]
+
+def test_new_subscriber_gets_last_frame_and_limit():
+    b = StateBroadcaster(max_clients=1)
+    b.publish(frame(7))
+    sub = b.subscribe()
+    assert json.loads(sub.queue.get_nowait().text)["t"] == 1007.0
+    with pytest.raises(web.HTTPServiceUnavailable):
+        b.subscribe()
+    b.unsubscribe(sub)
+    assert b.clients == 0
+
+@pytest.mark.asyncio
+async def test_sse_stream():
+    b = StateBroadcaster()
+    app = web.Application()
+    app.router.add_get("/api/stream", b.handle_sse)
+    async with TestServer(app) as server, aiohttp.ClientSession() as session:
+        async with session.get(server.make_url("/api/stream")) as resp:
+            assert resp.headers["Content-Type"] == "text/event-stream"
+            while not b.clients:
+                await asyncio.sleep(0.01)
+            b.publish(frame(1))
+            line = await resp.content.readline()
+            assert json.loads(line[len(b"data: "):])["setpoint"] == 800
+
+@pytest.mark.asyncio
+async def test_websocket_fan_out_load(capsys):
+    """Hundreds of local WebSocket clients: every one sees the latest frame, fan-out CPU is reported."""
+    clients, frames = 300, 20
+    b = StateBroadcaster(depth=4, max_clients=clients)
+    app = web.Application()
+    app.router.add_get("/api/ws", b.handle_ws)
+    async with TestServer(app) as server:
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            sockets = await asyncio.gather(*(session.ws_connect(server.make_url("/api/ws")) for _ in range(clients)))
+            while b.clients < clients:
+                await asyncio.sleep(0.01)
+
+            publish_cpu = 0.0
+            for n in range(frames):
+                start = time.process_time()
+                b.publish(frame(n))
+                publish_cpu += time.process_time() - start
+                await asyncio.sleep(0.005)
+
+            async def last_seen(ws):
+                seen = None
+                while seen != 1000.0 + frames - 1:
+                    seen = json.loads((await ws.receive(timeout=5)).data)["t"]
+                return seen
+
+            start = time.process_time()
+            await asyncio.gather(*(last_seen(ws) for ws in sockets))
+            drain_cpu = time.process_time() - start
+            await asyncio.gather(*(ws.close() for ws in sockets))
+
+    with capsys.disabled():
+        print(
+            f"\n{clients} ws clients x {frames} frames: publish {publish_cpu / frames * 1e3:.2f} ms CPU/frame "
+            f"({publish_cpu / frames / clients * 1e6:.1f} us/client), dropped {b.dropped}, "
+            f"drain {drain_cpu:.2f}s CPU (server + clients)"
+        )
+    assert publish_cpu / frames < 0.05
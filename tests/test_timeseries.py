@@ -0,0 +1,68 @@
+import pytest
+from src.config import Config
+from src.timeseries import RingSeries, TimeSeriesStore
+
+T0 = 1_700_000_000.0
+
+def test_raw_range_query():
+    s = RingSeries(retention_s=60, resolution_s=1)
+    for i in range(30):
+        s.add(T0 + i, float(i))
+
+    points = s.query(T0 + 10, T0 + 14, step=1)
+    assert [p[0] for p in points] == [T0 + 10, T0 + 11, T0 + 12, T0 + 13, T0 + 14]
+    assert [p[3] for p in points] == [10, 11, 12, 13, 14]
+
+def test_cumulative_counters_keep_whole_wh():
+    # Meter energy totals in Wh pass 2^24 (~16.8 MWh) within years
+    s = RingSeries(retention_s=60, resolution_s=1, rollups_s=(10,))
+    for i in range(20):
+        s.add(T0 + i, 123_456_789.0 + i)
+    assert [p[3] for p in s.query(T0, T0 + 2, step=1)] == [123_456_789.0, 123_456_790.0, 123_456_791.0]
+    t, lo, hi, mean, n = s.query(T0, T0 + 9, step=10)[0]
+    assert (lo, hi) == (123_456_789.0, 123_456_798.0)
+
+def test_downsampling_min_max_mean():
+    s = RingSeries(retention_s=600, resolution_s=1, rollups_s=(10,))
+    for i in range(60):
+        s.add(T0 + i, float(i % 10))
+
+    # step 10 uses the 10s rollup
+    points = s.query(T0, T0 + 59, step=10)
+    assert len(points) == 6
+    t, lo, hi, mean, n = points[0]
+    assert (t, lo, hi, mean, n) == (T0, 0, 9, 4.5, 10)
+
+    # step 20 merges two rollup slots
+    points = s.query(T0, T0 + 59, step=20)
+    assert [p[4] for p in points] == [20, 20, 20]
+
+def test_retention_drops_old_points():
+    s = RingSeries(retention_s=10, resolution_s=1, rollups_s=())
+    for i in range(25):
+        s.add(T0 + i, float(i))
+    points = s.query(T0, T0 + 24, step=1)
+    assert [p[3] for p in points] == list(range(15, 25))
+
+def test_store_keys_and_filtering():
+    store = TimeSeriesStore(Config({"timeseries": {"measurements": ["inverter"]}}))
+    store.record("inverter", {"power": 300, "producing": True, "name": "x"}, {"serial": "114"}, t=T0)
+    store.record("panel", {"power": 100}, t=T0)
+
+    assert store.series() == ["inverter.power{serial=114}", "inverter.producing{serial=114}"]
+    assert store.latest("inverter.power{serial=114}") == (T0, 300.0)
+
+def test_store_query_bounds_bucket_count():
+    store = TimeSeriesStore(Config({"timeseries": {"retention_s": 3600, "max_buckets": 100}}))
+    for i in range(3600):
+        store.record("grid", {"power": float(i)}, t=T0 + i)
+
+    result = store.query("grid.power", T0, T0 + 3599, step=1)
+    assert result["step"] == pytest.approx(35.99)
+    assert len(result["points"]) <= 101
+    assert sum(p[4] for p in result["points"]) == 3600
+
+    with pytest.raises(KeyError):
+        store.query("grid.nope")
+    with pytest.raises(ValueError):
+        store.query("grid.power", T0 + 10, T0)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import time
+
+import pytest
+from src.config import Config
+from src.tracing import Tracer
+
+def make(**tracing):
+    return Tracer(Config({"tracing": {"enabled": True, **tracing}}))
+
+def test_disabled_tracer_is_noop():
+    tracer = Tracer(Config({}))
+    cycle = tracer.cycle()
+    cycle.stage("meter")
+    cycle.set(grid=100)
+    tracer.finish(cycle)
+    assert tracer.query() == []
+
+def test_stages_are_sequential():
+    tracer = make()
+    cycle = tracer.cycle()
+    cycle.stage("meter")
+    time.sleep(0.01)
+    cycle.stage("compute")
+    cycle.set(grid=42.0)
+    tracer.finish(cycle)
+
+    [trace] = tracer.query()
+    meter, compute = trace["stages"]
+    assert meter["name"] == "meter" and meter["duration_s"] >= 0.01
+    # Offsets and durations are rounded to the microsecond
+    assert compute["offset_s"] >= meter["offset_s"] + meter["duration_s"] - 2e-6
+    assert trace["inputs"] == {"grid": 42.0}
+    assert not trace["slow"]
+
+def test_slow_cycle_capture_ignores_wait():
+    tracer = make(slow_cycle_s=0.01)
+    waiting = tracer.cycle()
+    waiting.stage("wait")
+    time.sleep(0.02)
+    tracer.finish(waiting)
+
+    busy = tracer.cycle()
+    busy.stage("meter")
+    time.sleep(0.02)
+    tracer.finish(busy)
+
+    slow = tracer.query(slow_only=True)
+    assert [c["seq"] for c in slow] == [busy.seq]
+    assert len(tracer.query()) == 2
+
+def test_failure_is_attributed_to_stage():
+    tracer = make()
+    cycle = tracer.cycle()
+    cycle.stage("meter")
+    cycle.fail(TimeoutError("no answer"))
+    assert cycle.current_stage == "meter"
+    tracer.finish(cycle)
+    assert tracer.query()[0]["stages"][0]["error"] == "TimeoutError: no answer"
+
+def test_ring_buffer_keeps_last_cycles():
+    tracer = make(ring_size=3)
+    for _ in range(5):
+        tracer.finish(tracer.cycle())
+    assert [c["seq"] for c in tracer.query()] == [3, 4, 5]
+
+def test_otlp_file_export(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = make(otlp_file=str(path))
+    cycle = tracer.cycle()
+    cycle.stage("meter")
+    cycle.fail(ValueError("bad"))
+    cycle.set(grid=10.5, limit=800)
+    tracer.finish(cycle)
+    # Buffered, not written on the event loop
+    assert not path.exists()
+    tracer.flush()
+
+    [line] = path.read_text().splitlines()
+    doc = json.loads(line)
+    spans = doc["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root, meter = spans
+    assert root["name"] == "control_cycle"
+    assert meter["parentSpanId"] == root["spanId"]
+    assert meter["traceId"] == root["traceId"] and len(root["traceId"]) == 32
+    assert meter["status"]["code"] == 2
+    assert int(meter["endTimeUnixNano"]) >= int(meter["startTimeUnixNano"])
+    attrs = {a["key"]: a["value"] for a in root["attributes"]}
+    assert attrs["grid"] == {"doubleValue": 10.5}
+    assert attrs["limit"] == {"intValue": "800"}
+
+@pytest.mark.asyncio
+async def test_otlp_lines_are_written_in_batches(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = make(otlp_file=str(path), otlp_flush_s=0.01)
+    task = asyncio.create_task(tracer.run())
+    for _ in range(3):
+        tracer.finish(tracer.cycle())
+    await asyncio.sleep(0.1)
+    task.cancel()
+    assert len(path.read_text().splitlines()) == 3